@@ -0,0 +1,238 @@
+"""
+Cache backends for rendered pages of the Tamil quotes app.
+
+Entries expire after a TTL and the least recently used ones are evicted
+when the cache is full. Every entry carries tags (such as 'quote:12' or
+'category:Love') naming the data it was built from, so a change can drop
+exactly the entries that showed it.
+
+A page rendered while its data changes may show the old data, so each
+invalidation also bumps a generation counter and stamps its tags with it.
+set(..., since=version()) read before rendering refuses to store a page
+whose tags were invalidated after that.
+
+MemoryCache lives inside one process. SqliteCache keeps entries in a SQLite
+file that every worker process on the machine can share, standing in for a
+shared store such as Redis.
+"""
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+class MemoryCache:
+    def __init__(self, max_entries=1000, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # Key -> (expires, value, tags), oldest use first
+        self.tagged = {}  # Tag -> keys of the entries carrying it
+        self.generation = 0  # Bumped by every invalidation
+        self.versions = OrderedDict()  # Tag -> generation it was last invalidated in
+        self.floor = 0  # Newest generation dropped from versions
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def version(self):
+        return self.generation
+
+    def set(self, key, value, tags=(), since=None):
+        # Returns False, storing nothing, if a tag changed after since
+        with self.lock:
+            if since is not None and self._changed(tags, since):
+                return False
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, value, tuple(tags))
+            for tag in tags:
+                self.tagged.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+            return True
+
+    def _changed(self, tags, since):
+        # Renders older than the forgotten versions cannot be checked
+        return since < self.floor or any(self.versions.get(tag, 0) > since for tag in tags)
+
+    def invalidate(self, tags):
+        with self.lock:
+            self.generation += 1
+            for tag in tags:
+                self.versions[tag] = self.generation
+                self.versions.move_to_end(tag)
+                for key in list(self.tagged.get(tag, ())):
+                    self._remove(key)
+            # Only renders in flight need the versions, so keep the newest
+            while len(self.versions) > self.max_entries:
+                self.floor = self.versions.popitem(last=False)[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tagged.clear()
+            # Pages being rendered now may be what the clear was for
+            self.generation += 1
+            self.floor = self.generation
+            self.versions.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _remove(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tagged[tag]
+            keys.discard(key)
+            if not keys:
+                del self.tagged[tag]
+
+
+class SqliteCache:
+    def __init__(self, path, max_entries=1000, ttl=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()  # One connection per thread
+        self.writes = 0
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS cache_entry (
+                    key TEXT PRIMARY KEY, value BLOB, expires REAL, used REAL);
+                CREATE INDEX IF NOT EXISTS ix_cache_entry_used ON cache_entry (used);
+                CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT, key TEXT);
+                CREATE INDEX IF NOT EXISTS ix_cache_tag_tag ON cache_tag (tag);
+                CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key);
+                CREATE TABLE IF NOT EXISTS cache_tag_version (
+                    tag TEXT PRIMARY KEY, version INTEGER);
+                CREATE INDEX IF NOT EXISTS ix_cache_tag_version_version
+                    ON cache_tag_version (version);
+                CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER);
+                INSERT OR IGNORE INTO cache_meta VALUES ('generation', 0), ('floor', 0);
+            ''')
+
+    def _connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            # Readers never wait for a writer; losing the last writes in a
+            # power cut only costs cache misses
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        # Wall-clock time, as other processes share the entries
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT value, expires FROM cache_entry WHERE key = ?',
+                           (key,)).fetchone()
+        if row is None or row[1] < now:
+            return None
+        with conn:
+            conn.execute('UPDATE cache_entry SET used = ? WHERE key = ?', (now, key))
+        return pickle.loads(row[0])
+
+    def version(self):
+        return self._meta(self._connect(), 'generation')
+
+    def _meta(self, conn, name):
+        return conn.execute('SELECT value FROM cache_meta WHERE name = ?', (name,)).fetchone()[0]
+
+    def set(self, key, value, tags=(), since=None):
+        # Returns False, storing nothing, if a tag changed after since
+        now = time.time()
+        conn = self._connect()
+        tags = list(tags)
+        with conn:
+            # Take the write lock first so no invalidation lands between the
+            # check and the insert
+            conn.execute('BEGIN IMMEDIATE')
+            if since is not None and self._changed(conn, tags, since):
+                return False
+            conn.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            conn.execute('INSERT OR REPLACE INTO cache_entry VALUES (?, ?, ?, ?)',
+                         (key, pickle.dumps(value), now + self.ttl, now))
+            conn.executemany('INSERT INTO cache_tag VALUES (?, ?)', [(tag, key) for tag in tags])
+            # Trim back to size now and then rather than counting every write
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self._evict(conn, now)
+        return True
+
+    def _changed(self, conn, tags, since):
+        # Renders older than the forgotten versions cannot be checked
+        if since < self._meta(conn, 'floor'):
+            return True
+        if not tags:
+            return False
+        marks = ', '.join('?' * len(tags))
+        return conn.execute(f'SELECT 1 FROM cache_tag_version WHERE version > ? AND tag IN ({marks})',
+                            [since] + tags).fetchone() is not None
+
+    def _evict(self, conn, now):
+        # Expired entries, and everything after the newest max_entries by use
+        stale = '''SELECT key FROM cache_entry WHERE expires < ? UNION
+                   SELECT key FROM (SELECT key FROM cache_entry
+                                    ORDER BY used DESC LIMIT -1 OFFSET ?)'''
+        conn.execute(f'DELETE FROM cache_tag WHERE key IN ({stale})', (now, self.max_entries))
+        conn.execute(f'DELETE FROM cache_entry WHERE key IN ({stale})', (now, self.max_entries))
+        # Only renders in flight need the versions, so keep the newest
+        forgotten = conn.execute('SELECT MAX(version) FROM (SELECT version FROM cache_tag_version '
+                                 'ORDER BY version DESC LIMIT -1 OFFSET ?)',
+                                 (self.max_entries,)).fetchone()[0]
+        if forgotten is not None:
+            conn.execute('DELETE FROM cache_tag_version WHERE version <= ?', (forgotten,))
+            conn.execute("UPDATE cache_meta SET value = MAX(value, ?) WHERE name = 'floor'",
+                         (forgotten,))
+
+    def invalidate(self, tags):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+            generation = self._meta(conn, 'generation')
+            conn.executemany('INSERT OR REPLACE INTO cache_tag_version VALUES (?, ?)',
+                             [(tag, generation) for tag in tags])
+            for tag in tags:
+                conn.execute('DELETE FROM cache_entry WHERE key IN '
+                             '(SELECT key FROM cache_tag WHERE tag = ?)', (tag,))
+                conn.execute('DELETE FROM cache_tag WHERE key IN '
+                             '(SELECT key FROM cache_tag WHERE tag = ?)', (tag,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM cache_entry')
+            conn.execute('DELETE FROM cache_tag')
+            # Pages being rendered now may be what the clear was for
+            conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+            conn.execute("UPDATE cache_meta SET value = (SELECT value FROM cache_meta "
+                         "WHERE name = 'generation') WHERE name = 'floor'")
+            conn.execute('DELETE FROM cache_tag_version')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+
+def create_cache(url, max_entries=1000, ttl=300):
+    # 'memory', 'sqlite:///path/to/cache.db' or 'none'
+    if url == 'none':
+        return None
+    if url == 'memory':
+        return MemoryCache(max_entries, ttl)
+    if url.startswith('sqlite:///'):
+        return SqliteCache(url[len('sqlite:///'):], max_entries, ttl)
+    raise ValueError(f'unknown page cache {url!r}')
@@ -0,0 +1,367 @@
+"""
+Benchmarks for the Tamil quotes app against a large seeded SQLite database.
+
+Usage: python quotes_benchmark.py [QUOTES ...]   (default: 10000 100000 1000000)
+
+The database is created in a temporary directory and grown to each size in
+turn; quotes are inserted with sqlite3 directly because going through the
+ORM would take minutes at a million rows.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'tamil_quotes_bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['PAGE_CACHE'] = 'none'  # The page load test switches caches itself
+
+import tamil_quotes_app
+from flask import redirect, url_for
+from jinja2 import ChoiceLoader, DictLoader
+from flask_login import login_required
+from werkzeug.security import generate_password_hash
+from tamil_quotes_app import (app, db, Quote, get_quotes_page, encode_cursor, random_picker,
+                              like_buffer, create_search_index, search_quotes)
+from page_cache import create_cache
+
+USERS = 1000
+CATEGORIES = ['Education', 'Wisdom', 'Love', 'Life', 'Friendship', 'Nature']
+START_DATE = datetime(2020, 1, 1)
+FULL_LIST_LIMIT = 100000  # The old load-everything homepage is skipped above this
+LIKE_CLIENTS = 8  # Concurrent clients in the like load test
+LIKES_PER_CLIENT = 100
+HOT_QUOTES = 5  # Every like goes to one of the first few quotes
+PAGE_REQUESTS = 1000  # Requests per cache in the page load test
+PAGE_LOAD_LIMIT = 100000  # Uncached category pages get too slow above this
+
+# Quote text: words drawn from a made-up Tamil vocabulary with Zipf-like
+# frequencies, so search terms range from very common to rare
+CONSONANTS = 'கஙசஞடணதநபமயரலவழளறன'
+VOWEL_SIGNS = ['', 'ா', 'ி', 'ீ', 'ு', 'ூ', 'ெ', 'ே', 'ை', 'ொ', 'ோ', '்']
+VOCABULARY_SIZE = 20000
+WORDS_PER_QUOTE = 8
+ENGLISH_WORDS = ['love', 'wisdom', 'life', 'friend', 'world', 'learning', 'river',
+                 'elephant', 'rain', 'mother', 'truth', 'patience', 'time', 'heart']
+
+
+def make_vocabulary(rng):
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add(''.join(rng.choice(CONSONANTS) + rng.choice(VOWEL_SIGNS)
+                          for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    # Word k is about k times rarer than the most common word
+    cumulative, total = [], 0.0
+    for rank in range(1, len(words) + 1):
+        total += 1 / rank
+        cumulative.append(total)
+    return words, cumulative
+
+
+VOCABULARY, CUMULATIVE_FREQUENCY = make_vocabulary(random.Random(0))
+
+
+def create_database():
+    with app.app_context():
+        db.create_all()
+        create_search_index()
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.executemany(
+            'INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+            [(i, f'user{i}', f'user{i}@example.com', 'x') for i in range(1, USERS)] +
+            [(USERS, 'bench', 'bench@example.com', generate_password_hash('bench'))])
+
+
+def seed_quotes(start, stop, rng):
+    # Three quotes share every timestamp, so the id tie-break matters
+    rows = []
+    for i in range(start, stop):
+        date_added = START_DATE + timedelta(seconds=i // 3)
+        words = rng.choices(VOCABULARY, cum_weights=CUMULATIVE_FREQUENCY, k=WORDS_PER_QUOTE)
+        rows.append((' '.join(words), ' '.join(rng.sample(ENGLISH_WORDS, 3)),
+                     'Tamil Proverb', rng.choice(CATEGORIES),
+                     date_added.strftime('%Y-%m-%d %H:%M:%S.%f'),
+                     rng.randint(1, USERS), rng.randint(0, 50)))
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.executemany(
+            'INSERT INTO quote (content, english_translation, source, category, date_added, '
+            'user_id, likes) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def best_time(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def full_list():
+    # The homepage before pagination: every quote, then its author one by one
+    quotes = Quote.query.order_by(Quote.date_added.desc()).all()
+    for quote in quotes:
+        quote.author.username
+    db.session.remove()
+
+
+def offset_page(offset):
+    quotes = (Quote.query.order_by(Quote.date_added.desc(), Quote.id.desc())
+              .offset(offset).limit(20).all())
+    for quote in quotes:
+        quote.author.username
+    db.session.remove()
+
+
+def bench_index(size, client):
+    with app.app_context():
+        # A cursor nine tenths of the way down the newest-first listing
+        deep = Quote.query.order_by(Quote.date_added.desc(), Quote.id.desc()) \
+            .offset(size * 9 // 10).first()
+        cursor = encode_cursor(deep)
+        all_rows = best_time(full_list, 1) if size <= FULL_LIST_LIMIT else None
+        offset_deep = best_time(lambda: offset_page(size * 9 // 10))
+        first = best_time(lambda: (get_quotes_page(), db.session.remove()))
+        keyset_deep = best_time(lambda: (get_quotes_page(cursor), db.session.remove()))
+    api_deep = best_time(lambda: client.get(f'/api/quotes?cursor={cursor}'))
+    all_rows = f'{all_rows * 1e3:>9.1f}' if all_rows is not None else f"{'-':>9}"
+    return (f'{size:>10,} {all_rows} {offset_deep * 1e3:>12.2f} '
+            f'{first * 1e3:>13.2f} {keyset_deep * 1e3:>12.2f} {api_deep * 1e3:>9.2f}')
+
+
+def count_offset_pick():
+    # The random route before the picker: COUNT(*), then an OFFSET walk
+    count = Quote.query.count()
+    Quote.query.offset(random.randint(0, count - 1)).first()
+    db.session.remove()
+
+
+def picker_pick(weighted=False):
+    quote_id = random_picker.weighted_choice() if weighted else random_picker.choice()
+    db.session.get(Quote, quote_id)
+    db.session.remove()
+
+
+def bench_random(size, client):
+    picks = 200
+    with app.app_context():
+        # Raw inserts bypass the picker's tracking, so start from the database
+        random_picker.reset()
+        start = time.perf_counter()
+        random_picker.choice()
+        load = time.perf_counter() - start
+        start = time.perf_counter()
+        random_picker.weighted_choice()
+        build = time.perf_counter() - start
+        old = best_time(lambda: [count_offset_pick() for _ in range(20)], 1) / 20
+        uniform = best_time(lambda: [picker_pick() for _ in range(picks)], 3) / picks
+        weighted = best_time(lambda: [picker_pick(True) for _ in range(picks)], 3) / picks
+    return (f'{size:>10,} {old * 1e3:>12.3f} {uniform * 1e3:>8.3f} {weighted * 1e3:>9.3f} '
+            f'{load * 1e3:>9.1f} {build * 1e3:>11.1f}')
+
+
+def like_scan(word):
+    # Substring search without an index: reads every quote for rare words
+    quotes = Quote.query.filter(Quote.content.like(f'%{word}%')).limit(20).all()
+    db.session.remove()
+    return quotes
+
+
+def bench_search(size, client):
+    common, rare = VOCABULARY[0], VOCABULARY[5000]
+    queries = [common, VOCABULARY[100], rare, f'{VOCABULARY[1]} {VOCABULARY[2]}',
+               ENGLISH_WORDS[0], VOCABULARY[100][:3] + '*']
+    times = []
+    with app.app_context():
+        for query in queries:
+            times.append(best_time(lambda: (search_quotes(query), db.session.remove())))
+        # Page 50 of the results for the most common word
+        times.append(best_time(lambda: (search_quotes(common, 50), db.session.remove())))
+        times.append(best_time(lambda: like_scan(rare), 1))
+        start = time.perf_counter()
+        create_search_index(rebuild=True)
+        reindex = time.perf_counter() - start
+    api = best_time(lambda: client.get('/api/search', query_string={'q': rare}))
+    return (f'{size:>10,} ' + ' '.join(f'{t * 1e3:>9.2f}' for t in times) +
+            f' {api * 1e3:>9.2f} {reindex:>9.1f}')
+
+
+# The app ships without its templates; these render the same data
+QUOTE_LIST = '''<h1>{{ title }}</h1>
+{% for quote in quotes %}<div class="quote">
+  <p lang="ta">{{ quote.content }}</p><p>{{ quote.english_translation }}</p>
+  <p>{{ quote.source }} · {{ quote.category }} · {{ quote.author.username }}
+     · {{ quote.date_added.strftime('%Y-%m-%d') }} · {{ quote.total_likes }} likes</p>
+</div>{% endfor %}'''
+BENCH_TEMPLATES = {
+    'index.html': QUOTE_LIST.replace('{{ title }}', 'Tamil quotes'),
+    'category.html': QUOTE_LIST.replace('{{ title }}', '{{ category }}'),
+    'user_quotes.html': QUOTE_LIST.replace('{{ title }}', '{{ user.username }}'),
+    'quote.html': QUOTE_LIST.replace('{{ title }}', 'Random quote')
+                            .replace('{% for quote in quotes %}', '').replace('{% endfor %}', ''),
+}
+app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader(BENCH_TEMPLATES)])
+
+
+def page_load(cache, urls, use_etags=False):
+    # One anonymous reader, plus a signed-in user liking a quote now and then
+    tamil_quotes_app.page_cache = cache
+    reader, liker = app.test_client(), app.test_client()
+    liker.post('/login', data={'username': 'bench', 'password': 'bench'})
+    etags = {}
+    not_modified = 0
+    start = time.perf_counter()
+    for method, url in urls:
+        if method == 'POST':
+            liker.post(url)
+            continue
+        headers = {'If-None-Match': etags[url]} if url in etags else {}
+        response = reader.get(url, headers=headers)
+        not_modified += response.status_code == 304
+        if use_etags and response.headers.get('ETag'):
+            etags[url] = response.headers['ETag']
+    elapsed = time.perf_counter() - start
+    tamil_quotes_app.page_cache = None
+    return len(urls) / elapsed, not_modified / len(urls)
+
+
+def bench_pages(size, client):
+    if size > PAGE_LOAD_LIMIT:
+        return f'{size:>10,} ' + ' '.join(f"{'-':>9}" for _ in range(5))
+    # Read-heavy mix: mostly the first pages, categories, popular users and
+    # random quotes, with one request in a hundred a like
+    rng = random.Random(2)
+    with app.app_context():
+        cursors = [None]
+        for _ in range(9):
+            cursors.append(get_quotes_page(cursors[-1])[1])
+        first_page = [quote.id for quote in get_quotes_page()[0]]
+        db.session.remove()
+    choices = [
+        (40, lambda: ('GET', '/')),
+        (15, lambda: ('GET', f'/?cursor={rng.choice(cursors[1:])}')),
+        (15, lambda: ('GET', f'/category/{rng.choice(CATEGORIES)}')),
+        (14, lambda: ('GET', f'/user/user{rng.randint(1, 50)}')),
+        (15, lambda: ('GET', '/random')),
+        (1, lambda: ('POST', f'/api/like/{rng.choice(first_page)}')),
+    ]
+    weights = [weight for weight, _ in choices]
+    urls = [rng.choices(choices, weights)[0][1]() for _ in range(PAGE_REQUESTS)]
+
+    uncached, _ = page_load(None, urls)
+    memory, _ = page_load(create_cache('memory'), urls)
+    shared_path = os.path.join(os.path.dirname(DB_PATH), 'page_cache.db')
+    shared, _ = page_load(create_cache(f'sqlite:///{shared_path}'), urls)
+    revalidated, not_modified = page_load(create_cache('memory'), urls, use_etags=True)
+    return (f'{size:>10,} {uncached:>9,.0f} {memory:>9,.0f} {shared:>9,.0f} '
+            f'{revalidated:>9,.0f} {not_modified:>9.0%}')
+
+
+def old_like_quote(quote_id):
+    # The like route before the buffer: read, add one in Python, commit
+    quote = Quote.query.get_or_404(quote_id)
+    quote.likes += 1
+    db.session.commit()
+    return redirect(url_for('index'))
+
+app.add_url_rule('/bench/like/<int:quote_id>', 'old_like_quote', login_required(old_like_quote))
+
+
+def stored_likes():
+    with sqlite3.connect(DB_PATH) as conn:
+        return conn.execute('SELECT SUM(likes) FROM quote WHERE id <= ?',
+                            (HOT_QUOTES,)).fetchone()[0]
+
+
+def like_load(method, url):
+    # Every client logs in, then likes the hot quotes as fast as it can
+    failures = []
+
+    def client_likes(client_id):
+        client = app.test_client()
+        client.post('/login', data={'username': 'bench', 'password': 'bench'})
+        for i in range(LIKES_PER_CLIENT):
+            response = client.open(url.format((client_id + i) % HOT_QUOTES + 1), method=method)
+            if response.status_code >= 400:
+                failures.append(response.status_code)
+
+    before = stored_likes()
+    threads = [threading.Thread(target=client_likes, args=(client_id,))
+               for client_id in range(LIKE_CLIENTS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with app.app_context():
+        like_buffer.flush()
+    elapsed = time.perf_counter() - start
+    likes = LIKE_CLIENTS * LIKES_PER_CLIENT
+    lost = likes - len(failures) - (stored_likes() - before)
+    return likes / elapsed, lost, len(failures)
+
+
+def bench_likes(size, client):
+    old_rate, old_lost, old_failed = like_load('GET', '/bench/like/{}')
+    new_rate, new_lost, new_failed = like_load('POST', '/api/like/{}')
+    return (f'{size:>10,} {old_rate:>9,.0f} {old_lost:>9} {old_failed:>10} '
+            f'{new_rate:>9,.0f} {new_lost:>9} {new_failed:>10}')
+
+
+BENCHMARKS = [
+    ('Homepage listing (milliseconds per request)',
+     f"{'quotes':>10} {'all rows':>9} {'offset deep':>12} "
+     f"{'keyset first':>13} {'keyset deep':>12} {'api deep':>9}",
+     bench_index),
+    ('Random quote (milliseconds per pick; load and alias build are one-off)',
+     f"{'quotes':>10} {'count+offset':>12} {'picker':>8} {'weighted':>9} "
+     f"{'load ids':>9} {'alias table':>11}",
+     bench_random),
+    (f'Likes, {LIKE_CLIENTS} concurrent clients x {LIKES_PER_CLIENT} likes '
+     f'(likes per second, lost and failed likes)',
+     f"{'quotes':>10} {'old rate':>9} {'old lost':>9} {'old failed':>10} "
+     f"{'new rate':>9} {'new lost':>9} {'new failed':>10}",
+     bench_likes),
+    ('Search (milliseconds per query, reindex in seconds)',
+     f"{'quotes':>10} {'common':>9} {'rank 100':>9} {'rare':>9} {'two words':>9} "
+     f"{'english':>9} {'prefix':>9} {'page 50':>9} {'like scan':>9} {'api rare':>9} "
+     f"{'reindex':>9}",
+     bench_search),
+    (f'Read-heavy page load, {PAGE_REQUESTS} requests (requests per second)',
+     f"{'quotes':>10} {'no cache':>9} {'memory':>9} {'sqlite':>9} {'etags':>9} {'304s':>9}",
+     bench_pages),
+]
+
+
+if __name__ == '__main__':
+    sizes = sorted(int(arg) for arg in sys.argv[1:]) or [10000, 100000, 1000000]
+    rng = random.Random(1)
+    client = app.test_client()
+    rows = [[] for _ in BENCHMARKS]
+    seeded = 0
+    try:
+        create_database()
+        for size in sizes:
+            seed_quotes(seeded, size, rng)
+            seeded = size
+            for results, (_, _, bench) in zip(rows, BENCHMARKS):
+                results.append(bench(size, client))
+    finally:
+        # Write any buffered likes while the database still exists, rather
+        # than from the exit hook after it is gone
+        with app.app_context():
+            like_buffer.flush()
+            db.engine.dispose()
+        shutil.rmtree(os.path.dirname(DB_PATH))
+    for results, (title, header, _) in zip(rows, BENCHMARKS):
+        print(title)
+        print(header)
+        print('\n'.join(results))
+        print()
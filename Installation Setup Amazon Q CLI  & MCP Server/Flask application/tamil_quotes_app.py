@@ -1,16 +1,65 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, session
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from sqlalchemy.orm import joinedload
 from werkzeug.security import generate_password_hash, check_password_hash
+from page_cache import create_cache
 import os
+import hashlib
+import time
+import atexit
+import threading
+import unicodedata
+import click
+from array import array
 from datetime import datetime
 import random
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tamil_quotes.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///tamil_quotes.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Rendered page cache: 'memory', 'sqlite:///path/to/cache.db' (shared by all
+# worker processes on the machine) or 'none'
+app.config['PAGE_CACHE'] = os.environ.get('PAGE_CACHE', 'memory')
+
+# Quotes shown per page of the homepage and the infinite-scroll API
+QUOTES_PER_PAGE = 20
+
+# Cached pages expire after this many seconds; the least recently used go
+# first once there are more than PAGE_CACHE_ENTRIES
+PAGE_CACHE_TTL = 300
+PAGE_CACHE_ENTRIES = 1000
+
+# Seconds a likes-weighted random pick may work from stale like counts
+WEIGHTED_REFRESH_SECONDS = 60
+
+# Picks the random quote route tries before giving up on deleted quotes
+RANDOM_QUOTE_ATTEMPTS = 5
+
+# How often the random picker looks for quotes added by other processes, and
+# reloads all ids to drop the ones they deleted (seconds)
+RANDOM_IDS_CHECK_SECONDS = 5
+RANDOM_IDS_RELOAD_SECONDS = 600
+
+# Likes are buffered in memory and written in one batch this often (seconds)
+LIKE_FLUSH_SECONDS = 2
+
+# Written like batches kept to tell whether a quote row read earlier already
+# includes them (a minute of flushes)
+LIKE_BATCHES_KEPT = 30
+
+# Search uses SQLite's unicode61 tokenizer. On its own it treats Tamil vowel
+# signs and the virama as separators and splits every word into pieces, so
+# all combining marks of the Tamil block are declared token characters.
+TAMIL_MARKS = ''.join(chr(code) for code in range(0x0B80, 0x0C00)
+                      if unicodedata.category(chr(code)).startswith('M'))
+SEARCH_TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{TAMIL_MARKS}'"
+
+# Search ranks only this many of the newest matches, so a word found in half
+# of all quotes costs no more than a rare one
+SEARCH_RANK_LIMIT = 5000
 
 # Initialize SQLAlchemy
 db = SQLAlchemy(app)
@@ -35,14 +84,43 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 class Quote(db.Model):
+    # Newest-first pages are ranges of this index, however deep they go
+    __table_args__ = (db.Index('ix_quote_date_added_id', 'date_added', 'id'),)
+    
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     english_translation = db.Column(db.Text)
     source = db.Column(db.String(200))
-    category = db.Column(db.String(50))
+    category = db.Column(db.String(50), index=True)
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     likes = db.Column(db.Integer, default=0)
+    # Number of the last like flush that added to likes. A new quote starts
+    # at the current number, so likes of a deleted quote whose id SQLite
+    # hands out again are not counted for it.
+    likes_flushed = db.Column(db.Integer, default=db.text('(SELECT number FROM like_flush)'))
+    
+    @property
+    def total_likes(self):
+        # Stored likes plus those still waiting in the like buffer
+        return (self.likes or 0) + like_buffer.pending(self.id, self.likes_flushed)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content': self.content,
+            'english_translation': self.english_translation,
+            'source': self.source,
+            'category': self.category,
+            'date_added': self.date_added.isoformat(),
+            'author': self.author.username,
+            'likes': self.total_likes
+        }
+
+class LikeFlush(db.Model):
+    # A single row numbering like flushes across every process
+    id = db.Column(db.Integer, primary_key=True)
+    number = db.Column(db.Integer, nullable=False, default=0)
 
 # Sample quotes data
 sample_quotes = [
@@ -66,25 +144,445 @@ sample_quotes = [
     }
 ]
 
+# Random quotes: the ids of all quotes are kept in memory, so a pick is one
+# primary key lookup instead of COUNT(*) plus an OFFSET scan of the table
+class RandomQuotePicker:
+    def __init__(self):
+        self.ids = None  # Loaded from the database on first use
+        self.positions = {}  # Id -> its index in ids, so removing one is O(1)
+        self.max_id = 0  # Ids above this were added since, maybe elsewhere
+        self.loaded_at = 0
+        self.checked_at = 0
+        self.weighted = None  # (ids, probabilities, aliases) for picking by likes
+        self.weighted_at = 0
+        self.lock = threading.Lock()
+    
+    def reset(self):
+        with self.lock:
+            self.ids = None
+            self.positions = {}
+            self.max_id = 0
+            self.weighted = None
+            self.weighted_at = 0
+    
+    def add(self, quote_id):
+        with self.lock:
+            self._add(quote_id)
+    
+    def _add(self, quote_id):
+        if self.ids is not None and quote_id not in self.positions:
+            self.positions[quote_id] = len(self.ids)
+            self.ids.append(quote_id)
+            self.max_id = max(self.max_id, quote_id)
+    
+    def remove(self, quote_id):
+        with self.lock:
+            if self.ids is None:
+                return
+            index = self.positions.pop(quote_id, None)
+            if index is None:
+                return
+            # Move the last id into the gap so the array stays dense
+            last = self.ids.pop()
+            if last != quote_id:
+                self.ids[index] = last
+                self.positions[last] = index
+    
+    def _refresh(self):
+        # Other worker processes add and delete quotes too. Their new quotes
+        # have higher ids, found with a primary key range scan; their
+        # deletions are dropped by the next full reload (or when picked).
+        now = time.monotonic()
+        if self.ids is None or now - self.loaded_at > RANDOM_IDS_RELOAD_SECONDS:
+            self.ids = array('q', (quote_id for quote_id, in query_rows('SELECT id FROM quote')))
+            self.positions = {quote_id: index for index, quote_id in enumerate(self.ids)}
+            self.max_id = max(self.ids, default=0)
+            self.loaded_at = self.checked_at = now
+        elif now - self.checked_at > RANDOM_IDS_CHECK_SECONDS:
+            for quote_id, in query_rows('SELECT id FROM quote WHERE id > ?', (self.max_id,)):
+                self._add(quote_id)
+            self.checked_at = now
+    
+    def choice(self):
+        with self.lock:
+            self._refresh()
+            if not self.ids:
+                return None
+            return self.ids[random.randrange(len(self.ids))]
+    
+    def weighted_choice(self):
+        # Walker's alias method: a pick is one uniform index and one coin flip.
+        # Weights are likes + 1 so quotes nobody has liked yet still come up.
+        with self.lock:
+            table = self.weighted
+            rebuild = (table is None or
+                       time.monotonic() - self.weighted_at > WEIGHTED_REFRESH_SECONDS)
+            if rebuild:
+                self.weighted_at = time.monotonic()
+        if rebuild:
+            # Built outside the lock; other requests use the old table meanwhile
+            table = build_alias_table(query_rows('SELECT id, likes FROM quote'))
+            with self.lock:
+                self.weighted = table
+        
+        ids, probabilities, aliases = table
+        if not ids:
+            return None
+        index = random.randrange(len(ids))
+        if random.random() >= probabilities[index]:
+            index = aliases[index]
+        return ids[index]
+
+def query_rows(sql, params=()):
+    # Straight from the database driver: ORM rows cost several times as much,
+    # which adds up over a million quotes
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def build_alias_table(rows):
+    ids = array('q', (quote_id for quote_id, _ in rows))
+    weights = [(likes or 0) + 1 for _, likes in rows]
+    count = len(weights)
+    scale = count / sum(weights) if count else 0
+    probabilities = array('d', (weight * scale for weight in weights))
+    aliases = array('q', range(count))
+    
+    # Pair every underfull column with an overfull one that tops it up
+    small = [index for index in range(count) if probabilities[index] < 1]
+    large = [index for index in range(count) if probabilities[index] >= 1]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        aliases[less] = more
+        probabilities[more] -= 1 - probabilities[less]
+        (small if probabilities[more] < 1 else large).append(more)
+    for index in small + large:
+        probabilities[index] = 1
+    return ids, probabilities, aliases
+
+random_picker = RandomQuotePicker()
+
+# Keep the picker and the page cache in step with quotes added or deleted
+# through the ORM, once the change is committed (bulk query deletes bypass this)
+@db.event.listens_for(db.session, 'after_flush')
+def track_quote_changes(session, flush_context):
+    # Objects are expired once committed, so note what is needed now
+    changes = session.info.setdefault('quote_changes', [])
+    changes += [(True, obj.id, obj.category, obj.user_id)
+                for obj in session.new if isinstance(obj, Quote)]
+    changes += [(False, obj.id, obj.category, obj.user_id)
+                for obj in session.deleted if isinstance(obj, Quote)]
+
+@db.event.listens_for(db.session, 'after_commit')
+def apply_quote_changes(session):
+    for added, quote_id, category, user_id in session.info.pop('quote_changes', ()):
+        tags = quote_tags(quote_id, category, user_id)
+        if added:
+            random_picker.add(quote_id)
+            # A new quote is the newest, so no page after the first moves
+            invalidate_pages(tags[1:] + ['quotes:newest'])
+        else:
+            random_picker.remove(quote_id)
+            invalidate_pages(tags)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def discard_quote_changes(session):
+    session.info.pop('quote_changes', None)
+
+# Likes: a click only bumps an in-memory counter. A background thread adds
+# all counters to the table in one transaction every LIKE_FLUSH_SECONDS, as
+# likes = likes + delta, so concurrent clicks cannot overwrite each other.
+#
+# Each flush takes the next number from like_flush and stamps it on the rows
+# it writes. Flushes commit in number order, so a row read with
+# likes_flushed = n already holds exactly the batches numbered up to n.
+class LikeBuffer:
+    def __init__(self):
+        self.deltas = {}  # Quote id -> likes not yet written
+        self.batches = []  # [number, deltas] of recent flushes, oldest first
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # One flush at a time
+        self.thread = None
+    
+    def add(self, quote_id, count=1):
+        with self.lock:
+            self.deltas[quote_id] = self.deltas.get(quote_id, 0) + count
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+    
+    def pending(self, quote_id, seen):
+        # Likes missing from a quote row read with likes_flushed = seen; a
+        # batch still being written has no number yet and counts as missing
+        seen = seen or 0
+        with self.lock:
+            return self.deltas.get(quote_id, 0) + sum(
+                batch.get(quote_id, 0) for number, batch in self.batches
+                if number is None or number > seen)
+    
+    def flush(self):
+        # The background thread and the exit hook can both flush; a second
+        # flush waits, or it would replace the batch the first is writing
+        with self.flush_lock:
+            with self.lock:
+                if not self.deltas:
+                    return 0
+                written = [None, self.deltas]
+                batch = self.deltas
+                self.deltas = {}
+                self.batches.append(written)
+                del self.batches[:-LIKE_BATCHES_KEPT]
+            try:
+                with db.engine.begin() as conn:
+                    # The first write locks the database, so numbers follow
+                    # commit order
+                    conn.execute(db.text('UPDATE like_flush SET number = number + 1'))
+                    number = conn.execute(db.text('SELECT number FROM like_flush')).scalar_one()
+                    with self.lock:
+                        written[0] = number
+                    conn.execute(db.text('UPDATE quote SET likes = COALESCE(likes, 0) + :delta, '
+                                         'likes_flushed = :number WHERE id = :id'),
+                                 [{'id': quote_id, 'delta': delta, 'number': number}
+                                  for quote_id, delta in batch.items()])
+            except Exception:
+                # Keep the likes for the next flush
+                with self.lock:
+                    self.batches.remove(written)
+                    for quote_id, delta in batch.items():
+                        self.deltas[quote_id] = self.deltas.get(quote_id, 0) + delta
+                raise
+            # Pages cached by other processes never counted these likes
+            invalidate_pages([f'quote:{quote_id}' for quote_id in batch])
+            return len(batch)
+    
+    def run(self):
+        while True:
+            time.sleep(LIKE_FLUSH_SECONDS)
+            try:
+                with app.app_context():
+                    self.flush()
+            except Exception as error:
+                app.logger.warning('Could not save likes: %s', error)
+
+like_buffer = LikeBuffer()
+
+@atexit.register
+def flush_likes():
+    try:
+        with app.app_context():
+            like_buffer.flush()
+    except Exception as error:
+        app.logger.warning('Could not save likes: %s', error)
+
+# Full-text search: an FTS5 index over the quote text that refers back to the
+# quote table for its contents. Triggers keep it in step with inserts,
+# deletes and text edits (like counts changing do not touch it).
+SEARCH_INDEX_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS quote_fts USING fts5(
+        content, english_translation, source,
+        content='quote', content_rowid='id', tokenize="{SEARCH_TOKENIZER}")""",
+    """CREATE TRIGGER IF NOT EXISTS quote_fts_insert AFTER INSERT ON quote BEGIN
+        INSERT INTO quote_fts(rowid, content, english_translation, source)
+        VALUES (new.id, new.content, new.english_translation, new.source);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS quote_fts_delete AFTER DELETE ON quote BEGIN
+        INSERT INTO quote_fts(quote_fts, rowid, content, english_translation, source)
+        VALUES ('delete', old.id, old.content, old.english_translation, old.source);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS quote_fts_update
+    AFTER UPDATE OF content, english_translation, source ON quote BEGIN
+        INSERT INTO quote_fts(quote_fts, rowid, content, english_translation, source)
+        VALUES ('delete', old.id, old.content, old.english_translation, old.source);
+        INSERT INTO quote_fts(rowid, content, english_translation, source)
+        VALUES (new.id, new.content, new.english_translation, new.source);
+    END""",
+]
+
+def create_search_index(rebuild=False):
+    with db.engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'quote_fts'").first()
+        for statement in SEARCH_INDEX_SQL:
+            conn.exec_driver_sql(statement)
+        # A new index on an existing table starts out empty
+        if rebuild or not exists:
+            conn.exec_driver_sql("INSERT INTO quote_fts(quote_fts) VALUES ('rebuild')")
+            conn.exec_driver_sql("INSERT INTO quote_fts(quote_fts) VALUES ('optimize')")
+
+@app.cli.command('reindex-search')
+def reindex_search_command():
+    """Rebuild the full-text search index from the quote table."""
+    start = time.perf_counter()
+    create_search_index(rebuild=True)
+    click.echo(f'Search index rebuilt in {time.perf_counter() - start:.1f}s')
+
+def search_expression(text):
+    # Every word has to match. A trailing * matches words starting with it,
+    # useful as Tamil joins suffixes onto words (அன்பு* finds அன்புக்கும்).
+    # Quoting each word keeps other FTS5 query syntax in the input inert.
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*') and len(word) > 1
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    return ' '.join(terms)
+
+def search_quotes(text, page=1, per_page=QUOTES_PER_PAGE):
+    expression = search_expression(text)
+    if not expression:
+        return [], False
+    
+    # Best matches first (bm25) among the newest SEARCH_RANK_LIMIT; one extra
+    # row tells whether there is a next page
+    rows = db.session.execute(db.text(
+        'SELECT rowid FROM (SELECT rowid, rank FROM quote_fts WHERE quote_fts MATCH :expression '
+        'ORDER BY rowid DESC LIMIT :candidates) '
+        'ORDER BY rank LIMIT :limit OFFSET :offset'),
+        {'expression': expression, 'candidates': SEARCH_RANK_LIMIT,
+         'limit': per_page + 1, 'offset': (page - 1) * per_page}).all()
+    ids = [row[0] for row in rows[:per_page]]
+    quotes = Quote.query.options(joinedload(Quote.author)).filter(Quote.id.in_(ids)).all()
+    by_id = {quote.id: quote for quote in quotes}
+    return [by_id[quote_id] for quote_id in ids if quote_id in by_id], len(rows) > per_page
+
+# Page cache: rendered pages are kept per URL and signed-in user, tagged
+# with the quotes, category and author they show. Adding, deleting or liking
+# a quote drops just the pages carrying its tags.
+page_cache = create_cache(app.config['PAGE_CACHE'], PAGE_CACHE_ENTRIES, PAGE_CACHE_TTL)
+
+def quote_tags(quote_id, category, user_id):
+    return [f'quote:{quote_id}', f'category:{category}', f'user:{user_id}']
+
+def invalidate_pages(tags):
+    if page_cache is not None:
+        page_cache.invalidate(tags)
+
+def cached_page(render, key=None):
+    # render returns (response, tags), or None when there is nothing to show.
+    # Pages with a flashed message are shown once, so they are not cached.
+    user = current_user.get_id() if current_user.is_authenticated else ''
+    key = f'{key or request.full_path}|{user}'
+    use_cache = page_cache is not None and '_flashes' not in session
+    entry = page_cache.get(key) if use_cache else None
+    if entry is None:
+        # A quote changed while the page renders may show its old state, so
+        # the page is only stored if none of its tags changed since here
+        since = page_cache.version() if use_cache else None
+        result = render()
+        if result is None:
+            return None
+        response = app.make_response(result[0])
+        if response.status_code != 200:
+            return response
+        body = response.get_data()
+        entry = (body, response.mimetype, hashlib.md5(body).hexdigest())
+        if use_cache:
+            page_cache.set(key, entry, result[1], since)
+    
+    # Browsers revalidate every time, so a changed page shows at once, and
+    # an unchanged one costs a 304 without a body
+    body, mimetype, etag = entry
+    response = app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def listing_tags(quotes, cursor):
+    tags = [f'quote:{quote.id}' for quote in quotes]
+    if not cursor:
+        tags.append('quotes:newest')
+    return tags
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
+# Keyset pagination: a page continues after the (date_added, id) of the last
+# quote on the previous page instead of skipping rows with OFFSET
+def encode_cursor(quote):
+    return f"{quote.date_added.isoformat()}_{quote.id}"
+
+def decode_cursor(cursor):
+    try:
+        date_added, quote_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(date_added), int(quote_id)
+    except ValueError:
+        abort(400)
+
+def get_quotes_page(cursor=None, per_page=QUOTES_PER_PAGE):
+    # Authors come in the same query rather than one query per quote
+    query = Quote.query.options(joinedload(Quote.author)).order_by(
+        Quote.date_added.desc(), Quote.id.desc())
+    if cursor:
+        query = query.filter(db.tuple_(Quote.date_added, Quote.id) < decode_cursor(cursor))
+    
+    # One extra row tells whether there is a next page
+    quotes = query.limit(per_page + 1).all()
+    next_cursor = encode_cursor(quotes[per_page - 1]) if len(quotes) > per_page else None
+    return quotes[:per_page], next_cursor
+
 # Routes
 @app.route('/')
 def index():
-    quotes = Quote.query.order_by(Quote.date_added.desc()).all()
-    return render_template('index.html', quotes=quotes)
+    def render():
+        cursor = request.args.get('cursor')
+        quotes, next_cursor = get_quotes_page(cursor)
+        return (render_template('index.html', quotes=quotes, next_cursor=next_cursor),
+                listing_tags(quotes, cursor))
+    return cached_page(render)
+
+@app.route('/api/quotes')
+def api_quotes():
+    # Infinite scroll: fetch the next page with ?cursor=<next_cursor>
+    def render():
+        cursor = request.args.get('cursor')
+        quotes, next_cursor = get_quotes_page(cursor)
+        return (jsonify(quotes=[quote.to_dict() for quote in quotes], next_cursor=next_cursor),
+                listing_tags(quotes, cursor))
+    return cached_page(render)
 
 @app.route('/random')
 def random_quote():
-    quotes_count = Quote.query.count()
-    if quotes_count > 0:
-        random_index = random.randint(0, quotes_count - 1)
-        quote = Quote.query.offset(random_index).first()
-        return render_template('quote.html', quote=quote)
+    # ?weighted=1 favours well-liked quotes
+    weighted = request.args.get('weighted') == '1'
+    for _ in range(RANDOM_QUOTE_ATTEMPTS):
+        quote_id = random_picker.weighted_choice() if weighted else random_picker.choice()
+        if quote_id is None:
+            break
+        def render():
+            quote = db.session.get(Quote, quote_id)
+            if quote is None:
+                return None
+            return (render_template('quote.html', quote=quote),
+                    quote_tags(quote.id, quote.category, quote.user_id))
+        # Cached per quote, whichever way it was picked
+        response = cached_page(render, key=f'/quote/{quote_id}')
+        if response is not None:
+            return response
+        # Deleted by another process since the ids were loaded
+        random_picker.remove(quote_id)
     return redirect(url_for('index'))
 
+@app.route('/search')
+def search():
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    quotes, has_next = search_quotes(query, page)
+    return render_template('search.html', quotes=quotes, query=query, page=page,
+                           has_next=has_next)
+
+@app.route('/api/search')
+def api_search():
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    quotes, has_next = search_quotes(query, page)
+    return jsonify(quotes=[quote.to_dict() for quote in quotes], page=page,
+                   next_page=page + 1 if has_next else None)
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -157,30 +655,60 @@ def add_quote():
     
     return render_template('add_quote.html')
 
+def buffer_like(quote_id):
+    # Only the stored count and cache tags are read, which also checks that
+    # the quote exists
+    row = db.session.query(Quote.likes, Quote.likes_flushed, Quote.category,
+                           Quote.user_id).filter_by(id=quote_id).first()
+    if row is None:
+        abort(404)
+    like_buffer.add(quote_id)
+    invalidate_pages(quote_tags(quote_id, row.category, row.user_id))
+    return (row.likes or 0) + like_buffer.pending(quote_id, row.likes_flushed)
+
 @app.route('/like/<int:quote_id>')
 @login_required
 def like_quote(quote_id):
-    quote = Quote.query.get_or_404(quote_id)
-    quote.likes += 1
-    db.session.commit()
+    buffer_like(quote_id)
     return redirect(url_for('index'))
 
+@app.route('/api/like/<int:quote_id>', methods=['POST'])
+@login_required
+def api_like_quote(quote_id):
+    return jsonify(id=quote_id, likes=buffer_like(quote_id))
+
 @app.route('/category/<category>')
 def category(category):
-    quotes = Quote.query.filter_by(category=category).all()
-    return render_template('category.html', quotes=quotes, category=category)
+    def render():
+        quotes = Quote.query.options(joinedload(Quote.author)).filter_by(category=category).all()
+        return (render_template('category.html', quotes=quotes, category=category),
+                [f'category:{category}'])
+    return cached_page(render)
 
 @app.route('/user/<username>')
 def user_quotes(username):
-    user = User.query.filter_by(username=username).first_or_404()
-    quotes = Quote.query.filter_by(user_id=user.id).all()
-    return render_template('user_quotes.html', quotes=quotes, user=user)
+    def render():
+        user = User.query.filter_by(username=username).first_or_404()
+        quotes = Quote.query.options(joinedload(Quote.author)).filter_by(user_id=user.id).all()
+        return (render_template('user_quotes.html', quotes=quotes, user=user),
+                [f'user:{user.id}'])
+    return cached_page(render)
 
 # Initialize the database and add sample quotes
 @app.before_first_request
 def initialize_database():
     db.create_all()
     
+    # create_all skips indexes and columns added to tables that already exist
+    for index in Quote.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('quote')}
+    with db.engine.begin() as conn:
+        if 'likes_flushed' not in columns:
+            conn.exec_driver_sql('ALTER TABLE quote ADD COLUMN likes_flushed INTEGER DEFAULT 0')
+        conn.exec_driver_sql('INSERT OR IGNORE INTO like_flush (id, number) VALUES (1, 0)')
+    create_search_index()
+    
     # Check if there are any users
     if User.query.count() == 0:
         # Create admin user
@@ -0,0 +1,432 @@
+import os
+import hashlib
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+# The app reads its database and page cache settings on import
+DB_DIR = tempfile.mkdtemp(prefix='tamil-quotes-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'quotes.db')}"
+os.environ['PAGE_CACHE'] = 'none'
+
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+import tamil_quotes_app as quotes_app
+from tamil_quotes_app import app, db, Quote, User
+from page_cache import MemoryCache, SqliteCache
+
+@pytest.fixture(scope='module', autouse=True)
+def database():
+    with app.app_context():
+        quotes_app.initialize_database()
+    yield
+    with app.app_context():
+        quotes_app.like_buffer.flush()
+        db.engine.dispose()
+    shutil.rmtree(DB_DIR, ignore_errors=True)
+
+@pytest.fixture
+def ctx():
+    # Every test starts from an empty quote table
+    with app.app_context():
+        Quote.query.delete()
+        db.session.commit()
+        quotes_app.random_picker.reset()
+        quotes_app.like_buffer.deltas.clear()
+        quotes_app.like_buffer.batches.clear()
+        yield
+        db.session.rollback()
+
+@pytest.fixture
+def client(ctx):
+    return app.test_client()
+
+def add_quotes(count, start=datetime(2024, 1, 1), step=timedelta(minutes=1),
+               content='quote {}'):
+    user = User.query.filter_by(username='admin').one()
+    quotes = [Quote(content=content.format(i), english_translation=f'translation {i}',
+                    source='test', category=f'category{i % 3}', user_id=user.id,
+                    date_added=start + step * i)
+              for i in range(count)]
+    db.session.add_all(quotes)
+    db.session.commit()
+    return quotes
+
+def newest_first(quotes):
+    return [quote.id for quote in sorted(quotes, key=lambda q: (q.date_added, q.id),
+                                         reverse=True)]
+
+def scroll(client, url='/api/quotes'):
+    ids, cursor = [], None
+    while True:
+        data = client.get(url + (f'?cursor={cursor}' if cursor else '')).get_json()
+        ids += [quote['id'] for quote in data['quotes']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            return ids
+
+def test_cursor_round_trip(ctx):
+    quote = add_quotes(1)[0]
+    with app.test_request_context():
+        assert quotes_app.decode_cursor(quotes_app.encode_cursor(quote)) == \
+            (quote.date_added, quote.id)
+
+def test_keyset_pages_cover_every_quote_once(client):
+    # Runs of equal timestamps must not be split or repeated across pages
+    quotes = add_quotes(95, step=timedelta(0))
+    quotes += add_quotes(50, start=datetime(2024, 2, 1))
+    ids = scroll(client)
+    assert ids == newest_first(quotes)
+
+def test_keyset_pages_stay_put_when_quotes_are_added(client):
+    quotes = add_quotes(60)
+    first = client.get('/api/quotes').get_json()
+    assert len(first['quotes']) == quotes_app.QUOTES_PER_PAGE
+    # A newer quote pushes OFFSET pages along; a cursor page does not move
+    add_quotes(5, start=datetime(2025, 1, 1))
+    second = client.get(f"/api/quotes?cursor={first['next_cursor']}").get_json()
+    expected = newest_first(quotes)
+    assert [quote['id'] for quote in second['quotes']] == \
+        expected[quotes_app.QUOTES_PER_PAGE:2 * quotes_app.QUOTES_PER_PAGE]
+
+def test_bad_cursor_is_rejected(client):
+    for cursor in ['nonsense', '2024-01-01T00:00:00_x', '_5']:
+        assert client.get(f'/api/quotes?cursor={cursor}').status_code == 400
+
+def test_last_page_has_no_cursor(client):
+    add_quotes(quotes_app.QUOTES_PER_PAGE)
+    data = client.get('/api/quotes').get_json()
+    assert len(data['quotes']) == quotes_app.QUOTES_PER_PAGE
+    assert data['next_cursor'] is None
+
+def test_picker_remove_keeps_ids_and_positions_consistent(ctx):
+    picker = quotes_app.random_picker
+    ids = {quote.id for quote in add_quotes(50)}
+    picker.choice()
+    rng = quotes_app.random.Random(1)
+    for _ in range(200):
+        quote_id = rng.randrange(1, 80)
+        if rng.random() < 0.5:
+            picker.remove(quote_id)
+            ids.discard(quote_id)
+        else:
+            picker.add(quote_id)
+            ids.add(quote_id)
+        assert sorted(picker.ids) == sorted(ids)
+        assert all(picker.ids[index] == quote_id
+                   for quote_id, index in picker.positions.items())
+
+def test_picker_finds_quotes_added_elsewhere(ctx, monkeypatch):
+    picker = quotes_app.random_picker
+    add_quotes(3)
+    picker.choice()
+    # Written by another process: no session events reach this picker
+    with db.engine.begin() as conn:
+        conn.execute(db.text("INSERT INTO quote (content, user_id, date_added) "
+                             "VALUES ('elsewhere', 1, '2024-06-01')"))
+    new_id = db.session.query(db.func.max(Quote.id)).scalar()
+    assert new_id not in picker.ids
+    monkeypatch.setattr(quotes_app, 'RANDOM_IDS_CHECK_SECONDS', 0)
+    picker.choice()
+    assert new_id in picker.ids and len(picker.ids) == 4
+
+def test_picker_reload_drops_quotes_deleted_elsewhere(ctx, monkeypatch):
+    picker = quotes_app.random_picker
+    quotes = add_quotes(3)
+    picker.choice()
+    with db.engine.begin() as conn:
+        conn.execute(db.text('DELETE FROM quote WHERE id = :id'), {'id': quotes[0].id})
+    monkeypatch.setattr(quotes_app, 'RANDOM_IDS_RELOAD_SECONDS', 0)
+    picker.choice()
+    assert sorted(picker.ids) == sorted(quote.id for quote in quotes[1:])
+
+def stored_likes(quote_id):
+    db.session.expire_all()
+    return db.session.get(Quote, quote_id).likes or 0
+
+def test_likes_are_buffered_then_flushed(client):
+    quote = add_quotes(1)[0]
+    assert client.post('/login', data={'username': 'admin', 'password': 'admin123'}).status_code == 302
+    for count in range(1, 4):
+        response = client.post(f'/api/like/{quote.id}')
+        assert response.get_json() == {'id': quote.id, 'likes': count}
+    assert stored_likes(quote.id) == 0
+    assert quotes_app.like_buffer.flush() == 1
+    assert stored_likes(quote.id) == 3
+    assert quote.total_likes == 3
+    assert client.post(f'/api/like/{quote.id}').get_json()['likes'] == 4
+    assert client.post('/api/like/999999').status_code == 404
+
+def test_concurrent_flushes_lose_no_likes(ctx):
+    quotes = add_quotes(5)
+    buffer = quotes_app.like_buffer
+    errors = []
+
+    def work(seed):
+        rng = quotes_app.random.Random(seed)
+        try:
+            with app.app_context():
+                for _ in range(200):
+                    buffer.add(quotes[rng.randrange(5)].id)
+                    if rng.random() < 0.1:
+                        buffer.flush()
+        except Exception as error:
+            errors.append(error)
+
+    threads = [quotes_app.threading.Thread(target=work, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    buffer.flush()
+    assert errors == []
+    assert sum(stored_likes(quote.id) for quote in quotes) == 800
+
+def test_failed_flush_keeps_likes(ctx, monkeypatch):
+    quote = add_quotes(1)[0]
+    buffer = quotes_app.like_buffer
+    buffer.add(quote.id, 2)
+
+    def broken(sql):
+        raise RuntimeError('database is down')
+
+    monkeypatch.setattr(quotes_app.db, 'text', broken)
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    monkeypatch.undo()
+    assert buffer.pending(quote.id, quote.likes_flushed) == 2
+    buffer.flush()
+    assert stored_likes(quote.id) == 2
+
+def test_like_counts_stay_right_while_a_flush_commits(ctx):
+    quote = add_quotes(1)[0]
+    buffer = quotes_app.like_buffer
+    buffer.add(quote.id, 2)
+    buffer.flush()
+    buffer.add(quote.id, 3)
+    counts = []
+
+    def read_likes():
+        # Rows read on another connection, as a concurrent request would
+        with db.engine.connect() as conn:
+            likes, seen = conn.execute(db.text('SELECT likes, likes_flushed FROM quote '
+                                               'WHERE id = :id'), {'id': quote.id}).one()
+        return likes + buffer.pending(quote.id, seen)
+
+    def commit(conn):
+        counts.append(read_likes())  # Just before the batch commits
+
+    db.event.listen(db.engine, 'commit', commit)
+    try:
+        with db.engine.connect() as conn:
+            row = conn.execute(db.text('SELECT likes, likes_flushed FROM quote WHERE id = :id'),
+                               {'id': quote.id}).one()
+        buffer.flush()
+    finally:
+        db.event.remove(db.engine, 'commit', commit)
+    # Read before the commit, counted after it: no batch is lost
+    counts.append(row.likes + buffer.pending(quote.id, row.likes_flushed))
+    # Read after the commit: the batch is not counted twice
+    counts.append(read_likes())
+    assert counts == [5, 5, 5]
+    db.session.expire_all()
+    assert quote.total_likes == 5
+
+def test_likes_of_a_deleted_quote_do_not_pass_to_its_id(ctx):
+    quote = add_quotes(1)[0]
+    quote_id = quote.id
+    quotes_app.like_buffer.add(quote_id, 4)
+    quotes_app.like_buffer.flush()
+    db.session.delete(quote)
+    db.session.commit()
+    # SQLite reuses the highest id once it is free
+    reborn = add_quotes(1)[0]
+    assert reborn.id == quote_id
+    assert reborn.total_likes == 0
+
+def test_flush_invalidates_cached_pages(ctx, monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(quotes_app, 'page_cache', cache)
+    quote, other = add_quotes(2)
+    cache.set('quote page', 'page', [f'quote:{quote.id}'])
+    cache.set('other page', 'page', [f'quote:{other.id}'])
+    quotes_app.like_buffer.add(quote.id)
+    quotes_app.like_buffer.flush()
+    assert cache.get('quote page') is None
+    assert cache.get('other page') == 'page'
+
+def test_exit_hook_logs_instead_of_raising(ctx, monkeypatch, caplog):
+    def broken():
+        raise RuntimeError('attempt to write a readonly database')
+
+    monkeypatch.setattr(quotes_app.like_buffer, 'flush', broken)
+    quotes_app.flush_likes()
+    assert 'Could not save likes' in caplog.text
+
+def search_ids(query, page=1):
+    return [quote.id for quote in quotes_app.search_quotes(query, page)[0]]
+
+def test_search_expression_quotes_words():
+    assert quotes_app.search_expression('அன்பு  love') == '"அன்பு" "love"'
+    assert quotes_app.search_expression('அன்பு*') == '"அன்பு"*'
+    # FTS5 operators and quotes in the input are matched as plain words
+    assert quotes_app.search_expression('a OR "b" NEAR(c') == '"a" "OR" """b""" "NEAR(c"'
+    assert quotes_app.search_expression('* ** ') == ''
+
+def test_search_matches_whole_tamil_words_and_prefixes(ctx):
+    love, friend, both = add_quotes(3, content='{}')
+    love.content = 'அன்புக்கும் உண்டோ அடைக்குந்தாழ்'
+    friend.content = 'நட்புக்கும் உண்டோ'
+    both.content = 'அன்பு நட்பு'
+    db.session.commit()
+    # Combining vowel signs must not split Tamil words apart
+    assert search_ids('அன்பு') == [both.id]
+    assert sorted(search_ids('அன்பு*')) == sorted([love.id, both.id])
+    assert search_ids('அன்பு* உண்டோ') == [love.id]
+    assert search_ids('அடைக்கு') == []
+    assert search_ids('"unbalanced') == []
+
+def test_search_index_follows_inserts_edits_and_deletes(ctx):
+    quote = add_quotes(1, content='first words')[0]
+    assert search_ids('first') == [quote.id]
+    quote.content = 'second words'
+    db.session.commit()
+    assert search_ids('first') == []
+    assert search_ids('second') == [quote.id]
+    # Likes do not touch the indexed columns
+    quote.likes = 5
+    db.session.commit()
+    assert search_ids('second') == [quote.id]
+    db.session.delete(quote)
+    db.session.commit()
+    assert search_ids('second') == []
+
+def test_api_search_pages(client):
+    quotes = add_quotes(quotes_app.QUOTES_PER_PAGE + 3, content='common {}')
+    first = client.get('/api/search?q=common').get_json()
+    assert len(first['quotes']) == quotes_app.QUOTES_PER_PAGE
+    assert first['page'] == 1 and first['next_page'] == 2
+    second = client.get('/api/search?q=common&page=2').get_json()
+    assert len(second['quotes']) == 3 and second['next_page'] is None
+    ids = [quote['id'] for quote in first['quotes'] + second['quotes']]
+    assert sorted(ids) == sorted(quote.id for quote in quotes)
+    empty = client.get('/api/search?q=').get_json()
+    assert empty['quotes'] == [] and empty['next_page'] is None
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCache(max_entries=3)
+    return SqliteCache(str(tmp_path / 'cache.db'), max_entries=3)
+
+def test_cache_refuses_pages_rendered_across_an_invalidation(cache):
+    since = cache.version()
+    cache.invalidate(['quote:1'])
+    assert not cache.set('page', 'old', ['quote:1', 'category:Love'], since)
+    assert cache.get('page') is None
+    # Other tags, and renders that started after the change, are stored
+    assert cache.set('other', 'fresh', ['quote:2'], since)
+    assert cache.set('page', 'new', ['quote:1'], cache.version())
+    assert cache.get('page') == 'new'
+    assert cache.set('plain', 'value', ['quote:1'])
+
+def test_cache_refuses_renders_older_than_its_versions(cache):
+    since = cache.version()
+    for quote_id in range(10):
+        cache.invalidate([f'quote:{quote_id}'])
+    # Enough writes for SqliteCache to trim its versions
+    for index in range(100):
+        cache.set(f'filler{index}', index)
+    # quote:0 is forgotten by now; the render still cannot be trusted
+    assert not cache.set('page', 'old', ['quote:0'], since)
+    assert cache.set('page', 'new', ['quote:0'], cache.version())
+    since = cache.version()
+    cache.clear()
+    assert not cache.set('page', 'old', [], since)
+
+def test_cached_page_skips_a_page_invalidated_while_rendering(ctx, monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(quotes_app, 'page_cache', cache)
+
+    def render(likes):
+        def render():
+            # Another request likes the quote after this one read it
+            quotes_app.invalidate_pages(['quote:1'])
+            return f'likes {likes}', ['quote:1']
+        return render
+
+    with app.test_request_context('/quote/1'):
+        response = quotes_app.cached_page(render(1))
+        assert response.get_data(as_text=True) == 'likes 1'
+        assert len(cache) == 0
+        quotes_app.cached_page(lambda: ('likes 2', ['quote:1']))
+        assert len(cache) == 1
+        assert quotes_app.cached_page(render(3)).get_data(as_text=True) == 'likes 2'
+
+# The app ships without its templates; listings only need ids and likes
+LISTING = '{% for quote in quotes %}{{ quote.id }}:{{ quote.total_likes }} {% endfor %}'
+
+@pytest.fixture
+def pages(monkeypatch):
+    cache = MemoryCache()
+    monkeypatch.setattr(quotes_app, 'page_cache', cache)
+    monkeypatch.setattr(app.jinja_env, 'loader', ChoiceLoader([
+        app.jinja_env.loader,
+        DictLoader({'category.html': LISTING, 'user_quotes.html': LISTING})]))
+    return cache
+
+def listing(client, url):
+    return dict(entry.split(':') for entry in client.get(url).get_data(as_text=True).split())
+
+def logged_in_client():
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+def test_adding_a_quote_refreshes_the_pages_it_appears_on(client, pages):
+    quotes = add_quotes(3)
+    for url in ['/api/quotes', '/category/category0', '/category/category1', '/user/admin']:
+        client.get(url)
+    assert len(pages) == 4
+    response = logged_in_client().post('/add_quote', data={
+        'content': 'new quote', 'english_translation': 'new', 'source': 'test',
+        'category': 'category0'})
+    assert response.status_code == 302
+    new_id = db.session.query(db.func.max(Quote.id)).scalar()
+    assert client.get('/api/quotes').get_json()['quotes'][0]['id'] == new_id
+    assert str(new_id) in listing(client, '/category/category0')
+    assert str(new_id) in listing(client, '/user/admin')
+    # A category the quote is not in keeps its page
+    assert '/category/category1?|' in pages.entries
+    assert str(new_id) not in listing(client, '/category/category1')
+
+def test_liking_a_quote_refreshes_the_pages_it_appears_on(client, pages):
+    quote = add_quotes(3)[0]
+    assert listing(client, '/category/category0')[str(quote.id)] == '0'
+    assert client.get('/api/quotes').get_json()['quotes'][-1]['likes'] == 0
+    liker = logged_in_client()
+    liker.post(f'/api/like/{quote.id}')
+    assert listing(client, '/category/category0')[str(quote.id)] == '1'
+    assert client.get('/api/quotes').get_json()['quotes'][-1]['likes'] == 1
+    # Written by the flush, the count stays the same
+    quotes_app.like_buffer.flush()
+    assert listing(client, '/category/category0')[str(quote.id)] == '1'
+    liker.get(f'/like/{quote.id}')
+    assert listing(client, '/category/category0')[str(quote.id)] == '2'
+
+def test_matching_etag_gets_not_modified(client, pages):
+    add_quotes(3)
+    first = client.get('/api/quotes')
+    etag = first.headers['ETag']
+    assert etag == f'"{hashlib.md5(first.get_data()).hexdigest()}"'
+    assert first.headers['Cache-Control'] == 'no-cache'
+    # Served from the cache with the same tag, and without a body
+    again = client.get('/api/quotes', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag and again.get_data() == b''
+    stale = client.get('/api/quotes', headers={'If-None-Match': '"something else"'})
+    assert stale.status_code == 200 and stale.headers['ETag'] == etag
+    # A change to the page gives it a new tag
+    add_quotes(1, start=datetime(2025, 1, 1))
+    changed = client.get('/api/quotes', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
@@ -0,0 +1,380 @@
+"""
+Vectorized batch engine that plays many Amazon Pac-Man games at once.
+All boards share one maze layout and its navigation data; per-board state
+(pellets, player and ghost positions, timers) lives in NumPy arrays and every
+board advances together, one fixed tick per step().
+
+The rules mirror a headless Game: player movement and wall checks from
+Player.update, pellet eating from Maze.eat_pellet, and the scatter/chase
+timers, chase/ambush/random targets and shortest-path moves of Ghost.update.
+"""
+import numpy as np
+from utils import *
+from maze import Maze
+from navigation import UNREACHABLE
+
+# Direction codes used by the batch arrays, in the order the navigation
+# graph tries neighbours
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+DX = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+DY = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+
+# Actions passed to step(): a direction code steers the player like
+# Player.steer(direction), STOP is steer(None) and KEEP leaves the input alone
+KEEP = -2
+STOP = -1
+
+# Per-board states
+BOARD_PLAYING = 0
+BOARD_DEAD = 1
+BOARD_OVER = 2
+
+GHOST_BEHAVIORS = ["chase", "ambush", "random", "random"]
+BEHAVIOR_CODES = {"chase": 0, "ambush": 1, "random": 2}
+SCATTER_MS = 7000
+CHASE_MS = 20000
+DEATH_PAUSE_MS = 2000
+# Largest all-pairs distance table to build (a 90x60 maze needs 58 MB);
+# bigger mazes read per-target fields from the navigation cache instead
+ALL_PAIRS_MAX_BYTES = 128 * 1024 * 1024
+
+
+def direction_code(direction):
+    """Convert a direction tuple to its batch code."""
+    return DIRECTIONS.index(direction)
+
+
+def all_pairs_distances(nav):
+    """Build the tile-to-tile BFS distance matrix of a navigation graph.
+
+    Row i, column j holds the distance from tile i to tile j. Columns are
+    only filled for tiles of the main region, which is where every target
+    is snapped to. Memory grows with tiles squared; raises ValueError past
+    ALL_PAIRS_MAX_BYTES.
+    """
+    size = nav.width * nav.height
+    if 2 * size * size > ALL_PAIRS_MAX_BYTES:
+        raise ValueError(f"all-pairs table for {size} tiles exceeds "
+                         f"{ALL_PAIRS_MAX_BYTES} bytes")
+    distances = np.full((size, size), UNREACHABLE, dtype=np.uint16)
+    for target in range(size):
+        if nav.is_reachable(target):
+            distances[:, target] = np.frombuffer(nav.distance_field(target),
+                                                 dtype=np.uint16)
+    return distances
+
+
+class BatchGame:
+    def __init__(self, boards, maze=None, seed=None, ghost_behaviors=GHOST_BEHAVIORS):
+        self.maze = maze if maze is not None else Maze()
+        self.boards = boards
+        self.rng = np.random.default_rng(seed)
+        self.tick_count = 0
+
+        # Shared static data: walls padded by one ring of wall so lookups
+        # just past the border need no bounds checks, neighbour tiles in
+        # direction-code order (-1 for none) and all-pairs distances, or
+        # None on mazes too big for the table (see _target_distances)
+        nav = self.maze.nav
+        self.width = self.maze.width
+        self.height = self.maze.height
+        self.walls = np.ones((self.height + 2, self.width + 2), dtype=bool)
+        self.walls[1:-1, 1:-1] = self.maze.layout.as_array() == TILE_WALL
+        # Exit mask bits follow the same UP, DOWN, LEFT, RIGHT order as the
+        # direction codes
+        index = np.arange(self.width * self.height, dtype=np.int32)
+        exits = np.frombuffer(nav.exits, dtype=np.uint8)
+        offsets = [-self.width, self.width, -1, 1]
+        self.neighbours = np.stack(
+            [np.where(exits >> code & 1, index + offsets[code], -1)
+             for code in range(len(DIRECTIONS))], axis=1).astype(np.int32)
+        self.nearest = np.frombuffer(nav.nearest_array(), dtype=np.int32)
+        size = self.width * self.height
+        self.distances = (all_pairs_distances(nav)
+                          if 2 * size * size <= ALL_PAIRS_MAX_BYTES else None)
+        self.spawn_tiles = np.frombuffer(self.maze.spawn_tiles,
+                                         dtype=self.maze.spawn_tiles.typecode)
+
+        # Per-board state
+        self.pellets = np.tile(np.frombuffer(self.maze.pellet_map, dtype=np.uint8),
+                               (boards, 1))
+        self.remaining = np.full(boards, self.maze.remaining_pellets(), dtype=np.int32)
+        self.state = np.full(boards, BOARD_PLAYING, dtype=np.int8)
+        self.death_timer = np.zeros(boards, dtype=np.int64)
+        self.score = np.zeros(boards, dtype=np.int64)
+        self.lives = np.full(boards, 3, dtype=np.int32)
+        self.player_x = np.full(boards, TILE_SIZE, dtype=np.int32)
+        self.player_y = np.full(boards, TILE_SIZE, dtype=np.int32)
+        self.player_dir = np.full(boards, direction_code(RIGHT), dtype=np.int32)
+        self.player_next_dir = self.player_dir.copy()
+        self.player_moving = np.zeros(boards, dtype=bool)
+
+        # Per-ghost state, shape (boards, ghosts)
+        ghosts = len(ghost_behaviors)
+        self.behavior = np.array([BEHAVIOR_CODES[b] for b in ghost_behaviors],
+                                 dtype=np.int8)
+        self.home_x, self.home_y = self._spawn_ghosts(boards, ghosts)
+        self.ghost_x = self.home_x.copy()
+        self.ghost_y = self.home_y.copy()
+        self.ghost_dir = np.full((boards, ghosts), direction_code(RIGHT), dtype=np.int32)
+        self.chasing = np.zeros((boards, ghosts), dtype=bool)  # False = scatter
+        self.state_timer = np.zeros((boards, ghosts), dtype=np.int64)
+        self.target_x = self.home_x.copy()
+        self.target_y = self.home_y.copy()
+
+    def _spawn_ghosts(self, boards, ghosts):
+        """Sample ghost homes from the spawn tiles, away from the player start."""
+        tiles = self.spawn_tiles
+        ys, xs = np.divmod(tiles.astype(np.int32), self.width)
+        far = (xs - 1) ** 2 + (ys - 1) ** 2 >= 25
+        candidates = tiles[far] if far.sum() >= ghosts else tiles
+        picks = np.empty((boards, ghosts), dtype=np.int32)
+        for board in range(boards):
+            picks[board] = self.rng.choice(candidates, ghosts, replace=False)
+        y, x = np.divmod(picks, self.width)
+        return x * TILE_SIZE, y * TILE_SIZE
+
+    def load_game(self, board, game):
+        """Copy the state of a Game into one board."""
+        self.pellets[board] = np.frombuffer(game.maze.pellet_map, dtype=np.uint8)
+        self.remaining[board] = game.maze.remaining_pellets()
+        player = game.player
+        self.score[board] = player.score
+        self.lives[board] = player.lives
+        self.player_x[board] = player.x
+        self.player_y[board] = player.y
+        self.player_dir[board] = direction_code(player.direction)
+        self.player_next_dir[board] = direction_code(player.next_direction)
+        self.player_moving[board] = player.is_moving
+        for i, ghost in enumerate(game.ghosts):
+            self.home_x[board, i], self.home_y[board, i] = ghost.home_position
+            self.ghost_x[board, i] = ghost.x
+            self.ghost_y[board, i] = ghost.y
+            self.ghost_dir[board, i] = direction_code(ghost.direction)
+            self.chasing[board, i] = ghost.state == "chase"
+            self.state_timer[board, i] = ghost.state_timer
+            target = ghost.target if ghost.target is not None else ghost.home_position
+            self.target_x[board, i], self.target_y[board, i] = target
+
+    def get_ticks(self):
+        """Simulated milliseconds, matching TickClock."""
+        return self.tick_count * 1000 // FPS
+
+    def _valid(self, x, y):
+        """Vectorized Maze.is_valid_position for (TILE_SIZE-4)-square boxes."""
+        size = TILE_SIZE - 4
+        left = np.clip(x // TILE_SIZE + 1, 0, self.width + 1)
+        right = np.clip((x + size - 1) // TILE_SIZE + 1, 0, self.width + 1)
+        top = np.clip(y // TILE_SIZE + 1, 0, self.height + 1)
+        bottom = np.clip((y + size - 1) // TILE_SIZE + 1, 0, self.height + 1)
+        walls = self.walls
+        return ~(walls[top, left] | walls[top, right] |
+                 walls[bottom, left] | walls[bottom, right])
+
+    def _tile_index(self, x, y):
+        """Vectorized NavGraph.pixel_to_index."""
+        tile_x = np.clip(x // TILE_SIZE, 0, self.width - 1)
+        tile_y = np.clip(y // TILE_SIZE, 0, self.height - 1)
+        return tile_y * self.width + tile_x
+
+    def step(self, actions=None):
+        """Advance every board by one tick.
+
+        actions is an optional array with one entry per board: a direction
+        code, STOP or KEEP.
+        """
+        now = self.get_ticks()
+        if actions is not None:
+            actions = np.asarray(actions)
+            steer = actions >= 0
+            self.player_next_dir[steer] = actions[steer]
+            self.player_moving[steer] = True
+            self.player_moving[actions == STOP] = False
+
+        # Boards showing the death message resume after the pause; like
+        # Game.update they only start moving again on the next tick
+        playing = np.flatnonzero(self.state == BOARD_PLAYING)
+        resume = (self.state == BOARD_DEAD) & (now - self.death_timer > DEATH_PAUSE_MS)
+        if resume.any():
+            self._reset_positions(resume, now)
+            self.state[resume] = BOARD_PLAYING
+
+        if len(playing):
+            self._update_players(playing)
+            self._update_ghosts(playing, now)
+            self._resolve_contacts(playing, now)
+        self.tick_count += 1
+
+    def _update_players(self, b):
+        """Player.update for the boards in b."""
+        x = self.player_x[b]
+        y = self.player_y[b]
+        direction = self.player_dir[b]
+        next_dir = self.player_next_dir[b]
+        speed = PLAYER_SPEED
+
+        # Try to change direction if requested
+        turn = next_dir != direction
+        turn &= self._valid(x + DX[next_dir] * speed, y + DY[next_dir] * speed)
+        direction = np.where(turn, next_dir, direction)
+        self.player_dir[b] = direction
+
+        # Move in the current direction, stopping at walls
+        moving = self.player_moving[b]
+        next_x = x + DX[direction] * speed
+        next_y = y + DY[direction] * speed
+        valid = self._valid(next_x, next_y)
+        advance = moving & valid
+        x = np.where(advance, next_x, x)
+        y = np.where(advance, next_y, y)
+        self.player_x[b] = x
+        self.player_y[b] = y
+        self.player_moving[b] = moving & valid
+
+        self._eat_pellets(b, x + TILE_SIZE // 2, y + TILE_SIZE // 2)
+
+    def _eat_pellets(self, b, cx, cy):
+        """Maze.eat_pellet for the boards in b with player centres cx, cy."""
+        radius = 10
+        tile_x = cx // TILE_SIZE
+        tile_y = cy // TILE_SIZE
+        # The 3x3 tiles around the centre in row-major order, as eat_pellet
+        # scans them; keep the first regular pellet, else the first power one
+        offsets = [(ox, oy) for oy in (-1, 0, 1) for ox in (-1, 0, 1)]
+        chosen = np.full(len(b), -1, dtype=np.int64)
+        chosen_kind = np.zeros(len(b), dtype=np.uint8)
+        for ox, oy in offsets:
+            tx = tile_x + ox
+            ty = tile_y + oy
+            inside = (tx >= 0) & (tx < self.width) & (ty >= 0) & (ty < self.height)
+            index = np.where(inside, ty * self.width + tx, 0)
+            kind = np.where(inside, self.pellets[b, index], 0)
+            dx = tx * TILE_SIZE + TILE_SIZE // 2 - cx
+            dy = ty * TILE_SIZE + TILE_SIZE // 2 - cy
+            near = (kind > 0) & (dx * dx + dy * dy < radius * radius)
+            better = near & ((chosen == -1) |
+                             ((kind == TILE_PELLET) & (chosen_kind != TILE_PELLET)))
+            chosen = np.where(better, index, chosen)
+            chosen_kind = np.where(better, kind, chosen_kind)
+
+        eaten = chosen >= 0
+        if eaten.any():
+            boards = b[eaten]
+            self.pellets[boards, chosen[eaten]] = 0
+            self.remaining[boards] -= 1
+            points = np.where(chosen_kind[eaten] == TILE_PELLET,
+                              PELLET_POINTS, POWER_PELLET_POINTS)
+            self.score[boards] += points
+
+    def _update_ghosts(self, b, now):
+        """Ghost.update for every ghost on the boards in b."""
+        ghosts = len(self.behavior)
+
+        # Scatter <-> chase timers
+        timer = self.state_timer[b]
+        chasing = self.chasing[b]
+        duration = np.where(chasing, CHASE_MS, SCATTER_MS)
+        flip = now - timer > duration
+        chasing = chasing ^ flip
+        self.chasing[b] = chasing
+        self.state_timer[b] = np.where(flip, now, timer)
+
+        # Targets: home while scattering; otherwise the player, four tiles
+        # ahead of the player, or an occasional random reachable tile
+        target_x = self.target_x[b]
+        target_y = self.target_y[b]
+        px = self.player_x[b][:, None]
+        py = self.player_y[b][:, None]
+        pdir = self.player_dir[b][:, None]
+        behavior = self.behavior[None, :]
+        shape = (len(b), ghosts)
+        chase = chasing & (behavior == 0)
+        ambush = chasing & (behavior == 1)
+        wander = chasing & (behavior == 2) & (self.rng.random(shape) < 0.1)
+        random_y, random_x = np.divmod(
+            self.spawn_tiles[self.rng.integers(0, len(self.spawn_tiles), shape)]
+            .astype(np.int32), self.width)
+        random_x *= TILE_SIZE
+        random_y *= TILE_SIZE
+        target_x = np.where(~chasing, self.home_x[b], target_x)
+        target_y = np.where(~chasing, self.home_y[b], target_y)
+        target_x = np.where(chase, px, np.where(ambush, px + DX[pdir] * 4 * TILE_SIZE,
+                                                np.where(wander, random_x, target_x)))
+        target_y = np.where(chase, py, np.where(ambush, py + DY[pdir] * 4 * TILE_SIZE,
+                                                np.where(wander, random_y, target_y)))
+        self.target_x[b] = target_x
+        self.target_y[b] = target_y
+
+        # Ghosts lined up with the grid take the first step of a shortest path
+        x = self.ghost_x[b]
+        y = self.ghost_y[b]
+        direction = self.ghost_dir[b]
+        aligned = (x % TILE_SIZE == 0) & (y % TILE_SIZE == 0)
+        if aligned.any():
+            tile = self._tile_index(x[aligned], y[aligned])
+            target = self.nearest[self._tile_index(target_x[aligned], target_y[aligned])]
+            candidates = self.neighbours[tile]
+            dist = np.where(candidates >= 0,
+                            self._target_distances(np.maximum(candidates, 0), target),
+                            UNREACHABLE)
+            best = dist.min(axis=1)
+            current = direction[aligned]
+            keep = (dist[np.arange(len(current)), current] == best) & (best != UNREACHABLE)
+            first = np.where(best != UNREACHABLE, dist.argmin(axis=1),
+                             (candidates >= 0).argmax(axis=1))
+            direction[aligned] = np.where(keep, current, first)
+            self.ghost_dir[b] = direction
+
+        # Move, stopping exactly on the next tile boundary
+        dx = DX[direction]
+        dy = DY[direction]
+        offset = np.where(dx != 0, x, y) % TILE_SIZE
+        speed = GHOST_SPEED
+        step = np.where(offset == 0, speed,
+                        np.where(dx + dy > 0, np.minimum(speed, TILE_SIZE - offset),
+                                 np.minimum(speed, offset)))
+        self.ghost_x[b] = x + dx * step
+        self.ghost_y[b] = y + dy * step
+
+    def _target_distances(self, tiles, targets):
+        """Distances from each row of tiles to the matching target tile."""
+        if self.distances is not None:
+            return self.distances[tiles, targets[:, None]]
+        # No table: one cached BFS field per distinct target, which is few
+        # as ghosts mostly share the player's tile or their home corner
+        dist = np.empty(tiles.shape, dtype=np.uint16)
+        for target in np.unique(targets):
+            rows = targets == target
+            field = np.frombuffer(self.maze.nav.distance_field(int(target)),
+                                  dtype=np.uint16)
+            dist[rows] = field[tiles[rows]]
+        return dist
+
+    def _resolve_contacts(self, b, now):
+        """Game.update's player-ghost contacts, deaths and the level-clear check."""
+        dx = np.abs(self.ghost_x[b] - self.player_x[b][:, None])
+        dy = np.abs(self.ghost_y[b] - self.player_y[b][:, None])
+        hit = ((dx < TILE_SIZE) & (dy < TILE_SIZE)).any(axis=1)
+        if hit.any():
+            dead = b[hit]
+            self.lives[dead] -= 1
+            self.player_moving[dead] = False
+            self.state[dead] = np.where(self.lives[dead] <= 0, BOARD_OVER, BOARD_DEAD)
+            self.death_timer[dead] = now
+        self.state[b[self.remaining[b] == 0]] = BOARD_OVER
+
+    def _reset_positions(self, mask, now):
+        """Game.reset_positions for the boards in mask."""
+        self.player_x[mask] = TILE_SIZE
+        self.player_y[mask] = TILE_SIZE
+        self.player_dir[mask] = direction_code(RIGHT)
+        self.player_next_dir[mask] = direction_code(RIGHT)
+        self.player_moving[mask] = False
+        self.ghost_x[mask] = self.home_x[mask]
+        self.ghost_y[mask] = self.home_y[mask]
+        self.chasing[mask] = False
+        self.state_timer[mask] = now
+
+    def finished(self):
+        """Check if every board has reached game over."""
+        return bool((self.state == BOARD_OVER).all())
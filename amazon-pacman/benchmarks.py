@@ -0,0 +1,839 @@
+"""
+Micro-benchmarks for the Amazon Pac-Man game engine.
+
+Run all benchmarks with ``python benchmarks.py`` or a single one with
+``python benchmarks.py collision``.
+"""
+import os
+import sys
+import time
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+from utils import *
+from maze import Maze
+from ghost import Ghost
+from player import Player
+
+
+def _time_per_call(func, args_list, repeat=3):
+    """Return the best average seconds per call of func over args_list."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in args_list:
+            func(*args)
+        elapsed = (time.perf_counter() - start) / len(args_list)
+        best = min(best, elapsed)
+    return best
+
+
+def _linear_is_valid_position(maze, x, y):
+    """The original wall check: scan every wall Rect in the maze."""
+    player_rect = pygame.Rect(x, y, TILE_SIZE-4, TILE_SIZE-4)
+    if any(wall.colliderect(player_rect) for wall in maze.walls):
+        return False
+    tile_x, tile_y = maze.get_tile_position(x, y)
+    if (0 <= tile_y < len(maze.layout) and
+        0 <= tile_x < len(maze.layout[0])):
+        return maze.layout[tile_y][tile_x] != 1
+    return False
+
+
+def bench_collision():
+    """Compare grid-indexed wall collision against the linear wall scan."""
+    print("Wall collision: is_valid_position (microseconds per query)")
+    print(f"{'maze':>10} {'walls':>8} {'linear':>10} {'grid':>10} {'speedup':>8}")
+    rng = random.Random(1)
+    for width, height in [(45, 30), (90, 60), (180, 120), (360, 240)]:
+        maze = Maze(width, height)
+        queries = [(rng.randrange(width * TILE_SIZE),
+                    rng.randrange(height * TILE_SIZE)) for _ in range(2000)]
+        # Both implementations must agree on every query
+        for x, y in queries:
+            assert maze.is_valid_position(x, y) == _linear_is_valid_position(maze, x, y)
+        linear_queries = [(maze, x, y) for x, y in queries]
+        # Keep the linear scan affordable on the biggest mazes
+        linear_queries = linear_queries[:max(50, 200000 // len(maze.walls))]
+        linear = _time_per_call(_linear_is_valid_position, linear_queries, repeat=1)
+        grid = _time_per_call(maze.is_valid_position, queries)
+        label = f"{width}x{height}"
+        print(f"{label:>10} {len(maze.walls):>8} {linear * 1e6:>10.2f} "
+              f"{grid * 1e6:>10.2f} {linear / grid:>7.0f}x")
+
+
+class _ListPellets:
+    """The original pellet storage: lists of pixel tuples scanned linearly."""
+    
+    def __init__(self, maze):
+        self.pellets = list(maze.pellet_positions(TILE_PELLET))
+        self.power_pellets = list(maze.pellet_positions(TILE_POWER_PELLET))
+    
+    def eat_pellet(self, pos):
+        radius = 10
+        for i, pellet in enumerate(self.pellets):
+            if distance(pos, pellet) < radius:
+                self.pellets.pop(i)
+                return PELLET_POINTS
+        for i, power_pellet in enumerate(self.power_pellets):
+            if distance(pos, power_pellet) < radius:
+                self.power_pellets.pop(i)
+                return POWER_PELLET_POINTS
+        return 0
+    
+    def remaining_pellets(self):
+        return len(self.pellets) + len(self.power_pellets)
+    
+    def clear_rows(self, rows):
+        limit = rows * TILE_SIZE
+        self.pellets = [p for p in self.pellets if p[1] >= limit]
+        self.power_pellets = [p for p in self.power_pellets if p[1] >= limit]
+
+
+def _sweep_path(maze):
+    """Player centre positions sweeping every row at PLAYER_SPEED per frame."""
+    path = []
+    for y in range(maze.height):
+        for x in range(0, maze.width * TILE_SIZE, PLAYER_SPEED):
+            path.append((x, y * TILE_SIZE + TILE_SIZE//2))
+    return path
+
+
+def _pellet_frames(storage, frames):
+    """Seconds per frame spent on eat_pellet plus remaining_pellets."""
+    start = time.perf_counter()
+    for pos in frames:
+        storage.eat_pellet(pos)
+        storage.remaining_pellets()
+    return (time.perf_counter() - start) / len(frames)
+
+
+def _eat_rows(maze, storage, rows):
+    """Remove every pellet in the first rows of the board."""
+    if isinstance(storage, _ListPellets):
+        storage.clear_rows(rows)
+        return
+    for y in range(rows):
+        for x in range(maze.width):
+            storage.eat_pellet((x * TILE_SIZE + TILE_SIZE//2,
+                                y * TILE_SIZE + TILE_SIZE//2))
+
+
+def bench_pellets():
+    """Per-frame pellet cost with a full board and near the end of a level."""
+    print("Pellet consumption (microseconds per frame)")
+    print(f"{'maze':>10} {'board':>10} {'list':>10} {'tiles':>10} {'speedup':>8}")
+    for width, height in [(45, 30), (180, 120)]:
+        template = Maze(width, height)
+        path = _sweep_path(template)
+        frames_per_row = len(path) // height
+        end_row = height * 95 // 100
+        for phase, first_row in [("full", 0), ("near end", end_row)]:
+            results = []
+            for storage in (_ListPellets(template), Maze(width, height)):
+                _eat_rows(template, storage, first_row)
+                first = first_row * frames_per_row
+                results.append(_pellet_frames(storage, path[first:first + 2000]))
+            linear, tiles = results
+            label = f"{width}x{height}"
+            print(f"{label:>10} {phase:>10} {linear * 1e6:>10.2f} "
+                  f"{tiles * 1e6:>10.2f} {linear / tiles:>7.0f}x")
+
+
+def _greedy_decision(maze, ghost):
+    """The original ghost decision: wall-scan valid moves, then greedy distance."""
+    valid_moves = maze.get_valid_moves((ghost.x, ghost.y))
+    best_distance = float('inf')
+    best_move = valid_moves[0] if valid_moves else ghost.direction
+    for move in valid_moves:
+        next_pos = (ghost.x + move[0] * TILE_SIZE, ghost.y + move[1] * TILE_SIZE)
+        if (move[0] == -ghost.direction[0] and
+            move[1] == -ghost.direction[1] and len(valid_moves) > 1):
+            continue
+        dist = distance(next_pos, ghost.target)
+        if dist < best_distance:
+            best_distance = dist
+            best_move = move
+    return best_move
+
+
+def bench_ghosts():
+    """Ghost move decisions per second, greedy scan versus navigation graph."""
+    print("Ghost AI (decisions per second)")
+    print(f"{'ghosts':>8} {'greedy':>12} {'nav':>12} {'updates/s':>12}")
+    maze = Maze()
+    rng = random.Random(3)
+    tiles = [i for i in range(maze.width * maze.height) if maze.nav.is_reachable(i)]
+    
+    def tile_pixels(index):
+        y, x = divmod(index, maze.width)
+        return x * TILE_SIZE, y * TILE_SIZE
+    
+    behaviors = ["chase", "ambush", "random", "random"]
+    for count in [4, 40, 400]:
+        ghosts = []
+        for i in range(count):
+            x, y = tile_pixels(rng.choice(tiles))
+            ghost = Ghost(x, y, (255, 0, 0), behaviors[i % 4])
+            ghost.state = "chase"
+            ghosts.append(ghost)
+        player = Player(*tile_pixels(rng.choice(tiles)))
+        frames = max(20, 24000 // count)
+        
+        # Greedy baseline, one decision per ghost per frame as before
+        for ghost in ghosts:
+            ghost.update_target(player, maze)
+            if ghost.target is None:
+                ghost.target = ghost.get_random_target(maze)
+        start = time.perf_counter()
+        for frame in range(frames // 4 + 1):
+            for ghost in ghosts:
+                _greedy_decision(maze, ghost)
+        greedy = count * (frames // 4 + 1) / (time.perf_counter() - start)
+        
+        # Navigation graph decisions, then full updates. The player wanders
+        # to a neighbouring tile every few frames so chase and ambush
+        # targets keep changing; the first pass warms the field cache.
+        def wander(frame):
+            if frame % 6 == 0:
+                tile = maze.nav.pixel_to_index(player.x, player.y)
+                player.x, player.y = tile_pixels(rng.choice(maze.nav.neighbours(tile)))
+        
+        for _ in range(2):
+            start = time.perf_counter()
+            for frame in range(frames // 4 + 1):
+                wander(frame)
+                for ghost in ghosts:
+                    ghost.update_target(player, maze)
+                    tile = maze.nav.pixel_to_index(ghost.x, ghost.y)
+                    ghost.get_best_move(maze, tile, maze.nav.moves(tile))
+        nav = count * (frames // 4 + 1) / (time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        for frame in range(frames):
+            wander(frame)
+            for ghost in ghosts:
+                ghost.update(maze, player)
+        updates = count * frames / (time.perf_counter() - start)
+        print(f"{count:>8} {greedy:>12,.0f} {nav:>12,.0f} {updates:>12,.0f}")
+
+
+def _legacy_draw(game):
+    """The original frame: full clear, a blit per wall, a circle per pellet."""
+    screen = game.screen
+    maze = game.maze
+    screen.fill(BLACK)
+    for wall in maze.walls:
+        screen.blit(maze.wall_surface, wall)
+    for pellet in maze.pellet_positions(TILE_PELLET):
+        pygame.draw.circle(screen, (255, 153, 0), pellet, 2)
+    maze.draw_power_pellets(screen)
+    game.player.draw(screen)
+    for ghost in game.ghosts:
+        ghost.draw(screen)
+    game.draw_hud()
+    pygame.display.flip()
+
+
+def _render_frames(game, draw, frames):
+    """CPU seconds per frame spent in draw while the game keeps playing."""
+    cpu = 0.0
+    for frame in range(frames):
+        if frame % 30 == 0:
+            game.player.next_direction = random.choice([UP, DOWN, LEFT, RIGHT])
+            game.player.is_moving = True
+        game.update()
+        start = time.process_time()
+        draw()
+        cpu += time.process_time() - start
+    return cpu / frames
+
+
+def bench_render():
+    """CPU per frame of the full redraw versus the layered dirty-rect renderer."""
+    from broadphase import ContactGrid
+    from main import Game
+    print("Rendering (CPU milliseconds per frame)")
+    print(f"{'screen':>10} {'maze':>8} {'full':>8} {'layered':>8} {'speedup':>8}")
+    for screen_size, maze_size in [((SCREEN_WIDTH, SCREEN_HEIGHT), (45, 30)),
+                                   ((3840, 2160), (202, 113))]:
+        results = []
+        for layered in (False, True):
+            random.seed(4)
+            game = Game(seed=4)
+            game.wait_until_loaded()
+            game.screen = pygame.display.set_mode(screen_size)
+            game.maze = Maze(*maze_size, rng=game.rng)
+            game.ghosts = game._create_ghosts()
+            game.contact_grid = ContactGrid(game.maze.width)
+            # No deaths, so every frame draws play rather than the death overlay
+            game.contact_grid.contacts = lambda players, ghosts: ()
+            game.state = STATE_PLAYING
+            draw = game.draw if layered else lambda: _legacy_draw(game)
+            results.append(_render_frames(game, draw, 300))
+        full, layered = results
+        screen_label = f"{screen_size[0]}x{screen_size[1]}"
+        maze_label = f"{maze_size[0]}x{maze_size[1]}"
+        print(f"{screen_label:>10} {maze_label:>8} {full * 1e3:>8.2f} "
+              f"{layered * 1e3:>8.2f} {full / layered:>7.1f}x")
+
+
+def _uncached_draw_text(surface, text, size, x, y, color=WHITE):
+    """The original draw_text: build a Font and render on every call."""
+    font = pygame.font.Font(None, size)
+    text_surface = font.render(text, True, color)
+    text_rect = text_surface.get_rect()
+    text_rect.midtop = (x, y)
+    surface.blit(text_surface, text_rect)
+    return text_rect
+
+
+def bench_text():
+    """Frame time of the text-heavy screens with and without the text cache."""
+    import main
+    from main import Game
+    print("Text rendering (milliseconds per frame)")
+    print(f"{'screen':>10} {'uncached':>10} {'cached':>10} {'speedup':>8}")
+    game = Game(seed=5)
+    game.wait_until_loaded()
+    screens = [("intro", STATE_INTRO), ("hud", STATE_PLAYING),
+               ("death", STATE_PLAYER_DEAD), ("game over", STATE_GAME_OVER)]
+    for label, state in screens:
+        game.state = state
+        game.show_death_message = True
+        results = []
+        for text_func in (_uncached_draw_text, draw_text):
+            main.draw_text = text_func
+            frames = 200
+            start = time.perf_counter()
+            for _ in range(frames):
+                game._last_frame_key = None
+                game.draw()
+            results.append((time.perf_counter() - start) / frames)
+        main.draw_text = draw_text
+        uncached, cached = results
+        print(f"{label:>10} {uncached * 1e3:>10.3f} {cached * 1e3:>10.3f} "
+              f"{uncached / cached:>7.1f}x")
+
+
+def bench_headless():
+    """Headless fixed-timestep simulation speed relative to real time."""
+    from main import Game
+    from tournament import RandomPolicy
+    print("Headless simulation")
+    print(f"{'games':>8} {'ticks':>10} {'ticks/s':>12} {'x real time':>12}")
+    total_ticks = 0
+    games = 0
+    start = time.perf_counter()
+    while total_ticks < 50000:
+        game = Game(seed=games, headless=True)
+        total_ticks += game.simulate(20000, RandomPolicy(games))
+        games += 1
+    elapsed = time.perf_counter() - start
+    rate = total_ticks / elapsed
+    print(f"{games:>8} {total_ticks:>10} {rate:>12,.0f} {rate / FPS:>11.0f}x")
+
+
+def bench_batch():
+    """Vectorized batch engine versus looping over headless Game.update."""
+    import numpy as np
+    from main import Game
+    from batch import BatchGame, KEEP, BOARD_OVER
+    from tournament import RandomPolicy
+    print("Batch simulation (game-ticks per second)")
+    print(f"{'engine':>12} {'boards':>8} {'ticks':>10} {'ticks/s':>12}")
+    
+    games = [Game(seed=i, headless=True) for i in range(8)]
+    policies = [RandomPolicy(i) for i in range(8)]
+    ticks = 0
+    start = time.perf_counter()
+    for _ in range(600):
+        for game, policy in zip(games, policies):
+            game.step(policy(game))
+            ticks += 1
+    rate = ticks / (time.perf_counter() - start)
+    print(f"{'Game loop':>12} {len(games):>8} {ticks:>10} {rate:>12,.0f}")
+    
+    maze = Maze(rng=random.Random(7))
+    np_rng = np.random.default_rng(7)
+    for boards in [64, 1024, 8192]:
+        batch = BatchGame(boards, maze=maze, seed=7)
+        ticks = 0
+        start = time.perf_counter()
+        for step in range(600):
+            if step % 20 == 0:
+                actions = np_rng.integers(0, 4, boards)
+            else:
+                actions = np.full(boards, KEEP)
+            ticks += int((batch.state != BOARD_OVER).sum())
+            batch.step(actions)
+        rate = ticks / (time.perf_counter() - start)
+        print(f"{'batch':>12} {boards:>8} {ticks:>10} {rate:>12,.0f}")
+
+
+def bench_tournament():
+    """Tournament throughput as the number of worker processes grows."""
+    from tournament import run_tournament
+    print(f"Tournament scaling ({os.cpu_count()} CPUs available)")
+    print(f"{'workers':>8} {'games':>8} {'games/s':>10} {'ticks/s':>12} {'efficiency':>11}")
+    cpus = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, 8, cpus} & set(range(1, cpus + 1)))
+    baseline = None
+    for workers in worker_counts:
+        games = 16 * workers
+        start = time.perf_counter()
+        stats = run_tournament(games, workers, max_ticks=5000)
+        elapsed = time.perf_counter() - start
+        rate = games / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8} {games:>8} {rate:>10.2f} "
+              f"{stats.total_ticks / elapsed:>12,.0f} "
+              f"{rate / (baseline * workers):>10.0%}")
+
+
+def bench_profiler():
+    """Cost of the frame profiler on simulation and rendering, off versus on."""
+    from main import Game
+    from tournament import RandomPolicy
+    print("Frame profiler overhead (microseconds per frame)")
+    print(f"{'workload':>10} {'off':>10} {'on':>10} {'overhead':>9} {'of budget':>10}")
+    for label, headless, frames in [("headless", True, 20000), ("render", False, 600)]:
+        results = []
+        for enabled in (False, True):
+            game = Game(seed=8, headless=headless)
+            game.wait_until_loaded()
+            game.state = STATE_PLAYING
+            if enabled:
+                game.profiler.enable(game)
+            policy = RandomPolicy(8)
+            start = time.perf_counter()
+            for _ in range(frames):
+                game.profiler.begin_frame()
+                game.step(policy(game))
+                if not headless:
+                    game.draw()
+                game.profiler.end_frame()
+                if game.state != STATE_PLAYING:
+                    game.reset_game()
+            results.append((time.perf_counter() - start) / frames)
+            game.profiler.disable()
+        off, on = results
+        print(f"{label:>10} {off * 1e6:>10.1f} {on * 1e6:>10.1f} "
+              f"{(on - off) / off:>8.1%} {(on - off) * FPS:>10.2%}")
+
+
+def bench_replay():
+    """Replay of a recorded 30 minute session: file size and replay speed."""
+    import tempfile
+    from main import Game
+    from replay import Recording, replay
+    from tournament import RandomPolicy
+    print("Record and replay (30 minutes of play, headless)")
+    ticks = 30 * 60 * FPS
+    game = Game(seed=9, headless=True)
+    recording = Recording.start(game)
+    policy = RandomPolicy(9)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        if game.state == STATE_GAME_OVER:
+            game.command(CMD_RESET)
+        game.step(policy(game))
+    recording.finish(game)
+    record_time = time.perf_counter() - start
+
+    path = os.path.join(tempfile.mkdtemp(), "session.pmr")
+    recording.save(path)
+    start = time.perf_counter()
+    replay(Recording.load(path))
+    replay_time = time.perf_counter() - start
+    real_time = ticks / FPS
+    print(f"  commands: {len(recording.inputs):,}, "
+          f"file: {os.path.getsize(path):,} bytes, "
+          f"checkpoints: {len(recording.checkpoints)}")
+    print(f"  record: {record_time:.2f}s, replay: {replay_time:.2f}s "
+          f"({real_time / replay_time:.0f}x real time, all checkpoints verified)")
+
+
+def bench_snapshot():
+    """Snapshot/restore cost against deep copies, and an MCTS agent built on it."""
+    import copy
+    import pickle
+    from main import Game
+    from tournament import RandomPolicy, MCTSPolicy
+    game = Game(seed=10, headless=True)
+    game.simulate(600, RandomPolicy(10))
+
+    def deep_copy():
+        # The wall texture Surface cannot be copied, so it is shared
+        surface = game.maze.wall_surface
+        return copy.deepcopy((game.maze, game.player, game.ghosts, game.rng),
+                             {id(surface): surface})
+
+    print("Game state forking (microseconds per call)")
+    print(f"{'method':>18} {'fork':>10} {'restore':>10} {'bytes':>8}")
+    repeat = 2000
+    start = time.perf_counter()
+    for _ in range(20):
+        deep_copy()
+    print(f"{'deepcopy':>18} {(time.perf_counter() - start) / 20 * 1e6:>10.1f} "
+          f"{'-':>10} {'-':>8}")
+    for include_rng in (True, False):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            snapshot = game.snapshot(include_rng)
+        fork = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            game.restore(snapshot)
+        restore = (time.perf_counter() - start) / repeat
+        label = "snapshot" if include_rng else "snapshot (no rng)"
+        print(f"{label:>18} {fork * 1e6:>10.1f} {restore * 1e6:>10.1f} "
+              f"{len(pickle.dumps(snapshot)):>8,}")
+
+    print("MCTS agent (16 rollouts of 60 ticks every 10 ticks, 3000 ticks)")
+    print(f"{'policy':>8} {'score':>7} {'lives':>6} {'decisions/s':>12} {'restores/s':>11}")
+    for name, policy_class in [("random", RandomPolicy), ("mcts", MCTSPolicy)]:
+        game = Game(seed=10, headless=True)
+        policy = policy_class(10)
+        start = time.perf_counter()
+        ticks = game.simulate(3000, policy)
+        elapsed = time.perf_counter() - start
+        decisions = ticks // 10
+        restores = decisions * getattr(policy, "rollouts", 0)
+        print(f"{name:>8} {game.player.score:>7} {game.player.lives:>6} "
+              f"{decisions / elapsed:>12,.0f} {restores / elapsed:>11,.0f}")
+
+
+def bench_mazegen():
+    """Generated maze sizes: cold generation, cached load and full Maze setup."""
+    import tempfile
+    from mazegen import generate_layout, load_layout
+    print("Maze generation (seconds)")
+    print(f"{'maze':>10} {'generate':>9} {'cached':>8} {'Maze()':>8} {'paths':>9}")
+    cache_dir = tempfile.mkdtemp()
+    for width, height, density in [(45, 30, 0.0), (250, 250, 0.5), (1000, 1000, 0.5)]:
+        start = time.perf_counter()
+        generate_layout(width, height, density=density)
+        generate = time.perf_counter() - start
+        load_layout(width, height, density=density, cache_dir=cache_dir)
+        start = time.perf_counter()
+        load_layout(width, height, density=density, cache_dir=cache_dir)
+        cached = time.perf_counter() - start
+        start = time.perf_counter()
+        maze = Maze(width, height, density=density)
+        setup = time.perf_counter() - start
+        label = f"{width}x{height}"
+        print(f"{label:>10} {generate:>9.3f} {cached:>8.3f} {setup:>8.2f} "
+              f"{len(maze.spawn_tiles):>9,}")
+
+
+def bench_layout():
+    """Load time and memory of a 1000x1000 layout: lists, bytes and mmap."""
+    import tempfile
+    import tracemalloc
+    from layout import MazeLayout
+    from mazegen import generate_layout
+    print("Layout storage, 1000x1000 maze")
+    print(f"{'storage':>14} {'load ms':>9} {'memory MB':>10} {'walls ms':>9}")
+    path = os.path.join(tempfile.mkdtemp(), "maze.bin")
+    generate_layout(1000, 1000, density=0.5).save(path)
+
+    def lists():
+        # The old representation: a list of lists of ints
+        return MazeLayout.load(path, use_mmap=False).to_rows()
+
+    loaders = [("list of lists", lists),
+               ("bytearray", lambda: MazeLayout.load(path, use_mmap=False)),
+               ("mmap", lambda: MazeLayout.load(path))]
+    for label, load in loaders:
+        tracemalloc.start()
+        start = time.perf_counter()
+        layout = load()
+        elapsed = time.perf_counter() - start
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        # Counting walls touches every tile, paging in a mapped file
+        start = time.perf_counter()
+        if isinstance(layout, MazeLayout):
+            layout.tobytes().count(TILE_WALL)
+        else:
+            sum(row.count(TILE_WALL) for row in layout)
+        walls = time.perf_counter() - start
+        print(f"{label:>14} {elapsed * 1e3:>9.2f} {memory / 2**20:>10.2f} "
+              f"{walls * 1e3:>9.2f}")
+
+
+def _dict_ghost_class():
+    """A Ghost with a per-instance dict and state_duration, as it used to be."""
+    namespace = {name: value for name, value in vars(Ghost).items()
+                 if name not in Ghost.__slots__ and name != "__slots__"}
+
+    def __init__(self, *args, **kwargs):
+        Ghost.__init__(self, *args, **kwargs)
+        self.state_duration = dict(Ghost.STATE_DURATION)
+    namespace["__init__"] = __init__
+    return type("DictGhost", (), namespace)
+
+
+def bench_actors():
+    """Memory and update throughput of 10k ghosts, dict-based versus slots."""
+    import tracemalloc
+    from timing import TickClock
+    print("Ghost actors (10,000 ghosts on a 250x250 maze)")
+    print(f"{'storage':>8} {'bytes/ghost':>12} {'updates/s':>11}")
+    maze = Maze(250, 250, rng=random.Random(11), density=0.5)
+    # Chasing ghosts share a couple of distance fields, so the timing is
+    # the per-ghost update cost rather than path searches
+    behaviors = ["chase", "ambush"]
+    for label, ghost_class in [("dict", _dict_ghost_class()), ("slots", Ghost)]:
+        rng = random.Random(11)
+        clock = TickClock()
+        positions = [maze.random_spawn_position(rng) for _ in range(10000)]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        ghosts = [ghost_class(x, y, (255, 0, 0), behaviors[i % 2], clock, rng)
+                  for i, (x, y) in enumerate(positions)]
+        per_ghost = (tracemalloc.get_traced_memory()[0] - before) / len(ghosts)
+        tracemalloc.stop()
+
+        player = Player(*maze.random_spawn_position(rng), clock)
+        for ghost in ghosts:
+            ghost.state = "chase"
+            ghost.update(maze, player)  # Warm the distance field cache
+        frames = 30
+        start = time.perf_counter()
+        for _ in range(frames):
+            clock.advance()
+            for ghost in ghosts:
+                ghost.update(maze, player)
+        rate = frames * len(ghosts) / (time.perf_counter() - start)
+        print(f"{label:>8} {per_ghost:>12.0f} {rate:>11,.0f}")
+
+
+def _crowd_ticks(game, ticks):
+    """Time each tick of timers, player and ghost updates, with the player wandering."""
+    maze, player = game.maze, game.player
+    rng = random.Random(5)
+    times = []
+    for tick in range(ticks):
+        if tick % 30 == 0:
+            tile = maze.nav.pixel_to_index(player.x, player.y)
+            player.steer(rng.choice(maze.nav.moves(tile) or [RIGHT]))
+        start = time.perf_counter()
+        game.scheduler.run_due()  # Mode switches
+        player.update(maze)
+        for ghost in game.ghosts:
+            ghost.update(maze, player)
+        times.append(time.perf_counter() - start)
+        game.game_clock.advance()
+    return times
+
+
+def bench_crowd():
+    """Crowd mode tick time, every ghost with its own targets versus shared ones."""
+    from main import Game
+    print("Crowd mode (120x80 maze, ghost AI and player per tick, ms)")
+    print(f"{'ghosts':>8} {'targets':>8} {'mean':>8} {'p99':>8} {'us/ghost':>9} {'fields':>7}")
+    maze = Maze(120, 80, density=0.5)
+    ticks = 600  # Scatter for the first 7 seconds, then chase
+    for count in [100, 400, 1600, 6400]:
+        # Per-ghost targets are how a crowd behaves without sharing: a
+        # field per home tile and per randomly picked tile. Too slow to
+        # run at the larger sizes.
+        modes = ["own", "shared"] if count <= 400 else ["shared"]
+        for mode in modes:
+            maze.waypoints = None
+            maze.nav.clear_cache()
+            game = Game(seed=count, headless=True, maze=maze, ghost_count=count)
+            if mode == "own":
+                maze.waypoints = None
+                maze.nav.clear_cache()
+                for ghost in game.ghosts:
+                    ghost.scatter_target = ghost.home_position
+            built = maze.nav.cache_info().built
+            times = sorted(_crowd_ticks(game, ticks))
+            # Distance fields computed during the timed ticks
+            built = maze.nav.cache_info().built - built
+            mean = sum(times) / len(times)
+            p99 = times[len(times) * 99 // 100]
+            print(f"{count:>8} {mode:>8} {mean * 1e3:>8.2f} {p99 * 1e3:>8.2f} "
+                  f"{mean / count * 1e6:>9.2f} {built:>7}")
+
+
+def _rect_contacts(players, ghosts):
+    """The original check: two fresh Rects for every player-ghost pair."""
+    found = []
+    for player in players:
+        for ghost in ghosts:
+            ghost_rect = pygame.Rect(ghost.x, ghost.y, TILE_SIZE, TILE_SIZE)
+            player_rect = pygame.Rect(player.x, player.y, TILE_SIZE, TILE_SIZE)
+            if ghost_rect.colliderect(player_rect):
+                found.append((player, ghost))
+    return found
+
+
+def bench_contacts():
+    """Player-ghost contacts per tick, Rect pairs versus the tile grid."""
+    from broadphase import ContactGrid
+    print("Player-ghost contacts (ms per tick, 250x250 maze)")
+    print(f"{'players':>8} {'ghosts':>8} {'rects':>10} {'grid':>10} {'speedup':>8}")
+    maze = Maze(250, 250, rng=random.Random(4), density=0.5)
+    grid = ContactGrid(maze.width)
+    rng = random.Random(4)
+
+    def actor_at(cls):
+        # Anywhere along the paths, not only on tile boundaries
+        x, y = maze.random_spawn_position(rng)
+        step = rng.randrange(TILE_SIZE)
+        return cls(x + step, y) if rng.random() < 0.5 else cls(x, y + step)
+
+    for player_count in [1, 4]:
+        for ghost_count in [100, 1000, 10000]:
+            players = [actor_at(Player) for _ in range(player_count)]
+            ghosts = [actor_at(lambda x, y: Ghost(x, y, (255, 0, 0), "chase"))
+                      for _ in range(ghost_count)]
+            # Crowd some ghosts onto the players so there are contacts to find
+            for ghost in ghosts[:ghost_count // 50]:
+                player = rng.choice(players)
+                ghost.x = player.x + rng.randrange(-TILE_SIZE, TILE_SIZE + 1)
+                ghost.y = player.y + rng.randrange(-TILE_SIZE, TILE_SIZE + 1)
+            # Both must find the same pairs
+            pairs = lambda found: sorted((id(p), id(g)) for p, g in found)
+            assert pairs(grid.contacts(players, ghosts)) == pairs(_rect_contacts(players, ghosts))
+            ticks = max(5, 20000 // ghost_count)
+            results = []
+            for find in [_rect_contacts, grid.contacts]:
+                start = time.perf_counter()
+                for _ in range(ticks):
+                    find(players, ghosts)
+                results.append((time.perf_counter() - start) / ticks)
+            rects, tiles = results
+            print(f"{player_count:>8} {ghost_count:>8} {rects * 1e3:>10.3f} "
+                  f"{tiles * 1e3:>10.3f} {rects / tiles:>7.1f}x")
+
+
+def _polling_ghost_class():
+    """A Ghost that checks its mode timers on every update, as it used to."""
+    class PollingGhost(Ghost):
+        __slots__ = ()
+
+        def update(self, maze, player):
+            current_time = self.clock.get_ticks()
+            if not self.scared:
+                if current_time - self.state_timer > self.STATE_DURATION[self.state]:
+                    self.state = "chase" if self.state == "scatter" else "scatter"
+                    self.state_timer = current_time
+            elif current_time - self.scared_timer > self.SCARED_DURATION:
+                self.scared = False
+            Ghost.update(self, maze, player)
+    return PollingGhost
+
+
+def bench_timers():
+    """Ghost mode timers, polled by every ghost versus the tick scheduler."""
+    from timing import TickClock, TickScheduler
+    print("Mode timers (1,000 ghosts, 1,800 ticks)")
+    print(f"{'timers':>10} {'ms/tick':>9} {'checks/tick':>12} {'chasing':>8}")
+    maze = Maze(120, 80, rng=random.Random(6), density=0.5)
+    final_states = []
+    for label in ["polling", "scheduler"]:
+        rng = random.Random(6)
+        clock = TickClock()
+        scheduler = TickScheduler(clock) if label == "scheduler" else None
+        ghost_class = _polling_ghost_class() if label == "polling" else Ghost
+        ghosts = [ghost_class(*maze.random_spawn_position(rng), (255, 0, 0), "chase",
+                              clock, rng, scheduler) for _ in range(1000)]
+        # Stagger the timers so mode switches are spread over the run.
+        # Scattering to shared corners keeps path searches out of the timing.
+        for i, ghost in enumerate(ghosts):
+            ghost.scatter_target = maze.scatter_corner(ghost.x, ghost.y)
+            ghost.state_timer -= i * 7
+            if scheduler is not None:
+                ghost._schedule_state_end()
+        player = Player(*maze.random_spawn_position(rng), clock)
+        ticks = 1800
+        scheduled = scheduler._sequence if scheduler is not None else 0
+        start = time.perf_counter()
+        for _ in range(ticks):
+            if scheduler is not None:
+                scheduler.run_due()
+            for ghost in ghosts:
+                ghost.update(maze, player)
+            clock.advance()
+        elapsed = (time.perf_counter() - start) / ticks
+        # Polling checks every ghost's timer each tick; the scheduler only
+        # runs its events, one per mode switch
+        if scheduler is None:
+            checks = len(ghosts)
+        else:
+            checks = (scheduler._sequence - scheduled) / ticks
+        final_states.append([(ghost.state, ghost.state_timer) for ghost in ghosts])
+        chasing = sum(ghost.state == "chase" for ghost in ghosts)
+        print(f"{label:>10} {elapsed * 1e3:>9.2f} {checks:>12.1f} {chasing:>8}")
+    # Both must switch every ghost on the same ticks
+    assert final_states[0] == final_states[1]
+
+_STARTUP_SCRIPT = """
+import sys, time, pygame
+import main
+eager, width, height = sys.argv[1] == "eager", int(sys.argv[2]), int(sys.argv[3])
+if eager:
+    # The old startup: every subsystem, then the maze, actors and graphics
+    # built on the main thread before the first frame is drawn
+    pygame.init()
+game = main.Game(seed=1, maze_size=(width, height), maze_density=0.5,
+                 background_load=not eager)
+game.wait_until_loaded()
+print(game.startup_times["first frame"], game.startup_times["loaded"])
+"""
+
+
+def bench_startup(runs=5):
+    """Cold start in a fresh process: time to the first frame and to playable."""
+    import subprocess
+    print("Startup (ms after importing main, best of 5 processes)")
+    print(f"{'maze':>10} {'startup':>11} {'first frame':>12} {'loaded':>8}")
+    for width, height in [(MAZE_WIDTH, MAZE_HEIGHT), (250, 250)]:
+        for mode in ("eager", "background"):
+            first = loaded = float('inf')
+            for _ in range(runs):
+                output = subprocess.run(
+                    [sys.executable, "-c", _STARTUP_SCRIPT, mode, str(width), str(height)],
+                    capture_output=True, text=True, check=True,
+                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+                times = [float(value) for value in output.split()[-2:]]
+                first, loaded = min(first, times[0]), min(loaded, times[1])
+            label = f"{width}x{height}"
+            print(f"{label:>10} {mode:>11} {first:>12.1f} {loaded:>8.1f}")
+
+
+BENCHMARKS = {
+    "collision": bench_collision,
+    "pellets": bench_pellets,
+    "ghosts": bench_ghosts,
+    "render": bench_render,
+    "text": bench_text,
+    "headless": bench_headless,
+    "batch": bench_batch,
+    "tournament": bench_tournament,
+    "profiler": bench_profiler,
+    "replay": bench_replay,
+    "snapshot": bench_snapshot,
+    "mazegen": bench_mazegen,
+    "layout": bench_layout,
+    "actors": bench_actors,
+    "crowd": bench_crowd,
+    "contacts": bench_contacts,
+    "timers": bench_timers,
+    "startup": bench_startup,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+        print()
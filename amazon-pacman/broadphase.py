@@ -0,0 +1,42 @@
+"""
+Broad-phase contact detection between players and ghosts.
+Every actor is a tile-sized box, so two can only touch when the tiles under
+their top-left corners are neighbours. Each tick the players are bucketed
+under the 3x3 block of tiles around them; a ghost then needs one lookup of
+its own tile, and only the players found there get the exact overlap test.
+"""
+from utils import *
+
+
+class ContactGrid:
+    """Uniform tile grid that finds all player-ghost contacts of a tick."""
+
+    def __init__(self, width):
+        self.width = width  # Tiles per row of the maze
+        # Keys of the 3x3 block of tiles around a tile, as index offsets
+        self._block = tuple(dy * width + dx for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+        self._players = {}  # Tile index -> players that a ghost there may touch
+
+    def contacts(self, players, ghosts):
+        """Get every (player, ghost) pair whose boxes overlap, in ghost order."""
+        width = self.width
+        near = self._players
+        near.clear()
+        for player in players:
+            tile = (player.y // TILE_SIZE) * width + player.x // TILE_SIZE
+            for offset in self._block:
+                bucket = near.get(tile + offset)
+                if bucket is None:
+                    near[tile + offset] = [player]
+                else:
+                    bucket.append(player)
+
+        found = []
+        for ghost in ghosts:
+            bucket = near.get((ghost.y // TILE_SIZE) * width + ghost.x // TILE_SIZE)
+            if bucket is not None:
+                for player in bucket:
+                    if (abs(ghost.x - player.x) < TILE_SIZE and
+                            abs(ghost.y - player.y) < TILE_SIZE):
+                        found.append((player, ghost))
+        return found
@@ -0,0 +1,116 @@
+"""
+Compact storage for maze layouts.
+Tiles live in one contiguous byte buffer, row after row with a fixed stride.
+Rows index like the old lists of lists (layout[y][x]), and a layout file can
+be memory-mapped so large mazes load instantly and share pages read-only
+between processes.
+"""
+import os
+import mmap
+import struct
+from utils import *
+
+LAYOUT_MAGIC = b"PACMAZE1"
+LAYOUT_HEADER = struct.Struct("<8sII")  # Magic, width, height; tiles follow row by row
+
+
+class MazeLayout:
+    """A width x height grid of TILE_* values in a single byte buffer."""
+
+    def __init__(self, cells, width, height, stride=None, source=None):
+        stride = stride or width
+        if stride < width or len(cells) < (height - 1) * stride + width:
+            raise ValueError(f"buffer too small for a {width}x{height} layout")
+        self.width = width
+        self.height = height
+        self.stride = stride
+        # Any bytes-like buffer; read-only when it comes from a memory map
+        self.cells = memoryview(cells).cast("B")
+        self._source = source  # Keeps a memory map open while in use
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a layout from rows of tile values."""
+        return cls(bytearray(b"".join(bytes(row) for row in rows)),
+                   len(rows[0]), len(rows))
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        """Get row y as a memoryview, so layout[y][x] reads one tile."""
+        if not 0 <= y < self.height:
+            raise IndexError("layout row out of range")
+        start = y * self.stride
+        return self.cells[start:start + self.width]
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+    def __getstate__(self):
+        # Memory views cannot be pickled or copied, so send the tile bytes
+        return {"cells": self.tobytes(), "width": self.width, "height": self.height}
+
+    def __setstate__(self, state):
+        self.__init__(state["cells"], state["width"], state["height"])
+
+    def index(self, x, y):
+        """Get the offset of tile (x, y) in the buffer."""
+        return y * self.stride + x
+
+    def get(self, x, y):
+        """Get the tile value at (x, y)."""
+        return self.cells[y * self.stride + x]
+
+    def is_wall(self, x, y):
+        """Check if (x, y) is a wall; tiles outside the grid count as walls."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.stride + x] == TILE_WALL
+        return True
+
+    def tobytes(self):
+        """Get the tiles as width * height bytes without row padding."""
+        if self.stride == self.width:
+            return self.cells[:self.width * self.height].tobytes()
+        return b"".join(row.tobytes() for row in self)
+
+    def to_rows(self):
+        """Get the tiles as a list of lists."""
+        return [list(row) for row in self]
+
+    def as_array(self):
+        """Get a (height, width) NumPy uint8 view of the tiles (no copy)."""
+        import numpy as np
+        size = (self.height - 1) * self.stride + self.width
+        array = np.frombuffer(self.cells[:size], dtype=np.uint8)
+        return np.lib.stride_tricks.as_strided(
+            array, (self.height, self.width), (self.stride, 1), writeable=False)
+
+    def save(self, path):
+        """Write the layout as a small header followed by one byte per tile."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Write to a temporary file first so readers never see a partial layout
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(LAYOUT_HEADER.pack(LAYOUT_MAGIC, self.width, self.height))
+            f.write(self.tobytes())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, use_mmap=True):
+        """Read a layout written by save, memory-mapped unless use_mmap is False."""
+        with open(path, "rb") as f:
+            header = f.read(LAYOUT_HEADER.size)
+            if len(header) < LAYOUT_HEADER.size:
+                raise ValueError(f"{path} is not a maze layout file")
+            magic, width, height = LAYOUT_HEADER.unpack(header)
+            if magic != LAYOUT_MAGIC:
+                raise ValueError(f"{path} is not a maze layout file")
+            if os.fstat(f.fileno()).st_size != LAYOUT_HEADER.size + width * height:
+                raise ValueError(f"{path} is truncated")
+            if not use_mmap:
+                return cls(bytearray(f.read()), width, height)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        cells = memoryview(mapped)[LAYOUT_HEADER.size:]
+        return cls(cells, width, height, source=mapped)
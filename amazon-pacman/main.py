@@ -1,41 +1,174 @@
 """
 Main game loop and initialization for Amazon Pac-Man.
 """
+import time
+STARTED = time.perf_counter()  # Startup times are measured from here
 import pygame
 import sys
 import os
-import time
 import random
+import threading
+from collections import namedtuple
 from utils import *
 from maze import Maze
 from player import Player
 from ghost import Ghost
+from broadphase import ContactGrid
+from sprites import preload_sprites
+from timing import TickClock, TickScheduler
+from profiler import FrameProfiler
+
+# Everything that changes while a game is played. The maze layout, walls and
+# navigation data never change, so snapshots share them with the live game.
+GameSnapshot = namedtuple("GameSnapshot", [
+    "tick", "state", "paused", "show_death_message", "death_message_timer",
+    "player", "ghosts", "pellets", "events", "rng_state"])
 
 class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.display.set_caption("Amazon Pac-Man")
-        
-        # Adjust screen size to fit the larger maze
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 36)
-        
-        # Create game objects
-        self.maze = Maze()
-        self.player = Player(TILE_SIZE, TILE_SIZE)
-        
-        # Create ghosts with different behaviors at random positions
-        self.ghosts = self._create_ghosts()
-        
-        self.state = STATE_INTRO
+    def __init__(self, seed=None, headless=False, clock=None, maze=None, ghost_count=GHOST_COUNT,
+                 maze_size=(MAZE_WIDTH, MAZE_HEIGHT), maze_density=0.0, background_load=True):
+        # Headless games never open a window or initialise pygame; they are
+        # driven by step() and can run far faster than real time
+        self.headless = headless
+        self.startup_times = {}  # Milestone -> ms since main.py was imported
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            self.screen = None
+        else:
+            # Only the subsystems the game uses; pygame.init() would also
+            # start the mixer and joysticks (load_sound starts the mixer)
+            pygame.display.init()
+            pygame.font.init()
+            pygame.display.set_caption("Amazon Pac-Man")
+            self.clock = pygame.time.Clock()
+            self.font = get_font(36)
+        
+        # Game time advances one fixed step per update, whatever the frame rate
+        self.game_clock = clock if clock is not None else TickClock()
+        
+        # Mode switches, power-ups and the death message end through timed
+        # events, so nothing polls the clock on frames where none is due
+        self.scheduler = TickScheduler(self.game_clock)
+        
+        # Callbacks run after every simulation step, e.g. a renderer or logger
+        self.observers = []
+        
+        # Seeded random source shared by the maze, spawns and ghost AI. An
+        # unseeded game still draws a seed so it can be recorded and replayed.
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.rng = random.Random(self.seed)
+        
+        # Size the window to the maze, keeping the HUD margin the default
+        # maze has. Larger mazes grow it up to the size of the desktop.
+        maze_width, maze_height = (maze.width, maze.height) if maze is not None else maze_size
+        self.screen_width = SCREEN_WIDTH + max(0, maze_width - MAZE_WIDTH) * TILE_SIZE
+        self.screen_height = SCREEN_HEIGHT + max(0, maze_height - MAZE_HEIGHT) * TILE_SIZE
+        if not headless:
+            desktop = pygame.display.Info()
+            self.screen_width = min(self.screen_width, max(SCREEN_WIDTH, desktop.current_w))
+            self.screen_height = min(self.screen_height, max(SCREEN_HEIGHT, desktop.current_h))
+            self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
+        
+        self.ghost_count = ghost_count
+        # What a replay needs to build the same maze again (None when a
+        # prebuilt maze was passed in)
+        self.maze_size = tuple(maze_size) if maze is None else None
+        self.maze_density = maze_density if maze is None else None
+        self.state = STATE_PLAYING if headless else STATE_INTRO
         self.paused = False
         self.death_message_timer = 0
         self.show_death_message = False
         
+        # Dirty-rect rendering: what the last frame looked like and which
+        # screen areas it drew sprites on
+        self._last_frame_key = None
+        self._drawn_rects = []
+        self._overlays = {}
+        
+        # Replay recording fed by command() and the checkpoint observer
+        self.recording = None
+        
+        # Frame-time profiler, toggled with F3 (F4 exports what it recorded)
+        self.profiler = FrameProfiler()
+        
         # Create assets directory if it doesn't exist
         if not os.path.exists(ASSET_DIR):
             os.makedirs(ASSET_DIR)
+        
+        # A windowed game shows the intro straight away and builds the maze,
+        # actors and pre-rendered graphics in the background meanwhile.
+        # Headless games, and windowed ones with background_load off, are
+        # built before the constructor returns.
+        self._loader = None
+        self._load_error = None
+        if headless:
+            self._build(maze, maze_size, maze_density)
+        elif not background_load:
+            self._build(maze, maze_size, maze_density)
+            self._mark_startup("loaded")
+            self.draw()
+            self._mark_startup("first frame")
+        else:
+            self.draw()
+            self._mark_startup("first frame")
+            self._loader = threading.Thread(target=self._load, daemon=True,
+                                            args=(maze, maze_size, maze_density))
+            self._loader.start()
+    
+    def _build(self, maze, maze_size, maze_density):
+        """Create the maze, player and ghosts, and pre-render their graphics."""
+        # A prebuilt maze (see Maze.copy) skips generating the layout and
+        # navigation data again
+        if maze is not None:
+            maze.reseed(self.rng)
+        else:
+            maze = Maze(*maze_size, rng=self.rng, density=maze_density)
+        self.maze = maze
+        self.player = Player(TILE_SIZE, TILE_SIZE, self.game_clock, self.scheduler)
+        
+        # Create ghosts with different behaviors at random positions
+        self.ghosts = self._create_ghosts()
+        
+        # Tile buckets for finding player-ghost contacts each tick
+        self.contact_grid = ContactGrid(self.maze.width)
+        
+        # Render every actor frame and the maze layers once, so drawing is
+        # a blit per actor
+        if not self.headless:
+            preload_sprites({ghost.color for ghost in self.ghosts},
+                            self.player.mouth_speed, self.player.radius)
+            self.maze.prerender()
+    
+    def _load(self, *args):
+        """Run _build in the loader thread, keeping any error for the main thread."""
+        try:
+            self._build(*args)
+        except Exception as error:
+            self._load_error = error
+        self._mark_startup("loaded")
+    
+    def is_loading(self):
+        """Check if the background build is still running; re-raise its error."""
+        if self._loader is not None and not self._loader.is_alive():
+            self._loader = None
+            if self._load_error is not None:
+                raise self._load_error
+        return self._loader is not None
+    
+    def wait_until_loaded(self):
+        """Block until the maze and actors have been built."""
+        if self._loader is not None:
+            self._loader.join()
+        self.is_loading()
+    
+    def _mark_startup(self, milestone):
+        """Note the time since main.py was imported for a startup milestone."""
+        self.startup_times[milestone] = (time.perf_counter() - STARTED) * 1000
+    
+    def startup_report(self):
+        """Describe how long the startup milestones took."""
+        return "Startup: " + ", ".join(f"{milestone} {ms:.0f} ms"
+                                       for milestone, ms in self.startup_times.items())
     
     def _create_ghosts(self):
         """Create ghosts at random valid positions."""
@@ -48,32 +181,53 @@ class Game:
         ]
         behaviors = ["chase", "ambush", "random", "random"]
         
-        # Find valid starting positions
-        valid_positions = []
-        for y in range(5, 20):
-            for x in range(5, 23):
-                if self.maze.layout[y][x] != 1:  # Not a wall
-                    valid_positions.append((x * TILE_SIZE, y * TILE_SIZE))
-        
-        # Ensure we have enough positions
-        if len(valid_positions) < 4:
-            valid_positions = [(5*TILE_SIZE, 5*TILE_SIZE), 
-                              (20*TILE_SIZE, 5*TILE_SIZE),
-                              (5*TILE_SIZE, 18*TILE_SIZE),
-                              (20*TILE_SIZE, 18*TILE_SIZE)]
-        
-        # Create ghosts
-        for i in range(4):
-            if valid_positions:
-                pos = random.choice(valid_positions)
-                valid_positions.remove(pos)
-            else:
-                pos = (random.randint(5, 20) * TILE_SIZE, 
-                      random.randint(5, 18) * TILE_SIZE)
-                
-            ghosts.append(Ghost(pos[0], pos[1], colors[i], behaviors[i]))
-            
+        # Pick distinct spawn tiles from the maze's index, keeping clear
+        # of the player's starting corner
+        player_start = (self.player.x, self.player.y)
+        positions = []
+        taken = set()
+        for attempt in range(25 * self.ghost_count):
+            pos = self.maze.random_spawn_position()
+            if pos in taken or distance(pos, player_start) < 5 * TILE_SIZE:
+                continue
+            positions.append(pos)
+            taken.add(pos)
+            if len(positions) == self.ghost_count:
+                break
+        while len(positions) < self.ghost_count:
+            positions.append(self.maze.random_spawn_position())
+        
+        # Create ghosts, repeating the four colours and behaviours in crowds
+        for i, pos in enumerate(positions):
+            ghosts.append(Ghost(pos[0], pos[1], colors[i % len(colors)],
+                                behaviors[i % len(behaviors)], self.game_clock,
+                                self.rng, self.scheduler))
+        
+        if self.ghost_count > GHOST_COUNT:
+            self._share_targets(ghosts)
         return ghosts
+    
+    def _share_targets(self, ghosts):
+        """Point a crowd of ghosts at a handful of shared targets.
+        
+        Every ghost heading for the same tile follows the same cached
+        distance field. Chasers already share the player's tile and
+        ambushers the tile ahead of it, so crowds scatter to the corner of
+        their quarter of the maze and random ghosts wander between a fixed
+        set of waypoints. Their fields are built here rather than mid-game.
+        """
+        if self.maze.waypoints is None:
+            # Leave room in the field cache for the player's fields
+            count = min(CROWD_WAYPOINTS, self.maze.nav.cache_size // 2)
+            self.maze.set_waypoints(count)
+        for ghost in ghosts:
+            ghost.scatter_target = self.maze.scatter_corner(*ghost.home_position)
+        
+        nav = self.maze.nav
+        targets = {nav.pixel_to_index(*ghost.scatter_target) for ghost in ghosts}
+        targets.update(self.maze.waypoints)
+        for target in targets:
+            nav.distance_field(target)
             
     def handle_events(self):
         """Process game events."""
@@ -81,66 +235,189 @@ class Game:
             if event.type == pygame.QUIT:
                 return False
                 
+            # While the game is still loading only ESC does anything
+            if self._loader is not None:
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                    return False
+                continue
+                
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     return False
                 elif event.key == pygame.K_p:
-                    self.paused = not self.paused
+                    self.command(CMD_PAUSE)
                 elif event.key == pygame.K_r:
-                    self.reset_game()
+                    self.command(CMD_RESET)
                 elif event.key == pygame.K_RETURN:
-                    if self.state == STATE_INTRO:
-                        self.state = STATE_PLAYING
-                    elif self.state == STATE_PLAYER_DEAD:
-                        self.state = STATE_PLAYING
+                    self.command(CMD_CONTINUE)
+                elif event.key == pygame.K_F3:
+                    self.profiler.toggle(self)
+                    self._last_frame_key = None
+                elif event.key == pygame.K_F4 and self.profiler.frames:
+                    for path in self.profiler.export():
+                        print(f"Profile written to {path}")
                 
-            # Pass all events to player for movement handling
-            if self.state == STATE_PLAYING:
-                self.player.handle_input(event)
+            # Arrow keys steer the player (releasing one stops it)
+            if self.state == STATE_PLAYING and getattr(event, "key", None) in ARROW_KEYS:
+                if event.type == pygame.KEYDOWN:
+                    self.command(ARROW_KEYS[event.key])
+                elif event.type == pygame.KEYUP:
+                    self.command(CMD_STOP)
                     
         return True
+    
+    def command(self, cmd):
+        """Apply one player input command (see CMD_* in utils).
+        
+        All input goes through here, so recording the commands with the
+        tick they arrived on is enough to replay a session exactly.
+        """
+        if self.recording is not None:
+            self.recording.add(self.game_clock.tick_count, cmd)
+        if cmd == CMD_PAUSE:
+            self.paused = not self.paused
+        elif cmd == CMD_RESET:
+            self.reset_game()
+        elif cmd == CMD_CONTINUE:
+            if self.state in (STATE_INTRO, STATE_PLAYER_DEAD):
+                self.state = STATE_PLAYING
+        elif cmd == CMD_STOP:
+            self.player.steer(None)
+        else:
+            self.player.steer(COMMAND_DIRECTIONS[cmd])
         
     def update(self):
         """Update game state."""
         if self.state == STATE_PLAYER_DEAD:
-            # Check if it's time to continue
-            if pygame.time.get_ticks() - self.death_message_timer > 2000:  # 2 seconds
-                self.show_death_message = False
-                self.state = STATE_PLAYING
-                self.reset_positions()
+            # Wait for the death message to time out (see _end_death_message)
+            self.scheduler.run_due()
             return
             
         if self.state != STATE_PLAYING or self.paused:
             return
             
-        # Update player
+        # Fire the timers due by now. Events that came due while paused or
+        # on the intro screen fire here, on the first tick of play.
+        self.scheduler.run_due()
+        
+        # Update player and ghosts, timing each group while profiling
+        profiling = self.profiler.enabled
+        if profiling:
+            started = time.perf_counter()
         self.player.update(self.maze)
+        if profiling:
+            moved = time.perf_counter()
+            self.profiler.add_time("Player.update", moved - started)
         
         # Update ghosts
         for ghost in self.ghosts:
             ghost.update(self.maze, self.player)
+        if profiling:
+            self.profiler.add_time("Ghost.update", time.perf_counter() - moved,
+                                   len(self.ghosts))
             
-            # Check for collisions with player
-            if self.check_collision(ghost):
-                if ghost.scared:
-                    ghost.reset_position()
-                    self.player.score += GHOST_POINTS
+        # Check for collisions with player, all of this tick's at once.
+        # Ghosts only move themselves, so this finds the same contacts as
+        # checking each ghost right after its update.
+        for player, ghost in self.contact_grid.contacts((self.player,), self.ghosts):
+            if ghost.scared:
+                ghost.reset_position()
+                player.score += GHOST_POINTS
+            else:
+                player.die()
+                if player.lives <= 0:
+                    self.state = STATE_GAME_OVER
                 else:
-                    self.player.die()
-                    if self.player.lives <= 0:
-                        self.state = STATE_GAME_OVER
-                    else:
-                        # Show death message
-                        self.state = STATE_PLAYER_DEAD
-                        self.show_death_message = True
-                        self.death_message_timer = pygame.time.get_ticks()
-                        
+                    # Show death message
+                    self.state = STATE_PLAYER_DEAD
+                    self.show_death_message = True
+                    self.death_message_timer = self.game_clock.get_ticks()
+                    self.scheduler.call_after(self.death_message_timer + 2000,  # 2 seconds
+                                              self._end_death_message,
+                                              self.death_message_timer)
+                    
         # Check if all pellets are collected
         if self.maze.remaining_pellets() == 0:
             self.state = STATE_GAME_OVER
+    
+    def _end_death_message(self, started):
+        """Scheduler callback: continue after the death message."""
+        if self.state == STATE_PLAYER_DEAD and started == self.death_message_timer:
+            self.show_death_message = False
+            self.state = STATE_PLAYING
+            self.reset_positions()
+    
+    def step(self, direction=False):
+        """Advance the simulation by one fixed tick.
+        
+        direction steers the player for this tick (None stops it); leave it
+        out to keep the current input. Observers are notified afterwards.
+        """
+        if direction is not False:
+            self.command(CMD_STOP if direction is None
+                         else COMMAND_DIRECTIONS.index(direction))
+        self.update()
+        self.game_clock.advance()
+        for observer in self.observers:
+            observer(self)
+    
+    def simulate(self, ticks, policy=None):
+        """Step a game until it ends or ticks run out; return ticks played.
+        
+        policy, if given, is called as policy(game) each tick and returns
+        the direction to steer (None to stop, False to keep the input).
+        """
+        for tick in range(ticks):
+            if self.state == STATE_GAME_OVER:
+                return tick
+            self.step(policy(self) if policy else False)
+        return ticks
+            
+    def snapshot(self, include_rng=True):
+        """Capture the game state so restore() can return to it later.
+        
+        Copying the random generator's state is most of the cost; searches
+        that want fresh randomness on every rollout can leave it out.
+        """
+        return GameSnapshot(
+            self.game_clock.tick_count, self.state, self.paused,
+            self.show_death_message, self.death_message_timer,
+            self.player.snapshot(),
+            tuple([ghost.snapshot() for ghost in self.ghosts]),
+            self.maze.snapshot_pellets(),
+            self.scheduler.snapshot(self._timed_actors()),
+            self.rng.getstate() if include_rng else None)
+    
+    def restore(self, snapshot):
+        """Return to a state captured by snapshot(). Snapshots can be reused."""
+        self.game_clock.tick_count = snapshot.tick
+        self.state = snapshot.state
+        self.paused = snapshot.paused
+        self.show_death_message = snapshot.show_death_message
+        self.death_message_timer = snapshot.death_message_timer
+        self.player.restore(snapshot.player)
+        for ghost, state in zip(self.ghosts, snapshot.ghosts):
+            ghost.restore(state)
+        self.maze.restore_pellets(snapshot.pellets)
+        self.scheduler.restore(snapshot.events, self._timed_actors())
+        if snapshot.rng_state is not None:
+            self.rng.setstate(snapshot.rng_state)
+        self._last_frame_key = None
+            
+    def _timed_actors(self):
+        """Get the objects whose methods go on the scheduler, in a fixed order."""
+        return [self, self.player] + self.ghosts
             
     def draw(self):
         """Render the game screen."""
+        # While playing, only the areas around moving sprites change
+        frame_key = (self.state, self.paused, self.show_death_message)
+        if (frame_key == self._last_frame_key and
+                self.state == STATE_PLAYING and not self.paused):
+            self._draw_dirty()
+            return
+        self._last_frame_key = frame_key
+        
         self.screen.fill(BLACK)
         
         if self.state == STATE_INTRO:
@@ -150,12 +427,7 @@ class Game:
         else:
             # Draw game elements
             self.maze.draw(self.screen)
-            self.player.draw(self.screen)
-            for ghost in self.ghosts:
-                ghost.draw(self.screen)
-                
-            # Draw HUD
-            self.draw_hud()
+            self._drawn_rects = self._draw_sprites()
             
             # Draw death message if needed
             if self.state == STATE_PLAYER_DEAD and self.show_death_message:
@@ -164,13 +436,51 @@ class Game:
             if self.paused:
                 self.draw_pause_screen()
                 
-        pygame.display.flip()
+        self.present()
+    
+    def _draw_dirty(self):
+        """Redraw and update only the screen areas that changed."""
+        # Erase last frame's sprites and any eaten pellets
+        dirty = self._drawn_rects + self.maze.take_dirty_rects()
+        for rect in dirty:
+            self.maze.draw_region(self.screen, rect)
+        
+        self._drawn_rects = self._draw_sprites()
+        self.present(dirty + self._drawn_rects)
+    
+    def present(self, rects=None):
+        """Show the frame: update only the given rects, or flip everything."""
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+    
+    def _draw_sprites(self):
+        """Draw everything that moves or animates, returning the rects drawn."""
+        rects = self.maze.draw_power_pellets(self.screen)
+        
+        self.player.draw(self.screen)
+        rects.append(self._actor_rect(self.player))
+        for ghost in self.ghosts:
+            ghost.draw(self.screen)
+            rects.append(self._actor_rect(ghost))
+            
+        # Draw HUD
+        rects.extend(self.draw_hud())
+        
+        if self.profiler.visible:
+            rects.append(self.profiler.draw(self.screen))
+        return rects
+    
+    def _actor_rect(self, actor):
+        """Get the screen area an actor's sprite can cover."""
+        return pygame.Rect(actor.x - 1, actor.y - 1, TILE_SIZE + 2, TILE_SIZE + 2)
         
     def draw_intro(self):
         """Draw the intro screen."""
         title = "AMAZON ARCADE"
         subtitle = "PAC-MAN"
-        start_text = "Press ENTER to Start"
+        start_text = "Loading..." if self._loader is not None else "Press ENTER to Start"
         controls = [
             "Controls:",
             "Arrow Keys - Move (hold to continue moving)",
@@ -185,20 +495,20 @@ class Game:
         amazon_blue = (0, 155, 255)
         
         # Draw Amazon smile logo
-        self._draw_amazon_logo(SCREEN_WIDTH//2 - 75, 50, 150)
+        self._draw_amazon_logo(self.screen_width//2 - 75, 50, 150)
         
         # Draw title
-        draw_text(self.screen, title, 48, SCREEN_WIDTH//2, 150, amazon_blue)
-        draw_text(self.screen, subtitle, 36, SCREEN_WIDTH//2, 200, amazon_orange)
+        draw_text(self.screen, title, 48, self.screen_width//2, 150, amazon_blue)
+        draw_text(self.screen, subtitle, 36, self.screen_width//2, 200, amazon_orange)
         
         # Draw controls
         y = 280
         for line in controls:
-            draw_text(self.screen, line, 24, SCREEN_WIDTH//2, y)
+            draw_text(self.screen, line, 24, self.screen_width//2, y)
             y += 40
             
         # Draw start prompt
-        draw_text(self.screen, start_text, 30, SCREEN_WIDTH//2, 500, amazon_blue)
+        draw_text(self.screen, start_text, 30, self.screen_width//2, 500, amazon_blue)
         
     def _draw_amazon_logo(self, x, y, width):
         """Draw the Amazon smile logo."""
@@ -224,48 +534,44 @@ class Game:
         else:
             text = "GAME OVER"
             
-        draw_text(self.screen, text, 48, SCREEN_WIDTH//2, SCREEN_HEIGHT//3, amazon_orange)
+        draw_text(self.screen, text, 48, self.screen_width//2, self.screen_height//3, amazon_orange)
         draw_text(self.screen, f"Score: {self.player.score}", 36,
-                 SCREEN_WIDTH//2, SCREEN_HEIGHT//2)
+                 self.screen_width//2, self.screen_height//2)
         draw_text(self.screen, "Press R to Restart", 24,
-                 SCREEN_WIDTH//2, SCREEN_HEIGHT*2//3)
+                 self.screen_width//2, self.screen_height*2//3)
     
     def draw_death_message(self):
         """Draw the player death message."""
         # Semi-transparent overlay
-        s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        s.set_alpha(180)
-        s.fill(BLACK)
-        self.screen.blit(s, (0,0))
+        self.screen.blit(self._overlay(self.screen_width, self.screen_height, 180), (0,0))
         
         # Draw message
         amazon_orange = (255, 153, 0)
-        draw_text(self.screen, "PLAYER DEAD!", 48, SCREEN_WIDTH//2, SCREEN_HEIGHT//3, amazon_orange)
-        draw_text(self.screen, f"Lives left: {self.player.lives}", 36, SCREEN_WIDTH//2, SCREEN_HEIGHT//2)
-        draw_text(self.screen, "Press ENTER to continue", 24, SCREEN_WIDTH//2, SCREEN_HEIGHT*2//3)
+        draw_text(self.screen, "PLAYER DEAD!", 48, self.screen_width//2, self.screen_height//3, amazon_orange)
+        draw_text(self.screen, f"Lives left: {self.player.lives}", 36, self.screen_width//2, self.screen_height//2)
+        draw_text(self.screen, "Press ENTER to continue", 24, self.screen_width//2, self.screen_height*2//3)
         
     def draw_hud(self):
-        """Draw the heads-up display."""
+        """Draw the heads-up display and return the rects it covers."""
         amazon_orange = (255, 153, 0)
         
-        # Draw score at the bottom right (moved up by 2 steps)
+        # Draw score at the bottom right (moved up by 2 steps). Text surfaces
+        # are cached, so the score is only re-rendered when it changes.
         score_text = f"Score: {self.player.score}"
-        draw_text(self.screen, score_text, 24, SCREEN_WIDTH-100, SCREEN_HEIGHT-70, amazon_orange)
+        rects = [draw_text(self.screen, score_text, 24, self.screen_width-100, self.screen_height-70, amazon_orange)]
         
         # Draw lives count text on the right top
         lives_text = f"LIFE COUNT: {self.player.lives}"
-        draw_text(self.screen, lives_text, 24, SCREEN_WIDTH-100, 10, amazon_orange)
+        rects.append(draw_text(self.screen, lives_text, 24, self.screen_width-100, 10, amazon_orange))
         
         # Draw visual representation of lives (orange player emojis) below the text
         # Create a background for the player emojis to ensure they're visible
-        emoji_bg = pygame.Surface((self.player.lives * 30 + 10, 30))
-        emoji_bg.fill(BLACK)
-        emoji_bg.set_alpha(200)
-        self.screen.blit(emoji_bg, (SCREEN_WIDTH-160, 30))
+        emoji_bg = self._overlay(self.player.lives * 30 + 10, 30, 200)
+        rects.append(self.screen.blit(emoji_bg, (self.screen_width-160, 30)))
         
         for i in range(self.player.lives):
             # Draw small pacman icons (orange player emojis)
-            center_x = SCREEN_WIDTH - 150 + (i * 30)
+            center_x = self.screen_width - 150 + (i * 30)
             center_y = 45  # Below the text
             radius = 10
             
@@ -278,21 +584,22 @@ class Game:
                 (center_x + radius, center_y - radius//2),
                 (center_x + radius, center_y + radius//2)
             ])
+        return rects
         
     def draw_pause_screen(self):
         """Draw the pause screen overlay."""
-        s = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-        s.set_alpha(128)
-        s.fill(BLACK)
-        self.screen.blit(s, (0,0))
-        draw_text(self.screen, "PAUSED", 48, SCREEN_WIDTH//2, SCREEN_HEIGHT//2)
-        
-    def check_collision(self, ghost):
-        """Check for collision between player and ghost."""
-        ghost_rect = pygame.Rect(ghost.x, ghost.y, TILE_SIZE, TILE_SIZE)
-        player_rect = pygame.Rect(self.player.x, self.player.y,
-                                TILE_SIZE, TILE_SIZE)
-        return ghost_rect.colliderect(player_rect)
+        self.screen.blit(self._overlay(self.screen_width, self.screen_height, 128), (0,0))
+        draw_text(self.screen, "PAUSED", 48, self.screen_width//2, self.screen_height//2)
+        
+    def _overlay(self, width, height, alpha):
+        """Get a cached semi-transparent black surface of the given size."""
+        key = (width, height, alpha)
+        overlay = self._overlays.get(key)
+        if overlay is None:
+            overlay = self._overlays[key] = pygame.Surface((width, height))
+            overlay.fill(BLACK)
+            overlay.set_alpha(alpha)
+        return overlay
         
     def reset_positions(self):
         """Reset player and ghost positions."""
@@ -302,25 +609,64 @@ class Game:
             
     def reset_game(self):
         """Reset the entire game state."""
-        self.maze = Maze()
-        self.player = Player(TILE_SIZE, TILE_SIZE)
+        # The layout, navigation graph and spawn index are reused
+        self.maze.reset_pellets()
+        self.scheduler.clear()
+        self.player = Player(TILE_SIZE, TILE_SIZE, self.game_clock, self.scheduler)
         self.ghosts = self._create_ghosts()
         self.state = STATE_PLAYING
         self.paused = False
         self.show_death_message = False
-        
-    def run(self):
-        """Main game loop."""
+        self._last_frame_key = None
+        
+    def run(self, report_startup=False):
+        """Main game loop; report_startup prints the startup times once loaded."""
+        # Fixed timestep: run as many simulation steps as real time has
+        # covered since the last frame (capped so a stall cannot snowball)
+        step_ms = 1000 / FPS
+        lag = 0.0
         running = True
         while running:
+            # Sleeping in clock.tick is left out of the profiled frame
+            lag = min(lag + self.clock.tick(FPS), 5 * step_ms)
+            self.profiler.begin_frame()
             running = self.handle_events()
-            self.update()
+            if self._loader is not None:
+                # Game time starts once loading is done
+                lag = 0.0
+                if not self.is_loading() and report_startup:
+                    print(self.startup_report())
+            while lag >= step_ms:
+                self.step()
+                lag -= step_ms
             self.draw()
-            self.clock.tick(FPS)
+            self.profiler.end_frame()
             
         pygame.quit()
         sys.exit()
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    # Crowd mode, e.g. python main.py --maze 200x150 --ghosts 1000
+    options = {}
+    if "--maze" in sys.argv:
+        width, height = sys.argv[sys.argv.index("--maze") + 1].split("x")
+        options = {"maze_size": (int(width), int(height)), "maze_density": 0.5}
+    ghost_count = GHOST_COUNT
+    if "--ghosts" in sys.argv:
+        ghost_count = int(sys.argv[sys.argv.index("--ghosts") + 1])
+    game = Game(ghost_count=ghost_count, **options)
+    report_startup = "--startup" in sys.argv  # Print how long startup took
+    if "--record" in sys.argv:
+        # Save the session so it can be reproduced with replay.py
+        from replay import Recording
+        path = sys.argv[sys.argv.index("--record") + 1]
+        game.wait_until_loaded()
+        recording = Recording.start(game)
+        try:
+            game.run(report_startup)
+        finally:
+            recording.finish(game)
+            recording.save(path)
+            print(f"Replay written to {path}")
+    else:
+        game.run(report_startup)
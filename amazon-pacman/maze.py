@@ -1,210 +1,163 @@
 """
 Maze layout and rendering logic for the Amazon Pac-Man game.
-Maze pattern with letters A, M, A, Z, O, N at top and Q, C, L, I at bottom.
+By default the maze spells AMAZON at the top and Q CLI at the bottom; other
+sizes and text come from the procedural generator in mazegen.py.
 """
 import pygame
 import random
+from array import array
 from utils import *
+from navigation import NavGraph
+from mazegen import DEFAULT_TEXT, load_layout
+
+# Byte translation that keeps pellet tiles and turns everything else to 0
+_PELLETS = bytes(value if value in (TILE_PELLET, TILE_POWER_PELLET) else 0
+                 for value in range(256))
 
 class Maze:
-    def __init__(self):
+    def __init__(self, width=MAZE_WIDTH, height=MAZE_HEIGHT, rng=None, text=DEFAULT_TEXT,
+                 density=0.0, layout_seed=0, layout=None):
+        # Random source for spawn sampling and the wall texture; pass a
+        # seeded random.Random to make runs reproducible
+        self.rng = rng if rng is not None else random.Random()
+        
         # Define the maze layout where:
         # 0 = empty path
         # 1 = wall
         # 2 = pellet
         # 3 = power pellet
         
-        # Create a maze with AMAZON letters at top and Q CLI at bottom
-        self.layout = self._generate_amazon_maze(45, 30)  # Extended width to 45 to fit all letters
-        
-        # Initialize collections for game elements
-        self.walls = []
-        self.pellets = []
-        self.power_pellets = []
-        self._initialize_elements()
-        
-        # Create blue pixel style wall effect
-        self.wall_surface = self._create_wall_surface()
-    
-    def _generate_amazon_maze(self, width, height):
-        """Generate a maze with AMAZON letters at top and Q CLI at bottom."""
-        # Start with all paths
-        maze = [[0 for x in range(width)] for y in range(height)]
-        
-        # Create border
-        for y in range(height):
-            for x in range(width):
-                # Border walls
-                if x == 0 or y == 0 or x == width-1 or y == height-1:
-                    maze[y][x] = 1
-        
-        # Add letter patterns with proper spacing
-        # Top row: A, M, A, Z, O, N
-        # Bottom row: Q, C, L, I
-        letters_top = ['A', 'M', 'A', 'Z', 'O', 'N']
-        letters_bottom = ['Q', 'C', 'L', 'I']
-        letter_width = 3  # Original letter width
-        letter_height = 5  # Original letter height
-        spacing = 4  # Spacing between letters
-        
-        # Calculate starting positions to center the letters
-        start_x_top = 3  # Start after some space from left wall
-        start_x_bottom = 8  # Start after some space from left wall for bottom row
-        
-        # Position for top row - moved down from the top border
-        y_pos_top = 5  # Fixed position for top row
+        # Generated (or memory-mapped from the layout cache) from the size,
+        # the lines of text and how densely wall blocks are scattered. One
+        # byte per tile; layout[y][x] reads a tile (see layout.py). A prebuilt
+        # MazeLayout can be passed in instead.
+        if layout is None:
+            layout = load_layout(width, height, text, density, layout_seed)
+        self.layout = layout
+        self.width = layout.width
+        self.height = layout.height
         
-        # Position for bottom row - moved up from the bottom border
-        y_pos_bottom = height - 10  # Fixed position for bottom row
+        # Initialize collections for game elements. Pellets are stored per
+        # tile (row-major, TILE_PELLET / TILE_POWER_PELLET / 0) with running
+        # counts, so eating one is a constant-time lookup and update. Wall
+        # Rects are only built if something draws them (see walls).
+        self._walls = None
+        self.reset_pellets()
         
-        # Add top row letters (AMAZON) with spacing
-        for i, letter in enumerate(letters_top):
-            x_pos = start_x_top + i * (letter_width + spacing)
-            self._add_letter(maze, letter, x_pos, y_pos_top)
+        # Walkable-tile graph and shortest-path cache for the ghost AI
+        self.nav = NavGraph(self.layout)
         
-        # Add bottom row letters (Q CLI) with spacing
-        for i, letter in enumerate(letters_bottom):
-            x_pos = start_x_bottom + i * (letter_width + spacing)
-            self._add_letter(maze, letter, x_pos, y_pos_bottom)
+        # Indices of the walkable tiles actors can be placed on (those in
+        # the main connected region), so spawns are a single random pick
+        self.spawn_tiles = self._build_spawn_tiles()
         
-        # Fill with pellets
-        for y in range(height):
-            for x in range(width):
-                if maze[y][x] == 0:
-                    maze[y][x] = 2
+        # Tiles random ghosts pick targets from; None means any spawn tile.
+        # Crowds use a small fixed set so ghosts share distance fields.
+        self.waypoints = None
         
-        # Add power pellets in corners and center
-        power_pellet_positions = [
-            (2, 2), (width-3, 2), (2, height-3), (width-3, height-3),
-            (width//2, height//2)
-        ]
+        # Create blue pixel style wall effect
+        self.wall_surface = self._create_wall_surface()
         
-        for x, y in power_pellet_positions:
-            if 0 <= y < height and 0 <= x < width and maze[y][x] != 1:
-                maze[y][x] = 3
-                
-        # Ensure starting position is clear
-        maze[1][1] = 2
-        maze[2][1] = 0
-        maze[1][2] = 0
+        # Static layers rendered on first draw: walls are baked into the
+        # background once, pellets into a layer patched as they are eaten
+        self._background = None
+        self._pellet_layer = None
+    
+    @property
+    def walls(self):
+        """Wall tiles as pygame Rects, built on first use for rendering."""
+        if self._walls is None:
+            self._walls = [pygame.Rect(x * TILE_SIZE, y * TILE_SIZE,
+                                       TILE_SIZE, TILE_SIZE)
+                           for y, row in enumerate(self.layout)
+                           for x, cell in enumerate(row) if cell == TILE_WALL]
+        return self._walls
+    
+    def reset_pellets(self):
+        """Put every pellet and power pellet back on the board."""
+        self._pellet_layer = None
+        self.dirty_rects = []
+        # The layout bytes with walls and empty tiles cleared to 0
+        self.pellet_map = bytearray(self.layout.tobytes().translate(_PELLETS))
+        self.pellet_count = self.pellet_map.count(TILE_PELLET)
+        self.power_pellet_count = self.pellet_map.count(TILE_POWER_PELLET)
+    
+    def copy(self, rng=None):
+        """Copy the maze with a full set of its own pellets.
         
+        The layout, walls, navigation graph, spawn index and wall art are
+        shared with the original rather than rebuilt or duplicated.
+        """
+        maze = Maze.__new__(Maze)
+        maze.__dict__.update(self.__dict__)
+        maze.rng = rng if rng is not None else random.Random()
+        maze.reset_pellets()
         return maze
     
-    def _add_letter(self, maze, letter, x, y):
-        """Add a letter pattern to the maze."""
-        if letter == 'A':
-            # Letter A pattern
-            pattern = [
-                [0,1,0],
-                [1,0,1],
-                [1,1,1],
-                [1,0,1],
-                [1,0,1]
-            ]
-        elif letter == 'M':
-            # Letter M pattern
-            pattern = [
-                [1,0,1],
-                [1,0,1],
-                [1,1,1],
-                [1,0,1],
-                [1,0,1]
-            ]
-        elif letter == 'Z':
-            # Letter Z pattern
-            pattern = [
-                [1,1,1],
-                [0,0,1],
-                [0,1,0],
-                [1,0,0],
-                [1,1,1]
-            ]
-        elif letter == 'O':
-            # Letter O pattern
-            pattern = [
-                [1,1,1],
-                [1,0,1],
-                [1,0,1],
-                [1,0,1],
-                [1,1,1]
-            ]
-        elif letter == 'N':
-            # Letter N pattern - made very distinct
-            pattern = [
-                [1,0,1],
-                [1,1,1],
-                [1,0,1],
-                [1,0,1],
-                [1,0,1]
-            ]
-        elif letter == 'Q':
-            # Letter Q pattern - made more distinct from O with a tail
-            pattern = [
-                [1,1,1],
-                [1,0,1],
-                [1,0,1],
-                [1,0,1],
-                [1,1,1],
-                [0,0,1]  # Added tail to make Q distinct
-            ]
-        elif letter == 'C':
-            # Letter C pattern
-            pattern = [
-                [1,1,1],
-                [1,0,0],
-                [1,0,0],
-                [1,0,0],
-                [1,1,1]
-            ]
-        elif letter == 'L':
-            # Letter L pattern
-            pattern = [
-                [1,0,0],
-                [1,0,0],
-                [1,0,0],
-                [1,0,0],
-                [1,1,1]
-            ]
-        elif letter == 'I':
-            # Letter I pattern
-            pattern = [
-                [1,1,1],
-                [0,1,0],
-                [0,1,0],
-                [0,1,0],
-                [1,1,1]
-            ]
-        else:
-            # Default empty pattern
-            pattern = [
-                [0,0,0],
-                [0,0,0],
-                [0,0,0],
-                [0,0,0],
-                [0,0,0]
-            ]
+    def reseed(self, rng):
+        """Switch to another random source and redraw the wall texture from it.
         
-        # Add the pattern to the maze
-        for py, row in enumerate(pattern):
-            for px, cell in enumerate(row):
-                if 0 <= y+py < len(maze) and 0 <= x+px < len(maze[0]):
-                    if cell == 1:
-                        maze[y+py][x+px] = 1
+        The generator ends up in the same state as after Maze(rng=rng), so
+        a game on a copied maze plays out like one that built its own.
+        """
+        self.rng = rng
+        self.wall_surface = self._create_wall_surface()
+        self._background = None
+    
+    def snapshot_pellets(self):
+        """Get the pellet state as (tile bytes, pellet count, power count)."""
+        return (bytes(self.pellet_map), self.pellet_count, self.power_pellet_count)
+    
+    def restore_pellets(self, pellets):
+        """Put back pellet state returned by snapshot_pellets()."""
+        pellet_map, self.pellet_count, self.power_pellet_count = pellets
+        self.pellet_map[:] = pellet_map
+        # The pellet layer no longer matches; render it again when drawn
+        self._pellet_layer = None
+        self.dirty_rects = []
+    
+    def _build_spawn_tiles(self):
+        """Collect the reachable walkable tiles into a compact index array."""
+        size = self.width * self.height
+        main = self.nav.main_component
+        return array('H' if size <= 0x10000 else 'I',
+                     [index for index, label in enumerate(self.nav.component)
+                      if label == main])
+    
+    def random_spawn_position(self, rng=None):
+        """Pick a random reachable tile and return its pixel position."""
+        rng = rng if rng is not None else self.rng
+        index = self.spawn_tiles[rng.randrange(len(self.spawn_tiles))]
+        tile_y, tile_x = divmod(index, self.width)
+        return (tile_x * TILE_SIZE, tile_y * TILE_SIZE)
+    
+    def random_target_position(self, rng=None):
+        """Pick a random tile for a ghost to head for and return its pixel position."""
+        if self.waypoints is None:
+            return self.random_spawn_position(rng)
+        rng = rng if rng is not None else self.rng
+        index = self.waypoints[rng.randrange(len(self.waypoints))]
+        tile_y, tile_x = divmod(index, self.width)
+        return (tile_x * TILE_SIZE, tile_y * TILE_SIZE)
+    
+    def set_waypoints(self, count, rng=None):
+        """Restrict random ghost targets to count distinct spawn tiles."""
+        rng = rng if rng is not None else self.rng
+        count = min(count, len(self.spawn_tiles))
+        self.waypoints = array(self.spawn_tiles.typecode,
+                               sorted(rng.sample(self.spawn_tiles, count)))
+    
+    def scatter_corner(self, x, y):
+        """Get the pixel position of the corner of the maze nearest to (x, y).
         
-    def _initialize_elements(self):
-        """Set up initial positions of walls, pellets, and power pellets."""
-        for y, row in enumerate(self.layout):
-            for x, cell in enumerate(row):
-                pos = (x * TILE_SIZE + TILE_SIZE//2, 
-                      y * TILE_SIZE + TILE_SIZE//2)
-                if cell == 1:
-                    self.walls.append(pygame.Rect(x * TILE_SIZE, 
-                                                y * TILE_SIZE, 
-                                                TILE_SIZE, TILE_SIZE))
-                elif cell == 2:
-                    self.pellets.append(pos)
-                elif cell == 3:
-                    self.power_pellets.append(pos)
+        Corners are the reachable tiles closest to the four inner corners of
+        the border, like the arcade ghosts' home corners.
+        """
+        tile_x = 1 if x // TILE_SIZE < self.width // 2 else self.width - 2
+        tile_y = 1 if y // TILE_SIZE < self.height // 2 else self.height - 2
+        index = self.nav.nearest_tile(self.nav.tile_index(tile_x, tile_y))
+        tile_y, tile_x = divmod(index, self.width)
+        return (tile_x * TILE_SIZE, tile_y * TILE_SIZE)
     
     def _create_wall_surface(self):
         """Create a blue pixel style wall texture."""
@@ -222,7 +175,7 @@ class Maze:
         # Create pixel pattern
         for y in range(0, TILE_SIZE, pixel_size):
             for x in range(0, TILE_SIZE, pixel_size):
-                color = random.choice(blue_colors)
+                color = self.rng.choice(blue_colors)
                 pygame.draw.rect(surface, color, 
                                (x, y, pixel_size, pixel_size))
         
@@ -230,38 +183,144 @@ class Maze:
     
     def draw(self, screen):
         """Render the maze and all its elements."""
-        # Draw walls
-        for wall in self.walls:
-            screen.blit(self.wall_surface, wall)
+        self._ensure_layers()
+        self.dirty_rects = []
         
-        # Draw pellets (Amazon orange dots)
-        for pellet in self.pellets:
-            pygame.draw.circle(screen, (255, 153, 0), pellet, 2)
+        # Walls and pellets come from the pre-rendered layers
+        screen.blit(self._background, (0, 0))
+        screen.blit(self._pellet_layer, (0, 0))
         
+        self.draw_power_pellets(screen)
+    
+    def draw_region(self, screen, rect):
+        """Restore the static maze layers inside one screen rectangle."""
+        self._ensure_layers()
+        screen.fill(BLACK, rect)
+        screen.blit(self._background, rect, rect)
+        screen.blit(self._pellet_layer, rect, rect)
+    
+    def draw_power_pellets(self, screen):
+        """Draw the pulsing power pellets and return the rects they cover."""
         # Draw power pellets with pulsing effect (Amazon blue)
         pulse = abs(pygame.time.get_ticks() % 1000 - 500) / 500.0
         size = 4 + pulse * 3
-        for power_pellet in self.power_pellets:
-            pygame.draw.circle(screen, (0, 155, 255), power_pellet, size)
+        rects = []
+        for power_pellet in self.pellet_positions(TILE_POWER_PELLET):
+            rects.append(pygame.draw.circle(screen, (0, 155, 255), power_pellet, size))
+        return rects
+    
+    def take_dirty_rects(self):
+        """Return and clear the tiles whose pellets changed since last asked."""
+        rects = self.dirty_rects
+        self.dirty_rects = []
+        return rects
+    
+    def prerender(self):
+        """Render the wall background and pellet layer now rather than on first draw."""
+        self._ensure_layers()
+    
+    def _ensure_layers(self):
+        """Pre-render the wall background and pellet layer if needed."""
+        size = (self.width * TILE_SIZE, self.height * TILE_SIZE)
+        if self._background is None:
+            # Draw walls
+            self._background = pygame.Surface(size)
+            self._background.fill(BLACK)
+            for wall in self.walls:
+                self._background.blit(self.wall_surface, wall)
+        
+        if self._pellet_layer is None:
+            # Draw pellets (Amazon orange dots) on a see-through layer
+            self._pellet_layer = pygame.Surface(size)
+            self._pellet_layer.fill(BLACK)
+            self._pellet_layer.set_colorkey(BLACK)
+            for pellet in self.pellet_positions(TILE_PELLET):
+                pygame.draw.circle(self._pellet_layer, (255, 153, 0), pellet, 2)
+    
+    def _clear_pellet_tile(self, index):
+        """Erase an eaten pellet from the pellet layer and mark it dirty."""
+        tile_y, tile_x = divmod(index, self.width)
+        rect = pygame.Rect(tile_x * TILE_SIZE, tile_y * TILE_SIZE,
+                           TILE_SIZE, TILE_SIZE)
+        if self._pellet_layer is not None:
+            self._pellet_layer.fill(BLACK, rect)
+        self.dirty_rects.append(rect)
+    
+    def pellet_positions(self, kind):
+        """Yield the pixel centres of the remaining pellets of one kind."""
+        pellet_map = self.pellet_map
+        width = self.width
+        index = pellet_map.find(kind)
+        while index != -1:
+            y, x = divmod(index, width)
+            yield (x * TILE_SIZE + TILE_SIZE//2, y * TILE_SIZE + TILE_SIZE//2)
+            index = pellet_map.find(kind, index + 1)
     
     def check_collision(self, rect):
         """Check if the given rectangle collides with any walls."""
-        return any(wall.colliderect(rect) for wall in self.walls)
+        return self._overlaps_wall(rect.x, rect.y, rect.width, rect.height)
+    
+    def _overlaps_wall(self, x, y, width, height):
+        """Check the grid tiles covered by a box for walls.
+        
+        Only the tiles under the box are looked up (1-4 for a sprite),
+        so the cost does not grow with the size of the maze. Tiles
+        outside the grid count as walls.
+        """
+        if width <= 0 or height <= 0:
+            return False
+        left = int(x // TILE_SIZE)
+        top = int(y // TILE_SIZE)
+        right = int((x + width - 1) // TILE_SIZE)
+        bottom = int((y + height - 1) // TILE_SIZE)
+        if left < 0 or top < 0 or right >= self.width or bottom >= self.height:
+            return True
+        cells = self.layout.cells
+        stride = self.layout.stride
+        for tile_y in range(top, bottom + 1):
+            row = tile_y * stride
+            for tile_x in range(left + row, right + row + 1):
+                if cells[tile_x] == TILE_WALL:
+                    return True
+        return False
     
     def eat_pellet(self, pos):
         """Try to eat a pellet or power pellet at the given position."""
-        # Find the closest pellet within a certain radius
+        # Find a pellet within a certain radius. Only the few tiles whose
+        # centre can be that close need looking at.
         radius = 10  # Detection radius
+        x, y = pos
+        left = max(int((x - radius) // TILE_SIZE), 0)
+        top = max(int((y - radius) // TILE_SIZE), 0)
+        right = min(int((x + radius) // TILE_SIZE), self.width - 1)
+        bottom = min(int((y + radius) // TILE_SIZE), self.height - 1)
         
-        for i, pellet in enumerate(self.pellets):
-            if distance(pos, pellet) < radius:
-                self.pellets.pop(i)
-                return PELLET_POINTS
-                
-        for i, power_pellet in enumerate(self.power_pellets):
-            if distance(pos, power_pellet) < radius:
-                self.power_pellets.pop(i)
-                return POWER_PELLET_POINTS
+        # Regular pellets take priority over power pellets
+        power_index = -1
+        pellet_map = self.pellet_map
+        for tile_y in range(top, bottom + 1):
+            dy = tile_y * TILE_SIZE + TILE_SIZE//2 - y
+            for tile_x in range(left, right + 1):
+                index = tile_y * self.width + tile_x
+                kind = pellet_map[index]
+                if not kind:
+                    continue
+                dx = tile_x * TILE_SIZE + TILE_SIZE//2 - x
+                if dx * dx + dy * dy >= radius * radius:
+                    continue
+                if kind == TILE_PELLET:
+                    pellet_map[index] = 0
+                    self.pellet_count -= 1
+                    self._clear_pellet_tile(index)
+                    return PELLET_POINTS
+                if power_index == -1:
+                    power_index = index
+                    
+        if power_index != -1:
+            pellet_map[power_index] = 0
+            self.power_pellet_count -= 1
+            self._clear_pellet_tile(power_index)
+            return POWER_PELLET_POINTS
                 
         return 0
     
@@ -271,20 +330,9 @@ class Maze:
     
     def is_valid_position(self, x, y):
         """Check if the given position is a valid movement position."""
-        # Create a rect for the player at the new position
-        player_rect = pygame.Rect(x, y, TILE_SIZE-4, TILE_SIZE-4)
-        
-        # Check if this rect collides with any walls
-        if any(wall.colliderect(player_rect) for wall in self.walls):
-            return False
-            
-        # Also check grid position
-        tile_x, tile_y = self.get_tile_position(x, y)
-        if (0 <= tile_y < len(self.layout) and 
-            0 <= tile_x < len(self.layout[0])):
-            return self.layout[tile_y][tile_x] != 1
-            
-        return False
+        # The player's box at the new position (TILE_SIZE-4 square) covers
+        # at most 2x2 tiles, so only those grid cells need checking
+        return not self._overlaps_wall(x, y, TILE_SIZE-4, TILE_SIZE-4)
     
     def get_valid_moves(self, current_pos):
         """Get list of valid movement directions from current position."""
@@ -299,4 +347,4 @@ class Maze:
     
     def remaining_pellets(self):
         """Get the total number of uneaten pellets."""
-        return len(self.pellets) + len(self.power_pellets)
+        return self.pellet_count + self.power_pellet_count
@@ -0,0 +1,219 @@
+"""
+Procedural maze layouts for Amazon Pac-Man.
+A layout is a bordered field with lines of text drawn in wall glyphs and,
+optionally, scattered wall blocks. Pockets the player cannot reach are walled
+up, so every path tile is connected. Generated layouts are cached on disk
+keyed by their parameters, so large mazes are only built once.
+
+Usage: python mazegen.py [width] [height] [LINE/LINE...]
+"""
+import os
+import random
+import hashlib
+from collections import deque
+from utils import *
+from layout import MazeLayout
+
+GENERATOR_VERSION = 2  # Bump when generation changes so cached layouts are rebuilt
+DEFAULT_TEXT = ("AMAZON", "QCLI")
+MAZE_CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
+
+# Left edge of each line on the original board. Other mazes centre their
+# text; the default one keeps QCLI where it was, so its seeds and
+# recordings play out as before.
+CLASSIC_TEXT_X = {(MAZE_WIDTH, MAZE_HEIGHT, DEFAULT_TEXT): (3, 8)}
+
+# 3x5 wall patterns for the text ("1" is wall). Characters without a glyph
+# are left blank.
+GLYPHS = {
+    "A": ("010", "101", "111", "101", "101"),
+    "B": ("110", "101", "110", "101", "110"),
+    "C": ("111", "100", "100", "100", "111"),
+    "D": ("110", "101", "101", "101", "110"),
+    "E": ("111", "100", "111", "100", "111"),
+    "F": ("111", "100", "111", "100", "100"),
+    "G": ("111", "100", "101", "101", "111"),
+    "H": ("101", "101", "111", "101", "101"),
+    "I": ("111", "010", "010", "010", "111"),
+    "J": ("001", "001", "001", "101", "111"),
+    "K": ("101", "101", "110", "101", "101"),
+    "L": ("100", "100", "100", "100", "111"),
+    "M": ("101", "101", "111", "101", "101"),
+    "N": ("101", "111", "101", "101", "101"),  # Made very distinct
+    "O": ("111", "101", "101", "101", "111"),
+    "P": ("111", "101", "111", "100", "100"),
+    "Q": ("111", "101", "101", "101", "111", "001"),  # Tail sets it apart from O
+    "R": ("111", "101", "110", "101", "101"),
+    "S": ("111", "100", "111", "001", "111"),
+    "T": ("111", "010", "010", "010", "010"),
+    "U": ("101", "101", "101", "101", "111"),
+    "V": ("101", "101", "101", "101", "010"),
+    "W": ("101", "101", "111", "111", "101"),
+    "X": ("101", "101", "010", "101", "101"),
+    "Y": ("101", "101", "010", "010", "010"),
+    "Z": ("111", "001", "010", "100", "111"),
+    "0": ("111", "101", "101", "101", "111"),
+    "1": ("010", "110", "010", "010", "111"),
+    "2": ("111", "001", "111", "100", "111"),
+    "3": ("111", "001", "111", "001", "111"),
+    "4": ("101", "101", "111", "001", "001"),
+    "5": ("111", "100", "111", "001", "111"),
+    "6": ("111", "100", "111", "101", "111"),
+    "7": ("111", "001", "001", "001", "001"),
+    "8": ("111", "101", "111", "101", "111"),
+    "9": ("111", "101", "111", "001", "111"),
+}
+GLYPH_WIDTH = 3
+GLYPH_HEIGHT = 6  # Rows reserved per line of text (Q has a tail)
+GLYPH_SPACING = 4  # Blank columns between letters
+
+
+def generate_layout(width=MAZE_WIDTH, height=MAZE_HEIGHT, text=DEFAULT_TEXT, density=0.0, seed=0):
+    """Generate a connected maze layout as a MazeLayout of TILE_* values.
+
+    text is a sequence of lines drawn in wall glyphs, scaled up on large
+    mazes. density is the chance of a wall block at each point of a 4-tile
+    lattice between the letters; seed fixes where the blocks go.
+    """
+    if width < 8 or height < 8:
+        raise ValueError(f"maze must be at least 8x8, not {width}x{height}")
+    grid = bytearray([TILE_PELLET]) * (width * height)
+
+    # Create border
+    for x in range(width):
+        grid[x] = grid[(height - 1) * width + x] = TILE_WALL
+    for y in range(height):
+        grid[y * width] = grid[y * width + width - 1] = TILE_WALL
+
+    # Letters grow with the maze so the text stays legible when zoomed out
+    scale = max(1, min(width // MAZE_WIDTH, height // MAZE_HEIGHT))
+    text_boxes = _draw_text(grid, width, height, text, scale)
+
+    if density > 0:
+        _scatter_blocks(grid, width, height, density, seed, text_boxes)
+
+    # Add power pellets in corners and center
+    power_pellet_positions = [
+        (2, 2), (width-3, 2), (2, height-3), (width-3, height-3),
+        (width//2, height//2)
+    ]
+    for x, y in power_pellet_positions:
+        if grid[y * width + x] != TILE_WALL:
+            grid[y * width + x] = TILE_POWER_PELLET
+
+    # Ensure starting position is clear
+    grid[width + 1] = TILE_PELLET
+    grid[2 * width + 1] = TILE_EMPTY
+    grid[width + 2] = TILE_EMPTY
+
+    _wall_off_pockets(grid, width, height, width + 1)
+    return MazeLayout(grid, width, height)
+
+
+def _draw_text(grid, width, height, text, scale):
+    """Draw each line of text centred; return the (x0, y0, x1, y1) boxes used."""
+    lines = [line.upper() for line in text if line]
+    if not lines:
+        return []
+    glyph_height = GLYPH_HEIGHT * scale
+    # Lines are spread from a sixth of the way down to a third from the bottom
+    top = height // 6
+    bottom = height - height // 3
+    if len(lines) == 1:
+        rows = [(height - glyph_height) // 2]
+    else:
+        step = (bottom - top) / (len(lines) - 1)
+        rows = [round(top + i * step) for i in range(len(lines))]
+
+    classic = CLASSIC_TEXT_X.get((width, height, tuple(lines)))
+    boxes = []
+    for i, (line, y) in enumerate(zip(lines, rows)):
+        line_width = (len(line) * GLYPH_WIDTH + (len(line) - 1) * GLYPH_SPACING) * scale
+        if line_width > width - 4 or y < 2 or y + glyph_height > height - 2:
+            raise ValueError(f"text {line!r} does not fit a {width}x{height} maze")
+        x = classic[i] if classic else (width - line_width) // 2
+        boxes.append((x, y, x + line_width, y + glyph_height))
+        for char in line:
+            for py, row in enumerate(GLYPHS.get(char, ())):
+                for px, cell in enumerate(row):
+                    if cell == "1":
+                        _fill(grid, width, x + px * scale, y + py * scale,
+                              scale, scale, TILE_WALL)
+            x += (GLYPH_WIDTH + GLYPH_SPACING) * scale
+    return boxes
+
+
+def _scatter_blocks(grid, width, height, density, seed, keep_clear):
+    """Place random 1x1 to 2x2 wall blocks on a lattice, away from the text."""
+    rng = random.Random(seed)
+    for y in range(3, height - 4, 4):
+        for x in range(3, width - 4, 4):
+            if rng.random() >= density:
+                continue
+            block_w, block_h = rng.randint(1, 2), rng.randint(1, 2)
+            if any(x0 - 2 <= x + block_w and x <= x1 + 1 and
+                   y0 - 2 <= y + block_h and y <= y1 + 1
+                   for x0, y0, x1, y1 in keep_clear):
+                continue
+            _fill(grid, width, x, y, block_w, block_h, TILE_WALL)
+
+
+def _fill(grid, width, x, y, w, h, value):
+    """Set a rectangle of tiles to value."""
+    for row in range(y, y + h):
+        grid[row * width + x:row * width + x + w] = bytes([value]) * w
+
+
+def _wall_off_pockets(grid, width, height, start):
+    """Turn every path tile not reachable from start into wall."""
+    reached = bytearray(len(grid))
+    reached[start] = 1
+    queue = deque([start])
+    while queue:
+        index = queue.popleft()
+        for neighbour in (index - width, index + width, index - 1, index + 1):
+            if not reached[neighbour] and grid[neighbour] != TILE_WALL:
+                reached[neighbour] = 1
+                queue.append(neighbour)
+    for index in range(len(grid)):
+        if not reached[index]:
+            grid[index] = TILE_WALL
+
+
+def layout_cache_path(width, height, text, density, seed, cache_dir=MAZE_CACHE_DIR):
+    """Get the cache file for a set of generator parameters."""
+    key = repr((GENERATOR_VERSION, width, height, tuple(text), density, seed))
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"maze-{width}x{height}-{digest}.bin")
+
+
+def load_layout(width=MAZE_WIDTH, height=MAZE_HEIGHT, text=DEFAULT_TEXT, density=0.0, seed=0,
+                cache_dir=MAZE_CACHE_DIR):
+    """Get a generated layout, from the disk cache when it has been built before.
+
+    Cached layouts are memory-mapped read-only. Pass cache_dir=None to
+    always generate. Failing to read or write the cache only costs a
+    regeneration.
+    """
+    if cache_dir is None:
+        return generate_layout(width, height, text, density, seed)
+    path = layout_cache_path(width, height, text, density, seed, cache_dir)
+    try:
+        return MazeLayout.load(path)
+    except (OSError, ValueError):
+        pass
+    layout = generate_layout(width, height, text, density, seed)
+    try:
+        layout.save(path)
+    except OSError:
+        pass
+    return layout
+
+
+if __name__ == "__main__":
+    import sys
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else MAZE_WIDTH
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else MAZE_HEIGHT
+    text = sys.argv[3].split("/") if len(sys.argv) > 3 else DEFAULT_TEXT
+    for row in generate_layout(width, height, text):
+        print("".join(" #.o"[cell] for cell in row))
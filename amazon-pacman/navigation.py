@@ -0,0 +1,221 @@
+"""
+Navigation graph over the walkable tiles of the maze, used by the ghost AI.
+Shortest paths come from breadth-first distance fields that are cached per
+target tile, so choosing a move is a handful of table lookups.
+"""
+from array import array
+from collections import OrderedDict, deque, namedtuple
+from utils import *
+from layout import MazeLayout
+
+UNREACHABLE = 0xFFFF  # Distance stored for tiles a field cannot reach
+FIELD_CACHE_BYTES = 32 * 1024 * 1024  # Memory budget for cached distance fields
+EXIT_DIRECTIONS = [UP, DOWN, LEFT, RIGHT]  # Direction of each bit in an exit mask
+
+# Distance field cache statistics returned by NavGraph.cache_info()
+FieldCacheInfo = namedtuple("FieldCacheInfo", ["fields", "max_fields", "built"])
+
+# Byte translation that maps every tile value to 1 if walkable, 0 if wall
+_WALKABLE = bytes(0 if value == TILE_WALL else 1 for value in range(256))
+
+
+class NavGraph:
+    def __init__(self, layout, cache_size=None):
+        if not isinstance(layout, MazeLayout):
+            layout = MazeLayout.from_rows(layout)
+        self.height = layout.height
+        self.width = layout.width
+        size = self.width * self.height
+
+        # Walkable tiles and, for each of them, a 4-bit mask of the
+        # directions leading to a walkable neighbour. Tiles are indexed
+        # row-major; one byte per tile keeps huge mazes compact.
+        self.walkable = bytearray(layout.tobytes().translate(_WALKABLE))
+        self.exits = self._exit_masks()
+
+        # Per mask: the moves it allows and the index offsets they step by
+        offsets = [-self.width, self.width, -1, 1]
+        self._moves = [tuple(EXIT_DIRECTIONS[bit] for bit in range(4) if mask >> bit & 1)
+                       for mask in range(16)]
+        self._steps = [tuple((EXIT_DIRECTIONS[bit], offsets[bit])
+                             for bit in range(4) if mask >> bit & 1)
+                       for mask in range(16)]
+        self._offsets = [tuple(offset for _, offset in steps) for steps in self._steps]
+
+        # Letter glyphs can wall off small pockets of path. Everything is
+        # steered towards the largest connected region instead.
+        self.component, sizes = self._label_components()
+        self.main_component = max(range(len(sizes)), key=sizes.__getitem__,
+                                  default=-1)
+        self._nearest = {}  # Off-region tile -> closest main-region tile
+
+        # Distance fields keyed by target tile, least recently used first.
+        # On small mazes the budget holds a field for every tile, which
+        # amounts to an all-pairs table filled in on demand.
+        if cache_size is None:
+            cache_size = max(16, FIELD_CACHE_BYTES // (2 * size))
+        self.cache_size = cache_size
+        self._fields = OrderedDict()
+        self._built = 0  # Fields computed since the last clear_cache()
+        # The field handed out last: ghosts sharing a target within a tick
+        # reuse it without touching the LRU order
+        self._last_target = None
+        self._last_field = None
+
+    def _exit_masks(self):
+        """Build every tile's exit mask at once from shifted walkable maps.
+
+        With one byte per tile, a bytes object read as an integer lets the
+        neighbour maps be shifted into their bit and OR-ed together for the
+        whole grid in a few big-integer operations.
+        """
+        width, height = self.width, self.height
+        walkable = bytes(self.walkable)
+        as_int = lambda data: int.from_bytes(data, "little")
+        up = as_int(bytes(width) + walkable[:-width])
+        down = as_int(walkable[width:] + bytes(width))
+        left = as_int(b"\0" + walkable[:-1]) & as_int((b"\0" + b"\1" * (width - 1)) * height)
+        right = as_int(walkable[1:] + b"\0") & as_int((b"\1" * (width - 1) + b"\0") * height)
+        masks = (up | down << 1 | left << 2 | right << 3) & as_int(walkable) * 15
+        return bytearray(masks.to_bytes(width * height, "little"))
+
+    def _label_components(self):
+        """Label walkable tiles by connected region and count region sizes."""
+        component = array('i', [-1]) * len(self.walkable)
+        exits, offsets = self.exits, self._offsets
+        sizes = []
+        for start in range(len(self.walkable)):
+            if not self.walkable[start] or component[start] != -1:
+                continue
+            label = len(sizes)
+            component[start] = label
+            size = 1
+            queue = deque([start])
+            while queue:
+                index = queue.popleft()
+                for offset in offsets[exits[index]]:
+                    neighbour = index + offset
+                    if component[neighbour] == -1:
+                        component[neighbour] = label
+                        size += 1
+                        queue.append(neighbour)
+            sizes.append(size)
+        return component, sizes
+
+    def nearest_tile(self, index):
+        """Get a closest tile of the main region to any tile (walls included)."""
+        if self.component[index] == self.main_component:
+            return index
+        nearest = self._nearest.get(index)
+        if nearest is not None:
+            return nearest
+
+        # Breadth-first over the whole grid until the main region is reached
+        seen = {index}
+        queue = deque([index])
+        while queue and nearest is None:
+            tile = queue.popleft()
+            y, x = divmod(tile, self.width)
+            for dx, dy in EXIT_DIRECTIONS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    neighbour = ny * self.width + nx
+                    if self.component[neighbour] == self.main_component:
+                        nearest = neighbour
+                        break
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        queue.append(neighbour)
+        self._nearest[index] = nearest
+        return nearest
+
+    def nearest_array(self):
+        """Get nearest_tile() for every tile as an array."""
+        return array('i', [self.nearest_tile(index) for index in range(len(self.walkable))])
+
+    def tile_index(self, tile_x, tile_y):
+        """Convert grid coordinates to a tile index, clamped to the grid."""
+        tile_x = min(max(tile_x, 0), self.width - 1)
+        tile_y = min(max(tile_y, 0), self.height - 1)
+        return tile_y * self.width + tile_x
+
+    def pixel_to_index(self, x, y):
+        """Convert pixel coordinates to a tile index, clamped to the grid."""
+        return self.tile_index(int(x // TILE_SIZE), int(y // TILE_SIZE))
+
+    def is_reachable(self, index):
+        """Check if a tile belongs to the main connected region."""
+        return self.component[index] == self.main_component
+
+    def moves(self, index):
+        """Get the directions that lead to a walkable neighbouring tile."""
+        return list(self._moves[self.exits[index]])
+
+    def neighbours(self, index):
+        """Get the indices of the walkable tiles next to a tile."""
+        return tuple(index + offset for offset in self._offsets[self.exits[index]])
+
+    def cache_info(self):
+        """Get how many fields are cached, the limit and how many were built."""
+        return FieldCacheInfo(len(self._fields), self.cache_size, self._built)
+
+    def clear_cache(self):
+        """Drop every cached distance field and reset the build count."""
+        self._fields.clear()
+        self._last_target = None
+        self._last_field = None
+        self._built = 0
+
+    def distance_field(self, target):
+        """Get the BFS distance from every tile to the target tile."""
+        field = self._fields.get(target)
+        if field is not None:
+            self._fields.move_to_end(target)
+            return field
+
+        field = array('H', [UNREACHABLE]) * len(self.walkable)
+        field[target] = 0
+        exits, offsets = self.exits, self._offsets
+        frontier = [target]
+        dist = 0
+        while frontier:
+            dist += 1
+            next_frontier = []
+            for index in frontier:
+                for offset in offsets[exits[index]]:
+                    neighbour = index + offset
+                    if field[neighbour] == UNREACHABLE:
+                        field[neighbour] = dist
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+
+        self._fields[target] = field
+        self._built += 1
+        if len(self._fields) > self.cache_size:
+            self._fields.popitem(last=False)
+        return field
+
+    def next_move(self, index, target, direction=None):
+        """Get the first step of a shortest path from index to target.
+
+        Targets off the main region are replaced by the closest tile on it.
+        Ties keep the current direction. Returns None when no neighbour
+        leads to the target.
+        """
+        target = self.nearest_tile(target)
+        if target == self._last_target:
+            field = self._last_field
+        else:
+            field = self.distance_field(target)
+            self._last_target = target
+            self._last_field = field
+        best_move = None
+        best_distance = UNREACHABLE
+        for move, offset in self._steps[self.exits[index]]:
+            dist = field[index + offset]
+            if dist < best_distance or (dist == best_distance and
+                                        dist != UNREACHABLE and
+                                        move == direction):
+                best_distance = dist
+                best_move = move
+        return best_move
@@ -2,28 +2,49 @@
 Player class handling Pac-Man movement, animation, and game mechanics.
 """
 import pygame
+from operator import attrgetter
 from utils import *
+from sprites import player_sprite
+from timing import WALL_CLOCK
+
+# Attributes that change during play, saved and restored by snapshots
+PLAYER_STATE_FIELDS = ("x", "y", "direction", "next_direction", "lives",
+                       "score", "powered_up", "power_time", "animation_frame",
+                       "is_dead", "is_moving", "mouth_angle", "mouth_direction")
+_get_player_state = attrgetter(*PLAYER_STATE_FIELDS)
 
 class Player:
-    def __init__(self, x, y):
+    # Fixed attribute slots instead of a per-instance dict (see Ghost)
+    __slots__ = ("clock", "scheduler", "x", "y", "direction", "next_direction", "speed",
+                 "lives", "score", "powered_up", "power_time", "animation_frame",
+                 "is_dead", "is_moving", "mouth_angle", "mouth_direction")
+    
+    # Drawing and animation settings shared by every player
+    radius = TILE_SIZE // 2 - 2
+    animation_speed = 0.2
+    mouth_speed = 5  # Degrees the mouth opens or closes per tick
+    power_duration = 6000  # 6 seconds
+    
+    def __init__(self, x, y, clock=WALL_CLOCK, scheduler=None):
+        self.clock = clock  # Source of game time (see timing.py)
+        # Tick scheduler that ends power-ups; without one they last until
+        # the player dies or is reset
+        self.scheduler = scheduler
         self.x = x
         self.y = y
         self.direction = RIGHT
         self.next_direction = RIGHT
         self.speed = PLAYER_SPEED
-        self.radius = TILE_SIZE // 2 - 2
         self.lives = 3
         self.score = 0
         self.powered_up = False
         self.power_time = 0
         self.animation_frame = 0
-        self.animation_speed = 0.2
         self.is_dead = False
         self.is_moving = False  # Track if player is currently moving
         
         # Animation angles for mouth
         self.mouth_angle = 0
-        self.mouth_speed = 5
         self.mouth_direction = 1  # 1 for opening, -1 for closing
         
     def update(self, maze):
@@ -70,13 +91,16 @@ class Player:
         points = maze.eat_pellet((center_x, center_y))
         if points == POWER_PELLET_POINTS:
             self.powered_up = True
-            self.power_time = pygame.time.get_ticks()
+            self.power_time = self.clock.get_ticks()
+            if self.scheduler is not None:
+                self.scheduler.call_after(self.power_time + self.power_duration,
+                                          self._end_power, self.power_time)
         self.score += points
         
-        # Update power pellet status
-        if self.powered_up:
-            if pygame.time.get_ticks() - self.power_time > 6000:  # 6 seconds
-                self.powered_up = False
+    def _end_power(self, started):
+        """Scheduler callback: the power pellet wears off."""
+        if started == self.power_time:
+            self.powered_up = False
                 
     def draw(self, screen):
         """Draw Pac-Man with mouth animation."""
@@ -84,37 +108,9 @@ class Player:
             self._draw_death_animation(screen)
             return
             
-        # Calculate the angles for the Pac-Man arc
-        start_angle = 0
-        if self.direction == RIGHT:
-            start_angle = -self.mouth_angle
-        elif self.direction == LEFT:
-            start_angle = 180 - self.mouth_angle
-        elif self.direction == UP:
-            start_angle = 90 - self.mouth_angle
-        elif self.direction == DOWN:
-            start_angle = 270 - self.mouth_angle
-            
-        # Draw Pac-Man body - use Amazon orange color
-        amazon_yellow = (255, 153, 0)  # Amazon orange/yellow
-        center = (int(self.x + TILE_SIZE//2), int(self.y + TILE_SIZE//2))
-        pygame.draw.circle(screen, amazon_yellow, center, self.radius)
-        
-        # Draw mouth using a simple polygon
-        if not self.mouth_angle == 0:
-            # Calculate mouth points manually using math module
-            import math
-            angle1_rad = math.radians(start_angle - self.mouth_angle)
-            angle2_rad = math.radians(start_angle + self.mouth_angle)
-            
-            # Calculate end points of mouth lines
-            x1 = center[0] + self.radius * math.cos(angle1_rad)
-            y1 = center[1] - self.radius * math.sin(angle1_rad)
-            x2 = center[0] + self.radius * math.cos(angle2_rad)
-            y2 = center[1] - self.radius * math.sin(angle2_rad)
-            
-            # Draw mouth as triangle
-            pygame.draw.polygon(screen, BLACK, [center, (int(x1), int(y1)), (int(x2), int(y2))])
+        # Pre-rendered frame for this direction and mouth opening
+        screen.blit(player_sprite(self.direction, self.mouth_angle, self.radius),
+                    (int(self.x), int(self.y)))
     
     def _update_death_animation(self):
         """Update the death animation sequence."""
@@ -125,7 +121,6 @@ class Player:
             
     def _draw_death_animation(self, screen):
         """Draw the death animation sequence."""
-        import math
         center = (int(self.x + TILE_SIZE//2), int(self.y + TILE_SIZE//2))
         
         # Draw a simple circle that gets smaller as animation progresses
@@ -137,21 +132,34 @@ class Player:
         """Handle keyboard input for movement."""
         if event.type == pygame.KEYDOWN:
             if event.key == pygame.K_UP:
-                self.next_direction = UP
-                self.is_moving = True
+                self.steer(UP)
             elif event.key == pygame.K_DOWN:
-                self.next_direction = DOWN
-                self.is_moving = True
+                self.steer(DOWN)
             elif event.key == pygame.K_LEFT:
-                self.next_direction = LEFT
-                self.is_moving = True
+                self.steer(LEFT)
             elif event.key == pygame.K_RIGHT:
-                self.next_direction = RIGHT
-                self.is_moving = True
+                self.steer(RIGHT)
         elif event.type == pygame.KEYUP:
             # Stop moving when key is released
             if event.key in (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT):
-                self.is_moving = False
+                self.steer(None)
+    
+    def steer(self, direction):
+        """Start moving in a direction, or stop when direction is None."""
+        if direction is None:
+            self.is_moving = False
+        else:
+            self.next_direction = direction
+            self.is_moving = True
+                
+    def snapshot(self):
+        """Get the player's changing state as a tuple."""
+        return _get_player_state(self)
+    
+    def restore(self, state):
+        """Put back state returned by snapshot()."""
+        for name, value in zip(PLAYER_STATE_FIELDS, state):
+            setattr(self, name, value)
                 
     def die(self):
         """Start death animation and reduce lives."""
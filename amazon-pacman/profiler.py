@@ -0,0 +1,264 @@
+"""
+Frame-time profiler for the Amazon Pac-Man game loop.
+While enabled, the profiled game's maze and loop methods are wrapped on those
+instances only, and Game.update times the player and ghost updates itself;
+disabling removes the wrappers, so other games and a game that never turns
+profiling on pay nothing for it.
+"""
+import os
+import csv
+import json
+import time
+import functools
+from collections import deque
+import pygame
+from utils import *
+
+HISTORY_FRAMES = 3600  # Frames kept for the overlay and exports (1 minute at 60 FPS)
+GRAPH_FRAMES = 240  # Frames shown in the rolling frame-time graph
+STATS_INTERVAL = 30  # Frames between overlay refreshes
+FRAME_BUDGET_MS = 1000 / FPS
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+
+# Actor updates, timed by Game.update through add_time(). Times are
+# inclusive: Maze.eat_pellet also counts towards Player.update.
+ACTOR_LABELS = ["Player.update", "Ghost.update"]
+# Maze methods timed per frame as (method name, label)
+MAZE_METHODS = [
+    ("eat_pellet", "Maze.eat_pellet"),
+    ("draw", "Maze.draw"),
+    ("draw_region", "Maze.draw_region"),
+]
+# Maze methods whose calls are only counted
+COUNTED_METHODS = [
+    ("is_valid_position", "is_valid_position"),
+]
+# Game methods timed per frame
+GAME_METHODS = [
+    ("handle_events", "Game.handle_events"),
+    ("present", "display.flip"),
+]
+
+
+class FrameProfiler:
+    """Per-frame timings of the game loop's hot paths."""
+
+    def __init__(self, history=HISTORY_FRAMES):
+        self.enabled = False
+        self.visible = False
+        self.frames = deque(maxlen=history)  # One tuple per frame, see columns
+        self.frame_count = 0
+        self.labels = (ACTOR_LABELS + [label for _, label in MAZE_METHODS] +
+                       [label for _, label in GAME_METHODS])
+        self.counted = [label for _, label in COUNTED_METHODS]
+
+        # Totals for the frame in progress. The wrappers hold on to these
+        # dicts, so they are cleared in place rather than replaced.
+        self._times = dict.fromkeys(self.labels, 0.0)
+        self._calls = dict.fromkeys(self.labels + self.counted, 0)
+        self._no_times = dict(self._times)
+        self._no_calls = dict(self._calls)
+        # Fields of the recorded frame tuples; the times and call counts
+        # follow the order of the dicts above
+        self.columns = (["frame", "total_ms"] + [label + "_ms" for label in self._times] +
+                        [label + "_calls" for label in self._calls])
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+        self._frame_start = 0.0
+        self._wrapped = []  # (instance, method name) pairs to unwrap
+
+        # Overlay panel, rendered again every STATS_INTERVAL frames
+        self._panel = None
+        self._panel_stale = True
+
+    def enable(self, game):
+        """Start profiling a loaded game by wrapping its hot-path methods."""
+        if self.enabled:
+            return
+        targets = [(game.maze, name, label, True) for name, label in MAZE_METHODS]
+        targets += [(game.maze, name, label, False) for name, label in COUNTED_METHODS]
+        targets += [(game, name, label, True) for name, label in GAME_METHODS]
+        for instance, name, label, timed in targets:
+            # An instance attribute shadows the class's method for this
+            # object alone
+            method = getattr(instance, name)
+            wrapper = self._timed(label, method) if timed else self._counted(label, method)
+            setattr(instance, name, wrapper)
+            self._wrapped.append((instance, name))
+        self.enabled = True
+        self._panel_stale = True
+        self._frame_start = time.perf_counter()
+
+    def disable(self):
+        """Stop profiling and remove the wrappers."""
+        for instance, name in self._wrapped:
+            instance.__dict__.pop(name, None)
+        self._wrapped = []
+        self.enabled = False
+        self.visible = False
+
+    def toggle(self, game):
+        """Switch profiling and its overlay on or off together."""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable(game)
+            self.visible = True
+
+    def add_time(self, label, seconds, calls=1):
+        """Add time measured by the caller to the frame's total for label."""
+        self._times[label] += seconds
+        self._calls[label] += calls
+
+    def _timed(self, label, func):
+        """Wrap func so its calls add to the frame's time for label."""
+        times, calls, clock = self._times, self._calls, time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[label] += clock() - start
+                calls[label] += 1
+        return wrapper
+
+    def _counted(self, label, func):
+        """Wrap func so its calls are counted for label."""
+        calls = self._calls
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            calls[label] += 1
+            return func(*args, **kwargs)
+        return wrapper
+
+    def begin_frame(self):
+        """Mark the start of a frame's work."""
+        if not self.enabled:
+            return
+        self._times.update(self._no_times)
+        self._calls.update(self._no_calls)
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """Record the frame that began with the last begin_frame."""
+        if not self.enabled:
+            return
+        # A flat tuple is much cheaper to build than a dict every frame
+        self.frames.append((self.frame_count,
+                            (time.perf_counter() - self._frame_start) * 1000,
+                            *[seconds * 1000 for seconds in self._times.values()],
+                            *self._calls.values()))
+        self.frame_count += 1
+        if self.visible and self.frame_count % STATS_INTERVAL == 0:
+            self._panel_stale = True
+
+    def percentiles(self, column, points=(50, 95, 99)):
+        """Get nearest-rank percentiles of one column over the kept frames."""
+        index = self._column_index[column]
+        values = sorted(frame[index] for frame in self.frames)
+        if not values:
+            return [0.0 for _ in points]
+        return [values[min(len(values) - 1, len(values) * p // 100)] for p in points]
+
+    def summary(self):
+        """Get p50/p95/p99, mean and max for every column."""
+        columns = ["total_ms"] + [label + "_ms" for label in self.labels]
+        columns += [label + "_calls" for label in self.labels + self.counted]
+        summary = {}
+        for column in columns:
+            index = self._column_index[column]
+            values = [frame[index] for frame in self.frames]
+            p50, p95, p99 = self.percentiles(column)
+            summary[column] = {
+                "p50": p50, "p95": p95, "p99": p99,
+                "mean": sum(values) / len(values) if values else 0.0,
+                "max": max(values, default=0.0),
+            }
+        return summary
+
+    def frame_dicts(self):
+        """Get the kept frames as dicts keyed by column name."""
+        return [dict(zip(self.columns, frame)) for frame in self.frames]
+
+    def export_json(self, path):
+        """Write the summary and every kept frame to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({"fps": FPS, "summary": self.summary(),
+                       "frames": self.frame_dicts()}, f, indent=1)
+
+    def export_csv(self, path):
+        """Write one row per kept frame to a CSV file."""
+        if not self.frames:
+            return
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.columns)
+            writer.writerows(self.frames)
+
+    def export(self, directory=PROFILE_DIR):
+        """Export JSON and CSV files named after the current time; return the paths."""
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+        self.export_json(stem + ".json")
+        self.export_csv(stem + ".csv")
+        return stem + ".json", stem + ".csv"
+
+    def _build_stats_rows(self):
+        """Format the percentile table shown on the overlay, one tuple of cells per row."""
+        rows = [("ms", "p50", "p95", "p99")]
+        for label in ["total"] + self.labels:
+            rows.append((label,) + tuple(f"{value:.2f}" for value in
+                                         self.percentiles(label + "_ms")))
+        rows.append(("calls per frame",))
+        for label in self.counted:
+            rows.append((label,) + tuple(str(value) for value in
+                                         self.percentiles(label + "_calls")))
+        return rows
+
+    def _render_panel(self):
+        """Render the percentile table and frame-time graph onto the panel."""
+        rows = self._build_stats_rows()
+        line_height = 14
+        graph_height = 60
+        width = GRAPH_FRAMES + 20
+        height = len(rows) * line_height + graph_height + 20
+        if self._panel is None or self._panel.get_size() != (width, height):
+            self._panel = pygame.Surface((width, height))
+            self._panel.set_alpha(210)
+        panel = self._panel
+        panel.fill(BLACK)
+
+        # Percentile table: labels on the left, numbers right-aligned in
+        # fixed columns. Text comes from the shared rendered-text cache.
+        for i, row in enumerate(rows):
+            top = 5 + i * line_height
+            panel.blit(render_text(row[0], 16), (10, top))
+            for column, cell in enumerate(row[1:]):
+                text = render_text(cell, 16)
+                panel.blit(text, (170 + column * 40 - text.get_width(), top))
+
+        # Rolling graph of total frame time; the line marks the frame budget
+        top = len(rows) * line_height + 10
+        scale = graph_height / (2 * FRAME_BUDGET_MS)
+        recent = list(self.frames)[-GRAPH_FRAMES:]
+        for i, frame in enumerate(recent):
+            total_ms = frame[1]
+            bar = min(graph_height, int(total_ms * scale) + 1)
+            color = NEON_YELLOW if total_ms > FRAME_BUDGET_MS else NEON_BLUE
+            pygame.draw.line(panel, color, (10 + i, top + graph_height),
+                             (10 + i, top + graph_height - bar))
+        budget_y = top + graph_height - int(FRAME_BUDGET_MS * scale)
+        pygame.draw.line(panel, WHITE, (10, budget_y), (width - 10, budget_y))
+        self._panel_stale = False
+
+    def draw(self, screen, x=10, y=70):
+        """Draw the percentile table and frame-time graph; return the rect covered.
+        
+        The panel is only rendered again when the stats refresh, every
+        STATS_INTERVAL frames; in between it is a single blit.
+        """
+        if self._panel is None or self._panel_stale:
+            self._render_panel()
+        return screen.blit(self._panel, (x, y))
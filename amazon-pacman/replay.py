@@ -0,0 +1,228 @@
+"""
+Deterministic record and replay of Amazon Pac-Man sessions.
+A recording is the game's seed and maze options plus every input command with the tick it
+arrived on, delta-encoded into a few bytes per key press. State hashes taken
+at regular checkpoints let a replay prove it reproduced the session exactly.
+
+Usage: python replay.py FILE [--render] [--speed N]
+"""
+import os
+import sys
+import json
+import hashlib
+import pygame
+from utils import *
+
+REPLAY_MAGIC = b"PACREPLAY\n"
+REPLAY_VERSION = 3  # 2: timers fire from the tick scheduler, even during the death message
+                    # 3: ghost count, maze size and density in the header
+CHECKPOINT_TICKS = 600  # Ticks between state hashes (10 seconds at 60 FPS)
+
+
+class ReplayMismatch(Exception):
+    """A replayed game's state differs from the recorded one."""
+
+
+def state_hash(game):
+    """Hash everything that decides how a game plays out from here on."""
+    player = game.player
+    state = (
+        game.game_clock.tick_count, game.state, game.paused,
+        game.show_death_message, game.death_message_timer,
+        player.x, player.y, player.direction, player.next_direction,
+        player.is_moving, player.is_dead, player.lives, player.score,
+        player.powered_up, player.power_time,
+        [(ghost.x, ghost.y, ghost.direction, ghost.state, ghost.state_timer,
+          ghost.scared, ghost.target) for ghost in game.ghosts],
+        game.rng.getstate(),
+    )
+    digest = hashlib.blake2b(repr(state).encode(), digest_size=8)
+    digest.update(game.maze.pellet_map)
+    return digest.hexdigest()
+
+
+def encode_inputs(inputs):
+    """Pack (tick, command) pairs as varints of tick delta * 8 + command."""
+    data = bytearray()
+    last_tick = 0
+    for tick, cmd in inputs:
+        value = (tick - last_tick) << 3 | cmd
+        last_tick = tick
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def decode_inputs(data):
+    """Unpack the varint stream written by encode_inputs."""
+    inputs = []
+    tick = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            tick += value >> 3
+            inputs.append((tick, value & 7))
+            value = shift = 0
+    return inputs
+
+
+class Recording:
+    """A session's seed, maze options, input commands and state checkpoints."""
+
+    def __init__(self, seed, start_state=STATE_INTRO, fps=FPS,
+                 checkpoint_ticks=CHECKPOINT_TICKS, ghost_count=GHOST_COUNT,
+                 maze_size=(MAZE_WIDTH, MAZE_HEIGHT), maze_density=0.0):
+        self.seed = seed
+        self.start_state = start_state
+        self.fps = fps
+        self.ghost_count = ghost_count
+        self.maze_size = tuple(maze_size)
+        self.maze_density = maze_density
+        self.checkpoint_ticks = checkpoint_ticks
+        self.ticks = 0
+        self.inputs = []  # (tick, command) in the order they were applied
+        self.checkpoints = {}  # tick -> state hash
+
+    @classmethod
+    def start(cls, game, checkpoint_ticks=CHECKPOINT_TICKS):
+        """Attach a new recording to a game that has not started yet."""
+        if game.game_clock.tick_count != 0:
+            raise ValueError("recording must start before the first tick")
+        if game.maze_size is None:
+            raise ValueError("recording needs a game that built its own maze")
+        recording = cls(game.seed, game.state, game.game_clock.fps, checkpoint_ticks,
+                        game.ghost_count, game.maze_size, game.maze_density)
+        recording.checkpoints[0] = state_hash(game)
+        game.recording = recording
+        game.observers.append(recording.observe)
+        return recording
+
+    def add(self, tick, cmd):
+        """Record a command applied before the given tick's update."""
+        self.inputs.append((tick, cmd))
+
+    def observe(self, game):
+        """Game observer: note the tick count and hash at checkpoints."""
+        self.ticks = game.game_clock.tick_count
+        if self.ticks % self.checkpoint_ticks == 0:
+            self.checkpoints[self.ticks] = state_hash(game)
+
+    def finish(self, game):
+        """Hash the final state, including input after the last tick."""
+        self.ticks = game.game_clock.tick_count
+        self.checkpoints[self.ticks] = state_hash(game)
+
+    def save(self, path):
+        """Write the recording: magic, a JSON header line, then the inputs."""
+        header = {
+            "version": REPLAY_VERSION,
+            "seed": self.seed,
+            "start_state": self.start_state,
+            "fps": self.fps,
+            "ghost_count": self.ghost_count,
+            "maze_size": self.maze_size,
+            "maze_density": self.maze_density,
+            "ticks": self.ticks,
+            "commands": len(self.inputs),
+            "checkpoint_ticks": self.checkpoint_ticks,
+            "checkpoints": sorted(self.checkpoints.items()),
+        }
+        with open(path, "wb") as f:
+            f.write(REPLAY_MAGIC)
+            f.write(json.dumps(header).encode() + b"\n")
+            f.write(encode_inputs(self.inputs))
+
+    @classmethod
+    def load(cls, path):
+        """Read a recording written by save."""
+        with open(path, "rb") as f:
+            if f.read(len(REPLAY_MAGIC)) != REPLAY_MAGIC:
+                raise ValueError(f"{path} is not a replay file")
+            header = json.loads(f.readline())
+            data = f.read()
+        if header["version"] != REPLAY_VERSION:
+            raise ValueError(f"unsupported replay version {header['version']}")
+        recording = cls(header["seed"], header["start_state"], header["fps"],
+                        header["checkpoint_ticks"], header["ghost_count"],
+                        header["maze_size"], header["maze_density"])
+        recording.ticks = header["ticks"]
+        recording.inputs = decode_inputs(data)
+        recording.checkpoints = {tick: digest for tick, digest in header["checkpoints"]}
+        return recording
+
+
+def replay(recording, render=False, speed=None, verify=True):
+    """Play a recording back and return the finished game.
+
+    Headless replays run as fast as possible. Rendered ones open the game
+    window and play speed ticks per frame at 60 FPS (1 is real time, 0.5
+    slow motion); speed None renders every tick without waiting. Raises
+    ReplayMismatch at the first checkpoint whose state hash differs.
+    """
+    from main import Game
+    game = Game(seed=recording.seed, headless=not render, ghost_count=recording.ghost_count,
+                maze_size=recording.maze_size, maze_density=recording.maze_density)
+    game.wait_until_loaded()
+    game.state = recording.start_state
+    inputs = recording.inputs
+    next_input = 0
+    budget = 0.0
+
+    def apply_inputs(tick):
+        nonlocal next_input
+        while next_input < len(inputs) and inputs[next_input][0] == tick:
+            game.command(inputs[next_input][1])
+            next_input += 1
+
+    def check(tick):
+        expected = recording.checkpoints.get(tick)
+        if verify and expected is not None and state_hash(game) != expected:
+            raise ReplayMismatch(f"state differs from the recording at tick {tick}")
+
+    check(0)
+    for tick in range(recording.ticks):
+        apply_inputs(tick)
+        game.step()
+        check(tick + 1)
+        if render:
+            budget += 1
+            if speed is None or budget >= speed:
+                budget -= speed or 1
+                if not _present_frame(game, speed):
+                    return game
+    apply_inputs(recording.ticks)
+    check(recording.ticks)
+    return game
+
+
+def _present_frame(game, speed):
+    """Draw a replay frame; return False once the window is closed."""
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and
+                                         event.key == pygame.K_ESCAPE):
+            return False
+    game.draw()
+    if speed is not None:
+        game.clock.tick(FPS)
+    return True
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    render = "--render" in args
+    speed = float(args[args.index("--speed") + 1]) if "--speed" in args else None
+    if render and "--speed" not in args:
+        speed = 1
+    if not render:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    recording = Recording.load(args[0])
+    game = replay(recording, render, speed)
+    print(f"Replayed {recording.ticks} ticks, {len(recording.inputs)} commands: "
+          f"score {game.player.score}, lives {game.player.lives}, "
+          f"{len(recording.checkpoints)} checkpoints verified")
@@ -0,0 +1,109 @@
+"""
+Sprite atlas for the player and ghosts.
+Each frame is rendered once into a small Surface, so drawing an actor is a
+single blit instead of rebuilding it from primitives every frame.
+"""
+import math
+import pygame
+from utils import *
+
+# Rendered frames keyed by (direction, mouth angle, radius) and (color, scared)
+_player_frames = {}
+_ghost_frames = {}
+
+
+def _render_player(direction, mouth_angle, radius):
+    """Render Pac-Man facing one direction with the given mouth opening."""
+    surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+
+    # Calculate the angles for the Pac-Man arc
+    start_angle = 0
+    if direction == RIGHT:
+        start_angle = -mouth_angle
+    elif direction == LEFT:
+        start_angle = 180 - mouth_angle
+    elif direction == UP:
+        start_angle = 90 - mouth_angle
+    elif direction == DOWN:
+        start_angle = 270 - mouth_angle
+
+    # Draw Pac-Man body - use Amazon orange color
+    amazon_yellow = (255, 153, 0)  # Amazon orange/yellow
+    center = (TILE_SIZE//2, TILE_SIZE//2)
+    pygame.draw.circle(surface, amazon_yellow, center, radius)
+
+    # Draw mouth using a simple polygon
+    if not mouth_angle == 0:
+        angle1_rad = math.radians(start_angle - mouth_angle)
+        angle2_rad = math.radians(start_angle + mouth_angle)
+
+        # Calculate end points of mouth lines
+        x1 = center[0] + radius * math.cos(angle1_rad)
+        y1 = center[1] - radius * math.sin(angle1_rad)
+        x2 = center[0] + radius * math.cos(angle2_rad)
+        y2 = center[1] - radius * math.sin(angle2_rad)
+
+        # Draw mouth as triangle
+        pygame.draw.polygon(surface, BLACK, [center, (int(x1), int(y1)), (int(x2), int(y2))])
+    return surface
+
+
+def _render_ghost(color, scared):
+    """Render a ghost body in its normal colour or its frightened look."""
+    # One extra pixel each way for the wave line along the bottom edge
+    surface = pygame.Surface((TILE_SIZE + 1, TILE_SIZE + 1), pygame.SRCALPHA)
+    ghost_rect = pygame.Rect(0, 0, TILE_SIZE, TILE_SIZE)
+
+    # Draw body
+    color = (0, 0, 255) if scared else color
+    pygame.draw.ellipse(surface, color, ghost_rect)
+
+    # Draw base
+    base_rect = pygame.Rect(0, TILE_SIZE//2, TILE_SIZE, TILE_SIZE//2)
+    pygame.draw.rect(surface, color, base_rect)
+
+    # Draw waves at bottom
+    wave_points = []
+    for i in range(3):
+        x1 = i * TILE_SIZE//3
+        y1 = TILE_SIZE
+        y2 = TILE_SIZE - 4
+        wave_points.extend([(x1, y1), (x1 + TILE_SIZE//6, y2)])
+    wave_points.append((TILE_SIZE, TILE_SIZE))
+    pygame.draw.lines(surface, color, False, wave_points)
+
+    # Draw eyes
+    eye_color = WHITE if not scared else (255, 0, 0)
+    eye_radius = TILE_SIZE // 6
+    pygame.draw.circle(surface, eye_color, (TILE_SIZE//3, TILE_SIZE//3), eye_radius)
+    pygame.draw.circle(surface, eye_color, (2*TILE_SIZE//3, TILE_SIZE//3), eye_radius)
+    return surface
+
+
+def player_sprite(direction, mouth_angle, radius):
+    """Get the cached Pac-Man frame, rendering it on first use."""
+    key = (direction, mouth_angle, radius)
+    frame = _player_frames.get(key)
+    if frame is None:
+        frame = _player_frames[key] = _render_player(direction, mouth_angle, radius)
+    return frame
+
+
+def ghost_sprite(color, scared):
+    """Get the cached ghost frame, rendering it on first use."""
+    # Every frightened ghost looks the same whatever its colour
+    key = (None if scared else tuple(color), scared)
+    frame = _ghost_frames.get(key)
+    if frame is None:
+        frame = _ghost_frames[key] = _render_ghost(color, scared)
+    return frame
+
+
+def preload_sprites(ghost_colors, mouth_speed, radius):
+    """Render every player mouth frame and ghost variant up front."""
+    for direction in [UP, DOWN, LEFT, RIGHT]:
+        for mouth_angle in range(0, 45 + mouth_speed, mouth_speed):
+            player_sprite(direction, mouth_angle, radius)
+    for color in ghost_colors:
+        ghost_sprite(color, False)
+    ghost_sprite(BLUE, True)
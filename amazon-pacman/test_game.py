@@ -1,23 +1,645 @@
+import os
+import pickle
+import random
+import itertools
+import time
+
+# Run without a display; must be set before pygame is imported
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
 import pytest
+import batch
+import tournament
+import replay
+import mazegen
+from layout import MazeLayout, LAYOUT_HEADER
+from replay import state_hash
 from player import Player
 from ghost import Ghost
 from maze import Maze
-from utils import CELL_SIZE
+from main import Game
+from broadphase import ContactGrid
+from timing import TickClock, TickScheduler
+import utils
+from utils import *
+
+def _rect_scan_is_valid_position(maze, x, y):
+    # The original wall check: scan every wall Rect in the maze
+    player_rect = pygame.Rect(x, y, TILE_SIZE-4, TILE_SIZE-4)
+    if any(wall.colliderect(player_rect) for wall in maze.walls):
+        return False
+    tile_x, tile_y = maze.get_tile_position(x, y)
+    if 0 <= tile_y < maze.height and 0 <= tile_x < maze.width:
+        return maze.layout[tile_y][tile_x] != TILE_WALL
+    return False
 
 def test_player_initialization():
-    player = Player()
-    assert player is not None
-    assert hasattr(player, 'rect')
-    assert hasattr(player, 'direction')
+    player = Player(TILE_SIZE, TILE_SIZE)
+    assert (player.x, player.y) == (TILE_SIZE, TILE_SIZE)
+    assert player.direction == RIGHT
+    assert player.lives == 3
 
 def test_ghost_initialization():
-    ghost = Ghost('blinky', (0, 0))
-    assert ghost is not None
-    assert ghost.name == 'blinky'
-    assert hasattr(ghost, 'rect')
+    ghost = Ghost(5 * TILE_SIZE, 4 * TILE_SIZE, (255, 0, 0), "chase", rng=random.Random(1))
+    assert ghost.behavior == "chase"
+    assert ghost.home_position == (5 * TILE_SIZE, 4 * TILE_SIZE)
+    assert ghost.state == "scatter"
 
 def test_maze_initialization():
     maze = Maze()
-    assert maze is not None
-    assert hasattr(maze, 'layout')
-    assert CELL_SIZE > 0
\ No newline at end of file
+    assert (maze.width, maze.height) == (MAZE_WIDTH, MAZE_HEIGHT)
+    assert len(maze.layout) == MAZE_HEIGHT
+    assert TILE_SIZE > 0
+
+@pytest.mark.parametrize("width, height", [(45, 30), (90, 60)])
+def test_grid_collision_matches_rect_scan(width, height):
+    maze = Maze(width, height)
+    rng = random.Random(1)
+    for _ in range(2000):
+        x = rng.randrange(-TILE_SIZE, (width + 1) * TILE_SIZE)
+        y = rng.randrange(-TILE_SIZE, (height + 1) * TILE_SIZE)
+        assert maze.is_valid_position(x, y) == _rect_scan_is_valid_position(maze, x, y), (x, y)
+
+def test_grid_collision_at_wall_edges():
+    maze = Maze()
+    # Boxes just touching a wall from each side, and just clear of it
+    wall = next(rect for rect in maze.walls
+                if 0 < rect.x < (maze.width - 2) * TILE_SIZE
+                and 0 < rect.y < (maze.height - 2) * TILE_SIZE)
+    size = TILE_SIZE - 4
+    for x, y in [(wall.x - size, wall.y), (wall.x - size + 1, wall.y),
+                 (wall.right, wall.y), (wall.right - 1, wall.y),
+                 (wall.x, wall.y - size), (wall.x, wall.y - size + 1),
+                 (wall.x, wall.bottom), (wall.x, wall.bottom - 1)]:
+        assert maze.is_valid_position(x, y) == _rect_scan_is_valid_position(maze, x, y), (x, y)
+        assert maze.check_collision(pygame.Rect(x, y, size, size)) == \
+            any(rect.colliderect(pygame.Rect(x, y, size, size)) for rect in maze.walls)
+
+def test_eat_pellet_scores_and_counts():
+    maze = Maze()
+    pellets, power = maze.pellet_count, maze.power_pellet_count
+    assert pellets == sum(bytes(row).count(TILE_PELLET) for row in maze.layout)
+    assert power == sum(bytes(row).count(TILE_POWER_PELLET) for row in maze.layout)
+    assert maze.remaining_pellets() == pellets + power
+
+    pellet = next(maze.pellet_positions(TILE_PELLET))
+    assert maze.eat_pellet(pellet) == PELLET_POINTS
+    assert maze.eat_pellet(pellet) == 0  # Already eaten
+    assert maze.pellet_count == pellets - 1
+
+    power_pellet = next(maze.pellet_positions(TILE_POWER_PELLET))
+    assert maze.eat_pellet(power_pellet) == POWER_PELLET_POINTS
+    assert maze.power_pellet_count == power - 1
+    assert maze.remaining_pellets() == pellets + power - 2
+    assert pellet not in maze.pellet_positions(TILE_PELLET)
+    assert power_pellet not in maze.pellet_positions(TILE_POWER_PELLET)
+
+def test_eat_pellet_radius_and_priority():
+    maze = Maze()
+    x, y = next(maze.pellet_positions(TILE_PELLET))
+    assert maze.eat_pellet((x + 10, y)) == 0  # Just outside the radius
+    assert maze.eat_pellet((x + 9, y)) == PELLET_POINTS
+
+    # Halfway between a power pellet and a regular one, the regular one wins
+    maze = Maze()
+    width = maze.width
+    for index, kind in enumerate(maze.pellet_map):
+        if kind == TILE_POWER_PELLET and maze.pellet_map[index + 1] == TILE_PELLET:
+            break
+    else:
+        pytest.skip("no power pellet next to a pellet")
+    tile_y, tile_x = divmod(index, width)
+    centre = (tile_x * TILE_SIZE + TILE_SIZE//2 + 9.5, tile_y * TILE_SIZE + TILE_SIZE//2)
+    assert maze.eat_pellet(centre) == PELLET_POINTS
+    assert maze.pellet_map[index] == TILE_POWER_PELLET
+
+def test_pellets_reset_and_restore():
+    maze = Maze()
+    saved = maze.snapshot_pellets()
+    for pos in list(maze.pellet_positions(TILE_PELLET))[:5]:
+        maze.eat_pellet(pos)
+    assert maze.pellet_count == saved[1] - 5
+    maze.restore_pellets(saved)
+    assert maze.snapshot_pellets() == saved
+    copy = maze.copy()
+    copy.eat_pellet(next(copy.pellet_positions(TILE_PELLET)))
+    assert maze.snapshot_pellets() == saved
+    maze.eat_pellet(next(maze.pellet_positions(TILE_PELLET)))
+    maze.reset_pellets()
+    assert maze.snapshot_pellets() == saved
+
+def _sample_rows(width=7, height=5):
+    return [[(x * 3 + y) % 4 for x in range(width)] for y in range(height)]
+
+def test_layout_rows_with_padded_stride():
+    rows = _sample_rows()
+    stride = 10
+    cells = bytearray(b"".join(bytes(row) + b"\xff" * (stride - 7) for row in rows))
+    layout = MazeLayout(cells, 7, 5, stride=stride)
+    assert layout.to_rows() == rows
+    assert [layout[y][x] for y in range(5) for x in range(7)] == \
+        [layout.get(x, y) for y in range(5) for x in range(7)]
+    assert layout.index(2, 3) == 32
+    # Padding never shows up in rows, bytes or the array
+    assert layout.tobytes() == b"".join(bytes(row) for row in rows)
+    assert layout.as_array().tolist() == rows
+    assert len(layout) == 5 and layout.is_wall(-1, 0) and layout.is_wall(7, 4)
+    with pytest.raises(IndexError):
+        layout[5]
+    with pytest.raises(ValueError):
+        MazeLayout(cells[:-4], 7, 5, stride=stride)
+    with pytest.raises(ValueError):
+        MazeLayout(cells, 7, 5, stride=6)
+
+def test_layout_as_array_is_a_read_only_view():
+    layout = MazeLayout.from_rows(_sample_rows())
+    array = layout.as_array()
+    assert array.shape == (5, 7) and array.dtype == np.uint8
+    assert not array.flags.writeable
+    layout.cells[layout.index(3, 2)] = TILE_WALL
+    assert array[2, 3] == TILE_WALL
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_layout_save_load_round_trip(tmp_path, use_mmap):
+    layout = MazeLayout.from_rows(_sample_rows())
+    path = tmp_path / "sub" / "layout.bin"
+    layout.save(str(path))
+    assert os.path.getsize(path) == LAYOUT_HEADER.size + 7 * 5
+    assert not [name for name in os.listdir(path.parent) if name.endswith(".tmp")]
+    loaded = MazeLayout.load(str(path), use_mmap=use_mmap)
+    assert (loaded.width, loaded.height) == (7, 5)
+    assert loaded.to_rows() == layout.to_rows()
+    assert (loaded._source is not None) == use_mmap
+    if use_mmap:
+        # Mapped read-only
+        with pytest.raises(TypeError):
+            loaded.cells[0] = TILE_WALL
+    # Copies and pickles carry the tiles, not the map
+    assert pickle.loads(pickle.dumps(loaded)).to_rows() == layout.to_rows()
+
+def test_layout_load_rejects_bad_files(tmp_path):
+    path = str(tmp_path / "layout.bin")
+    MazeLayout.from_rows(_sample_rows()).save(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    for bad, message in [(data[:-1], "truncated"), (data + b"\0", "truncated"),
+                         (data[:LAYOUT_HEADER.size - 1], "not a maze layout"),
+                         (b"NOTAMAZE" + data[8:], "not a maze layout")]:
+        with open(path, "wb") as f:
+            f.write(bad)
+        for use_mmap in (True, False):
+            with pytest.raises(ValueError, match=message):
+                MazeLayout.load(path, use_mmap=use_mmap)
+
+def test_render_text_cache_keys_and_eviction(monkeypatch):
+    pygame.font.init()
+    monkeypatch.setattr(utils, "TEXT_CACHE_SIZE", 3)
+    monkeypatch.setattr(utils, "_text_surfaces", utils.OrderedDict())
+    score = render_text("SCORE", 24)
+    assert render_text("SCORE", 24) is score
+    # Colours given as lists or tuples share an entry
+    assert render_text("SCORE", 24, list(WHITE)) is score
+    # Text, size and colour each make a new entry
+    assert render_text("LIVES", 24) is not score
+    assert render_text("SCORE", 36) is not score
+    assert render_text("SCORE", 24, YELLOW) is not score
+    assert list(utils._text_surfaces) == [("LIVES", 24, WHITE), ("SCORE", 36, WHITE),
+                                          ("SCORE", 24, YELLOW)]
+    # A hit moves an entry to the back; the least recently used goes first
+    lives = render_text("LIVES", 24)
+    render_text("GAME OVER", 48)
+    assert len(utils._text_surfaces) == 3
+    assert ("SCORE", 36, WHITE) not in utils._text_surfaces
+    assert render_text("LIVES", 24) is lives
+
+def _reachable_tiles(layout):
+    # Flood fill from the player's start tile
+    width = layout.width
+    start = layout.index(1, 1)
+    reached = {start}
+    stack = [start]
+    while stack:
+        index = stack.pop()
+        for neighbour in (index - width, index + width, index - 1, index + 1):
+            if neighbour not in reached and layout.cells[neighbour] != TILE_WALL:
+                reached.add(neighbour)
+                stack.append(neighbour)
+    return reached
+
+@pytest.mark.parametrize("width, height, text, density, seed", [
+    (MAZE_WIDTH, MAZE_HEIGHT, mazegen.DEFAULT_TEXT, 0.0, 0),
+    (60, 40, mazegen.DEFAULT_TEXT, 0.5, 3),
+    (100, 70, ("HELLO", "WORLD", "42"), 0.7, 5),
+    (8, 8, (), 1.0, 1),
+])
+def test_generated_mazes_are_connected(width, height, text, density, seed):
+    layout = mazegen.generate_layout(width, height, text, density, seed)
+    paths = [index for index in range(width * height) if layout.cells[index] != TILE_WALL]
+    assert len(_reachable_tiles(layout)) == len(paths)
+    assert all(layout.is_wall(x, y) for x in range(width) for y in (0, height - 1))
+    assert all(layout.is_wall(x, y) for y in range(height) for x in (0, width - 1))
+
+def test_default_maze_keeps_original_text_positions():
+    grid = bytearray(MAZE_WIDTH * MAZE_HEIGHT)
+    boxes = mazegen._draw_text(grid, MAZE_WIDTH, MAZE_HEIGHT, mazegen.DEFAULT_TEXT, 1)
+    assert boxes == [(3, 5, 41, 11), (8, 20, 32, 26)]
+    # Other mazes centre the text
+    grid = bytearray(61 * MAZE_HEIGHT)
+    assert mazegen._draw_text(grid, 61, MAZE_HEIGHT, mazegen.DEFAULT_TEXT, 1)[1][0] == 18
+
+@pytest.mark.parametrize("width, height, text", [
+    (20, 30, ("AMAZON",)),
+    (45, 10, ("A", "B", "C")),
+    (7, 20, ()),
+])
+def test_text_that_does_not_fit_is_rejected(width, height, text):
+    with pytest.raises(ValueError):
+        mazegen.generate_layout(width, height, text)
+
+def test_layout_cache_keys_and_regeneration(tmp_path, monkeypatch):
+    params = (60, 40, ("HI",), 0.5, 3)
+    path = mazegen.layout_cache_path(*params, cache_dir=tmp_path)
+    assert len({path, mazegen.layout_cache_path(60, 40, ("HO",), 0.5, 3, tmp_path),
+                mazegen.layout_cache_path(60, 40, ("HI",), 0.4, 3, tmp_path),
+                mazegen.layout_cache_path(60, 40, ("HI",), 0.5, 4, tmp_path),
+                mazegen.layout_cache_path(61, 40, ("HI",), 0.5, 3, tmp_path)}) == 5
+    generated = mazegen.load_layout(*params, cache_dir=tmp_path)
+    assert os.path.exists(path)
+    cached = mazegen.load_layout(*params, cache_dir=tmp_path)
+    assert cached._source is not None  # Memory-mapped from the file
+    assert cached.tobytes() == generated.tobytes()
+
+    # A corrupt file is replaced by a fresh layout
+    with open(path, "wb") as f:
+        f.write(b"garbage")
+    assert mazegen.load_layout(*params, cache_dir=tmp_path).tobytes() == generated.tobytes()
+    assert mazegen.load_layout(*params, cache_dir=tmp_path)._source is not None
+
+    # A new generator version does not read the old files
+    monkeypatch.setattr(mazegen, "GENERATOR_VERSION", mazegen.GENERATOR_VERSION + 1)
+    assert mazegen.layout_cache_path(*params, cache_dir=tmp_path) != path
+
+def test_seeded_games_spawn_and_teleport_alike():
+    games = [Game(seed=11, headless=True) for _ in range(2)]
+    positions = lambda game: [(ghost.x, ghost.y) for ghost in game.ghosts]
+    assert positions(games[0]) == positions(games[1])
+    assert positions(Game(seed=12, headless=True)) != positions(games[0])
+    for game in games:
+        for ghost in game.ghosts:
+            ghost.teleport_to_safe_location(game.maze)
+    assert [(ghost.x, ghost.y, ghost.direction) for ghost in games[0].ghosts] == \
+        [(ghost.x, ghost.y, ghost.direction) for ghost in games[1].ghosts]
+    # The ghost draws from its own generator, not the maze's
+    maze = games[0].maze
+    ghost = Ghost(TILE_SIZE, TILE_SIZE, (255, 0, 0), "chase", rng=random.Random(3))
+    maze_state = maze.rng.getstate()
+    ghost.teleport_to_safe_location(maze)
+    assert maze.rng.getstate() == maze_state
+    expected = random.Random(3)
+    expected_tile = maze.spawn_tiles[expected.randrange(len(maze.spawn_tiles))]
+    assert (ghost.x, ghost.y) == (expected_tile % maze.width * TILE_SIZE,
+                                  expected_tile // maze.width * TILE_SIZE)
+    assert ghost.direction == expected.choice([UP, DOWN, LEFT, RIGHT])
+
+def test_next_move_follows_shortest_path():
+    maze = Maze()
+    nav = maze.nav
+    rng = random.Random(2)
+    tiles = [index for index in range(maze.width * maze.height) if nav.is_reachable(index)]
+    for _ in range(200):
+        start, target = rng.choice(tiles), rng.choice(tiles)
+        field = nav.distance_field(target)
+        move = nav.next_move(start, target)
+        if start == target:
+            continue
+        step = start + move[0] + move[1] * maze.width
+        assert field[step] == field[start] - 1
+
+def test_nav_cache_info():
+    nav = Maze().nav
+    nav.clear_cache()
+    assert nav.cache_info() == (0, nav.cache_size, 0)
+    tile = next(index for index in range(len(nav.walkable)) if nav.is_reachable(index))
+    nav.distance_field(tile)
+    nav.distance_field(tile)
+    assert nav.cache_info().fields == 1 and nav.cache_info().built == 1
+
+@pytest.mark.parametrize("table", [True, False])
+@pytest.mark.parametrize("seed", range(4))
+def test_batch_matches_game(monkeypatch, seed, table):
+    if not table:
+        monkeypatch.setattr(batch, "ALL_PAIRS_MAX_BYTES", 0)
+    game = Game(seed=seed, headless=True, ghost_count=2)
+    boards = batch.BatchGame(1, maze=game.maze,
+                             ghost_behaviors=[ghost.behavior for ghost in game.ghosts])
+    assert (boards.distances is not None) == table
+    boards.load_game(0, game)
+    moves = [LEFT, RIGHT, UP, DOWN]
+    for tick in range(1500):
+        move = moves[(tick // 37 + seed) % 4]
+        game.step(move)
+        boards.step([batch.direction_code(move)])
+        # The batch engine has no power-ups; compare up to the first one
+        if game.player.powered_up:
+            break
+        player = game.player
+        assert (player.x, player.y) == (boards.player_x[0], boards.player_y[0]), tick
+        assert (player.score, player.lives) == (boards.score[0], boards.lives[0]), tick
+        assert [(ghost.x, ghost.y) for ghost in game.ghosts] == \
+            list(zip(boards.ghost_x[0].tolist(), boards.ghost_y[0].tolist())), tick
+    assert np.array_equal(boards.pellets[0], np.frombuffer(game.maze.pellet_map, dtype=np.uint8))
+
+def test_all_pairs_distances_size_guard(monkeypatch):
+    maze = Maze()
+    monkeypatch.setattr(batch, "ALL_PAIRS_MAX_BYTES", 1024)
+    with pytest.raises(ValueError):
+        batch.all_pairs_distances(maze.nav)
+
+def test_play_game_matches_standalone_game():
+    template = Maze(rng=random.Random(0))
+    for seed in range(3):
+        result = tournament.play_game(seed, template, max_ticks=500)
+        game = Game(seed=seed, headless=True)
+        ticks = game.simulate(500, tournament.RandomPolicy(seed))
+        assert (result["score"], result["ticks"], result["pellets_remaining"]) == \
+            (game.player.score, ticks, game.maze.remaining_pellets())
+
+def test_worker_rebuilds_custom_maze(monkeypatch):
+    maze = Maze(60, 40, density=0.3)
+    monkeypatch.setattr(tournament, "_template_maze", None)
+    layout = maze.layout
+    tournament._init_worker(layout.width, layout.height, layout.tobytes())
+    rebuilt = tournament._template_maze
+    assert (rebuilt.width, rebuilt.height) == (60, 40)
+    assert rebuilt.layout.tobytes() == layout.tobytes()
+    assert tournament.play_game(5, rebuilt, max_ticks=300) == \
+        tournament.play_game(5, maze, max_ticks=300)
+
+def test_profiler_only_wraps_the_profiled_game():
+    game, other = Game(seed=1, headless=True), Game(seed=1, headless=True)
+    game.profiler.enable(game)
+    for _ in range(30):
+        game.profiler.begin_frame()
+        game.step(LEFT)
+        other.step(LEFT)
+        game.profiler.end_frame()
+    assert "eat_pellet" in vars(game.maze) and "eat_pellet" not in vars(other.maze)
+    assert game.profiler.summary()["Ghost.update_calls"]["max"] == len(game.ghosts)
+    assert state_hash(game) == state_hash(other)
+    game.profiler.disable()
+    assert "eat_pellet" not in vars(game.maze) and "present" not in vars(game)
+
+def _rect_contacts(players, ghosts):
+    # The original check: colliderect on a Rect per actor
+    return sorted((id(player), id(ghost)) for player in players for ghost in ghosts
+                  if pygame.Rect(player.x, player.y, TILE_SIZE, TILE_SIZE).colliderect(
+                      pygame.Rect(ghost.x, ghost.y, TILE_SIZE, TILE_SIZE)))
+
+def _grid_contacts(grid, players, ghosts):
+    return sorted((id(player), id(ghost)) for player, ghost in grid.contacts(players, ghosts))
+
+def _ghost_at(x, y):
+    return Ghost(x, y, (255, 0, 0), "chase", rng=random.Random(1))
+
+@pytest.mark.parametrize("player_count", [1, 3, 8])
+def test_contacts_match_rect_scan(player_count):
+    width, height = 20, 15
+    grid = ContactGrid(width)
+    rng = random.Random(player_count)
+    for _ in range(200):
+        players = [Player(rng.randrange(width * TILE_SIZE), rng.randrange(height * TILE_SIZE))
+                   for _ in range(player_count)]
+        # Half of the ghosts close to a player, the rest anywhere
+        ghosts = []
+        for index in range(30):
+            if index % 2:
+                player = rng.choice(players)
+                x = player.x + rng.randrange(-2 * TILE_SIZE, 2 * TILE_SIZE + 1)
+                y = player.y + rng.randrange(-2 * TILE_SIZE, 2 * TILE_SIZE + 1)
+            else:
+                x, y = rng.randrange(width * TILE_SIZE), rng.randrange(height * TILE_SIZE)
+            ghosts.append(_ghost_at(min(max(x, 0), (width - 1) * TILE_SIZE),
+                                    min(max(y, 0), (height - 1) * TILE_SIZE)))
+        assert _grid_contacts(grid, players, ghosts) == _rect_contacts(players, ghosts)
+
+def test_contacts_at_tile_and_block_boundaries():
+    width = 10
+    grid = ContactGrid(width)
+    player = Player(4 * TILE_SIZE + 5, 4 * TILE_SIZE + 7)
+    ghosts = []
+    for dx in (-TILE_SIZE - 1, -TILE_SIZE, -TILE_SIZE + 1, 0, TILE_SIZE - 1, TILE_SIZE,
+               2 * TILE_SIZE - 5):
+        for dy in (-TILE_SIZE, -TILE_SIZE + 1, 0, TILE_SIZE - 1, TILE_SIZE, 2 * TILE_SIZE):
+            ghosts.append(_ghost_at(player.x + dx, player.y + dy))
+    found = _grid_contacts(grid, [player], ghosts)
+    assert found == _rect_contacts([player], ghosts)
+    # Exactly one tile apart is touching edges, not a contact
+    assert all(abs(ghost.x - player.x) < TILE_SIZE and abs(ghost.y - player.y) < TILE_SIZE
+               for ghost in ghosts if (id(player), id(ghost)) in found)
+    assert len(found) == 3 * 3
+
+def test_contacts_at_maze_edges():
+    width, height = 10, 8
+    grid = ContactGrid(width)
+    right, bottom = (width - 1) * TILE_SIZE, (height - 1) * TILE_SIZE
+    players = [Player(0, 0), Player(right, 3 * TILE_SIZE), Player(right, bottom)]
+    ghosts = [_ghost_at(0, 0), _ghost_at(TILE_SIZE - 1, TILE_SIZE - 1),
+              # Next to the right-edge player in tile index, but on the far side of the maze
+              _ghost_at(0, 4 * TILE_SIZE), _ghost_at(0, 2 * TILE_SIZE),
+              _ghost_at(right - TILE_SIZE + 1, bottom), _ghost_at(right, bottom - TILE_SIZE)]
+    found = _grid_contacts(grid, players, ghosts)
+    assert found == _rect_contacts(players, ghosts)
+    assert found == sorted([(id(players[0]), id(ghosts[0])), (id(players[0]), id(ghosts[1])),
+                            (id(players[2]), id(ghosts[4]))])
+
+def _headless_run(seed, ticks, observer=None):
+    game = Game(seed=seed, headless=True)
+    if observer is not None:
+        game.observers.append(observer)
+    played = game.simulate(ticks, tournament.RandomPolicy(seed))
+    return (played, state_hash(game), game.player.score, game.player.lives,
+            game.maze.remaining_pellets())
+
+def test_headless_simulation_is_deterministic(monkeypatch):
+    # 100 seconds of game time each; the bound (10x real time) is loose
+    # for slow machines
+    start = time.perf_counter()
+    runs = [_headless_run(seed, 100 * FPS) for seed in range(3)]
+    assert time.perf_counter() - start < 3 * 100 / 10
+    assert len({run[1] for run in runs}) == 3
+
+    # Wall clocks racing ahead, as on a slow machine, change nothing
+    fake_ms = itertools.count(0, 997)
+    fake_seconds = itertools.count(0, 3.7)
+    monkeypatch.setattr(pygame.time, "get_ticks", lambda: next(fake_ms))
+    monkeypatch.setattr(time, "perf_counter", lambda: next(fake_seconds))
+    monkeypatch.setattr(time, "monotonic", lambda: next(fake_seconds))
+    assert [_headless_run(seed, 100 * FPS) for seed in range(3)] == runs
+
+def test_headless_result_does_not_depend_on_step_pace():
+    # Real time passing between ticks is never read
+    slow = _headless_run(7, 300, observer=lambda game: time.sleep(0.001))
+    assert slow == _headless_run(7, 300)
+
+def _record_session(path, seed=4, ticks=2000, **options):
+    game = Game(seed=seed, headless=True, **options)
+    recording = replay.Recording.start(game, checkpoint_ticks=100)
+    policy = tournament.RandomPolicy(seed)
+    for tick in range(ticks):
+        if tick in (500, 530):
+            game.command(CMD_PAUSE)
+        if game.state == STATE_GAME_OVER:
+            break
+        game.step(policy(game))
+    recording.finish(game)
+    recording.save(path)
+    return game
+
+def test_encode_inputs_round_trip():
+    inputs = [(0, CMD_LEFT), (0, CMD_PAUSE), (3, CMD_STOP), (200, CMD_UP),
+              (100000, CMD_CONTINUE)]
+    assert replay.decode_inputs(replay.encode_inputs(inputs)) == inputs
+
+def test_replay_round_trip(tmp_path):
+    path = tmp_path / "session.pmr"
+    game = _record_session(path)
+    recording = replay.Recording.load(path)
+    assert len(recording.checkpoints) > 10
+    replayed = replay.replay(recording)
+    assert state_hash(replayed) == state_hash(game)
+    assert replayed.player.score == game.player.score
+
+def test_replay_crowd_game(tmp_path):
+    path = tmp_path / "crowd.pmr"
+    game = _record_session(path, ghost_count=30, maze_size=(60, 40), maze_density=0.5)
+    recording = replay.Recording.load(path)
+    assert (recording.ghost_count, recording.maze_size, recording.maze_density) == \
+        (30, (60, 40), 0.5)
+    replayed = replay.replay(recording)
+    assert len(replayed.ghosts) == 30
+    assert (replayed.maze.width, replayed.maze.height) == (60, 40)
+    assert state_hash(replayed) == state_hash(game)
+
+def test_recording_needs_a_generated_maze():
+    game = Game(seed=1, headless=True)
+    copy = Game(seed=1, headless=True, maze=game.maze.copy())
+    with pytest.raises(ValueError):
+        replay.Recording.start(copy)
+
+def test_replay_detects_mismatch(tmp_path):
+    path = tmp_path / "session.pmr"
+    _record_session(path)
+    recording = replay.Recording.load(path)
+    tick = sorted(recording.checkpoints)[5]
+    recording.checkpoints[tick] = "0" * 16
+    with pytest.raises(replay.ReplayMismatch, match=f"tick {tick}"):
+        replay.replay(recording)
+    replay.replay(recording, verify=False)
+
+    # A different input stream diverges at a checkpoint too
+    recording = replay.Recording.load(path)
+    recording.inputs = [(tick, CMD_UP if cmd != CMD_UP else CMD_DOWN)
+                        if cmd <= CMD_RIGHT else (tick, cmd)
+                        for tick, cmd in recording.inputs]
+    with pytest.raises(replay.ReplayMismatch):
+        replay.replay(recording)
+
+def _play(game, ticks, seed=9):
+    policy = tournament.RandomPolicy(seed)
+    hashes = []
+    for _ in range(ticks):
+        if game.state == STATE_GAME_OVER:
+            break
+        game.step(policy(game))
+        hashes.append(state_hash(game))
+    return hashes
+
+def test_snapshot_restore_identical_state():
+    game = Game(seed=6, headless=True)
+    _play(game, 300)
+    for ghost in game.ghosts[::2]:
+        ghost.make_scared()
+    snapshot = game.snapshot()
+    before = state_hash(game)
+    first = _play(game, 1500)
+    game.restore(snapshot)
+    assert state_hash(game) == before
+    assert _play(game, 1500) == first
+
+def test_restore_after_reset_rebinds_timers():
+    game = Game(seed=6, headless=True)
+    _play(game, 300)
+    game.player.powered_up = True
+    game.player.power_time = game.game_clock.get_ticks()
+    game.scheduler.call_after(game.player.power_time + game.player.power_duration,
+                              game.player._end_power, game.player.power_time)
+    snapshot = game.snapshot()
+    first = _play(game, 1500)
+
+    game.reset_game()
+    game.restore(snapshot)
+    actors = [game, game.player] + game.ghosts
+    assert all(any(callback.__self__ is actor for actor in actors)
+               for _, _, callback, _ in game.scheduler._events)
+    assert _play(game, 1500) == first
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def note(self, *args):
+        self.calls.append(args)
+
+def test_scheduler_fires_in_tick_then_schedule_order():
+    clock = TickClock()
+    scheduler = TickScheduler(clock)
+    recorder = _Recorder()
+    for tick, label in [(5, "a"), (2, "b"), (5, "c"), (0, "d"), (2, "e"), (9, "f")]:
+        scheduler.call_at(tick, recorder.note, tick, label)
+    assert scheduler.next_tick() == 0
+    fired = []
+    for tick in range(8):
+        scheduler.run_due()
+        fired.append([label for _, label in recorder.calls])
+        recorder.calls.clear()
+        clock.advance()
+    assert fired == [["d"], [], ["b", "e"], [], [], ["a", "c"], [], []]
+    assert len(scheduler) == 1 and scheduler.next_tick() == 9
+
+def test_scheduler_runs_overdue_events_and_call_after():
+    clock = TickClock()
+    scheduler = TickScheduler(clock)
+    recorder = _Recorder()
+    # 1000 ms at 60 FPS: get_ticks() > 1000 first holds on tick 61
+    scheduler.call_after(1000, recorder.note, "late")
+    scheduler.call_at(3, recorder.note, "early")
+    assert scheduler.next_tick() == 3
+    assert next(tick for tick in range(100)
+                if tick * 1000 // FPS > 1000) == clock.first_tick_after(1000) == 61
+    clock.advance(100)
+    scheduler.run_due()
+    assert recorder.calls == [("early",), ("late",)]
+    assert scheduler.next_tick() is None
+
+def test_scheduler_snapshot_keeps_order_and_rebinds():
+    clock = TickClock()
+    scheduler = TickScheduler(clock)
+    first, second = _Recorder(), _Recorder()
+    scheduler.call_at(4, first.note, 1)
+    scheduler.call_at(2, second.note, 2)
+    scheduler.call_at(4, second.note, 3)
+    state = scheduler.snapshot([first, second])
+    scheduler.clear()
+    scheduler.call_at(1, first.note, "dropped")
+
+    # Restore onto new objects in the same positions
+    new_first, new_second = _Recorder(), _Recorder()
+    scheduler.restore(state, [new_first, new_second])
+    clock.advance(4)
+    scheduler.run_due()
+    scheduler.call_at(4, new_first.note, 4)  # Scheduled later, fires later
+    scheduler.run_due()
+    assert first.calls == second.calls == []
+    assert new_first.calls == [(1,), (4,)] and new_second.calls == [(2,), (3,)]
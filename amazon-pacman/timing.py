@@ -0,0 +1,106 @@
+"""
+Clocks for the Amazon Pac-Man game logic.
+Game objects read time from an injected clock instead of the wall clock, so
+the simulation can advance in fixed ticks, headless and faster than real time.
+Timed events (mode switches, power-ups running out) go on a tick scheduler
+instead of being polled by every actor on every frame.
+"""
+import heapq
+import pygame
+from utils import *
+
+
+class WallClock:
+    """Real time in milliseconds since pygame was initialised."""
+
+    def get_ticks(self):
+        return pygame.time.get_ticks()
+
+
+class TickClock:
+    """Simulated time that advances by one fixed step per game tick."""
+
+    def __init__(self, fps=FPS):
+        self.fps = fps
+        self.tick_count = 0
+
+    def advance(self, ticks=1):
+        """Move simulated time forward by a number of ticks."""
+        self.tick_count += ticks
+
+    def get_ticks(self):
+        """Get the simulated time in milliseconds."""
+        return self.tick_count * 1000 // self.fps
+
+    def first_tick_after(self, ms):
+        """Get the first tick whose time is later than ms milliseconds."""
+        return -(-(ms + 1) * self.fps // 1000)
+
+
+class TickScheduler:
+    """Callbacks due at game ticks, kept in a heap ordered by tick.
+
+    Events cannot be cancelled. A callback gets the arguments it was
+    scheduled with and ignores the call if they show it has been
+    superseded, e.g. a timer that was restarted since.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._events = []  # Heap of (tick, sequence, callback, args)
+        self._sequence = 0  # Breaks ties so same-tick events fire in order
+
+    def __len__(self):
+        return len(self._events)
+
+    def call_at(self, tick, callback, *args):
+        """Call callback(*args) when the given tick is run."""
+        heapq.heappush(self._events, (tick, self._sequence, callback, args))
+        self._sequence += 1
+
+    def call_after(self, ms, callback, *args):
+        """Call callback(*args) on the first tick later than ms of game time.
+
+        This is the tick on which polling clock.get_ticks() > ms every tick
+        would first come out true.
+        """
+        self.call_at(self.clock.first_tick_after(ms), callback, *args)
+
+    def next_tick(self):
+        """Get the tick of the earliest pending event, or None."""
+        return self._events[0][0] if self._events else None
+
+    def run_due(self):
+        """Fire every event due by the current tick, earliest first."""
+        events = self._events
+        now = self.clock.tick_count
+        while events and events[0][0] <= now:
+            _, _, callback, args = heapq.heappop(events)
+            callback(*args)
+
+    def clear(self):
+        """Drop every pending event."""
+        self._events = []
+
+    def snapshot(self, actors):
+        """Get the pending events for restore(), naming their callbacks.
+
+        Every callback must be a method of one of actors. It is stored as
+        (position in actors, method name), so a snapshot keeps no game
+        objects alive and can be restored onto ones created since.
+        """
+        position = {id(actor): i for i, actor in enumerate(actors)}
+        events = tuple([(tick, sequence, position[id(callback.__self__)],
+                         callback.__name__, args)
+                        for tick, sequence, callback, args in self._events])
+        return events, self._sequence
+
+    def restore(self, state, actors):
+        """Put back pending events returned by snapshot(), bound to actors."""
+        events, self._sequence = state
+        # Same (tick, sequence) keys in the same order, so still a heap
+        self._events = [(tick, sequence, getattr(actors[actor], name), args)
+                        for tick, sequence, actor, name, args in events]
+
+
+WALL_CLOCK = WallClock()  # Default for objects created without a clock
@@ -0,0 +1,207 @@
+"""
+Multi-process tournament runner for headless Amazon Pac-Man games.
+Seeded games are sharded across a process pool and the per-game results are
+aggregated as they stream back. The maze and its navigation data are built
+once in the parent and inherited by forked workers (others rebuild them from
+the layout bytes once each), so tasks only carry seeds.
+
+Usage: python tournament.py [games] [workers]
+"""
+import os
+import sys
+import math
+import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from utils import *
+from maze import Maze
+from layout import MazeLayout
+from main import Game
+
+MAX_TICKS = 20000  # Longest a single game may run (about 5.5 minutes at 60 FPS)
+
+# Maze every game is copied from. Set in the parent before the pool starts;
+# forked workers inherit it, others build it from the layout in _init_worker.
+_template_maze = None
+
+
+class RandomPolicy:
+    """Steer the player in a random direction every few ticks."""
+
+    def __init__(self, seed, turn_every=20):
+        self.rng = random.Random(seed)
+        self.turn_every = turn_every
+
+    def __call__(self, game):
+        if game.game_clock.tick_count % self.turn_every == 0:
+            return self.rng.choice([UP, DOWN, LEFT, RIGHT])
+        return False
+
+
+class MCTSPolicy:
+    """Pick moves by Monte Carlo search over rollouts from game snapshots.
+    
+    Every few ticks each direction is tried with short random rollouts,
+    chosen by UCB1, and the one with the best average reward is taken.
+    """
+
+    def __init__(self, seed, decide_every=10, rollouts=16, depth=60,
+                 death_penalty=1000):
+        self.rng = random.Random(seed)
+        self.decide_every = decide_every
+        self.rollouts = rollouts
+        self.depth = depth
+        self.death_penalty = death_penalty
+        self.rollout_ticks = 0
+
+    def __call__(self, game):
+        if (game.state != STATE_PLAYING or
+                game.game_clock.tick_count % self.decide_every):
+            return False
+        root = game.snapshot()
+        moves = [UP, DOWN, LEFT, RIGHT]
+        visits = [0] * len(moves)
+        totals = [0.0] * len(moves)
+        for rollout in range(self.rollouts):
+            if rollout < len(moves):
+                choice = rollout
+            else:
+                # UCB1, with rewards scaled to roughly one pellet
+                log_n = math.log(rollout)
+                choice = max(range(len(moves)), key=lambda i:
+                             totals[i] / visits[i] / PELLET_POINTS +
+                             math.sqrt(2 * log_n / visits[i]))
+            totals[choice] += self._rollout(game, moves[choice])
+            visits[choice] += 1
+            game.restore(root)
+        best = max(range(len(moves)), key=lambda i: totals[i] / visits[i])
+        return moves[best]
+
+    def _rollout(self, game, move):
+        """Play move, then random moves; return score gained less deaths."""
+        score, lives = game.player.score, game.player.lives
+        game.step(move)
+        ticks = 1
+        while ticks < self.depth and game.state == STATE_PLAYING:
+            if ticks % self.decide_every == 0:
+                game.step(self.rng.choice([UP, DOWN, LEFT, RIGHT]))
+            else:
+                game.step()
+            ticks += 1
+        self.rollout_ticks += ticks
+        return (game.player.score - score -
+                self.death_penalty * (lives - game.player.lives))
+
+
+def play_game(seed, maze, max_ticks=MAX_TICKS, policy=RandomPolicy):
+    """Play one headless game and return its result.
+    
+    The game runs on a copy of maze, reseeded from the game's generator,
+    so on the default maze it plays out exactly like Game(seed).
+    """
+    game = Game(seed=seed, headless=True, maze=maze.copy())
+    ticks = game.simulate(max_ticks, policy(seed))
+    return {
+        "seed": seed,
+        "score": game.player.score,
+        "lives_lost": 3 - game.player.lives,
+        "ticks": ticks,
+        "pellets_remaining": game.maze.remaining_pellets(),
+    }
+
+
+def _init_worker(width, height, cells):
+    """Build the template maze in a worker that did not inherit it by fork."""
+    global _template_maze
+    if _template_maze is None:
+        _template_maze = Maze(layout=MazeLayout(bytearray(cells), width, height))
+
+
+def _play_chunk(seeds, max_ticks, policy):
+    """Worker task: play a chunk of seeded games against the shared maze."""
+    return [play_game(seed, _template_maze, max_ticks, policy) for seed in seeds]
+
+
+class TournamentStats:
+    """Running aggregate of game results."""
+
+    def __init__(self):
+        self.games = 0
+        self.total_score = 0
+        self.best_score = None
+        self.total_lives_lost = 0
+        self.total_ticks = 0
+        self.total_pellets_remaining = 0
+
+    def add(self, result):
+        self.games += 1
+        self.total_score += result["score"]
+        if self.best_score is None or result["score"] > self.best_score:
+            self.best_score = result["score"]
+        self.total_lives_lost += result["lives_lost"]
+        self.total_ticks += result["ticks"]
+        self.total_pellets_remaining += result["pellets_remaining"]
+
+    def summary(self):
+        """Get the averages over all games seen so far."""
+        games = max(self.games, 1)
+        return {
+            "games": self.games,
+            "mean_score": self.total_score / games,
+            "best_score": self.best_score,
+            "mean_lives_lost": self.total_lives_lost / games,
+            "mean_ticks": self.total_ticks / games,
+            "mean_pellets_remaining": self.total_pellets_remaining / games,
+            "total_ticks": self.total_ticks,
+        }
+
+
+def run_tournament(games, workers=None, first_seed=0, max_ticks=MAX_TICKS,
+                   policy=RandomPolicy, chunk_size=None, maze=None, on_result=None):
+    """Play seeded games across worker processes and aggregate the results.
+
+    on_result, if given, is called with each game's result as it arrives.
+    A custom maze is played in every worker, however they are started.
+    Returns a TournamentStats.
+    """
+    global _template_maze
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(1, games // (workers * 4))
+
+    # Build the maze and fill the navigation cache once, before forking
+    _template_maze = maze if maze is not None else Maze(rng=random.Random(first_seed))
+    nav = _template_maze.nav
+    for index in _template_maze.spawn_tiles:
+        nav.distance_field(index)
+
+    seeds = list(range(first_seed, first_seed + games))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, games, chunk_size)]
+    stats = TournamentStats()
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    layout = _template_maze.layout
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                             initargs=(layout.width, layout.height,
+                                       layout.tobytes())) as pool:
+        futures = [pool.submit(_play_chunk, chunk, max_ticks, policy)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            for result in future.result():
+                stats.add(result)
+                if on_result:
+                    on_result(result)
+    return stats
+
+
+if __name__ == "__main__":
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    stats = run_tournament(games, workers)
+    for key, value in stats.summary().items():
+        print(f"{key}: {value}")
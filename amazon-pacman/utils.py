@@ -3,6 +3,7 @@ Utility functions and constants for the Amazon Pac-Man game.
 """
 import pygame
 import os
+from collections import OrderedDict
 
 # Colors
 BLACK = (0, 0, 0)
@@ -19,12 +20,22 @@ GHOST_SPEED = 2
 SCREEN_WIDTH = 1080  # Width for extended maze
 SCREEN_HEIGHT = 700  # Height for maze
 FPS = 60
+MAZE_WIDTH = 45  # Default maze size in tiles; the screen size above fits it
+MAZE_HEIGHT = 30
+GHOST_COUNT = 4  # Ghosts in a normal game; more than this is crowd mode
+CROWD_WAYPOINTS = 32  # Shared targets random ghosts wander between in crowd mode
 
 # Scoring
 PELLET_POINTS = 10
 POWER_PELLET_POINTS = 50
 GHOST_POINTS = 200
 
+# Maze tiles (values stored in Maze.layout)
+TILE_EMPTY = 0
+TILE_WALL = 1
+TILE_PELLET = 2
+TILE_POWER_PELLET = 3
+
 # Game states
 STATE_INTRO = 0
 STATE_PLAYING = 1
@@ -38,34 +49,91 @@ DOWN = (0, 1)
 LEFT = (-1, 0)
 RIGHT = (1, 0)
 
+# Player input commands, as applied by Game.command and stored in replays
+CMD_UP = 0
+CMD_DOWN = 1
+CMD_LEFT = 2
+CMD_RIGHT = 3
+CMD_STOP = 4
+CMD_PAUSE = 5
+CMD_RESET = 6
+CMD_CONTINUE = 7
+COMMAND_DIRECTIONS = [UP, DOWN, LEFT, RIGHT]  # Indexed by the steering commands
+ARROW_KEYS = {
+    pygame.K_UP: CMD_UP,
+    pygame.K_DOWN: CMD_DOWN,
+    pygame.K_LEFT: CMD_LEFT,
+    pygame.K_RIGHT: CMD_RIGHT,
+}
+
+# Text rendering cache
+TEXT_CACHE_SIZE = 128  # Rendered text surfaces kept before the oldest is dropped
+
 # Asset paths
 ASSET_DIR = os.path.join(os.path.dirname(__file__), "assets")
 
+# Loaded assets by file name, shared by every caller (do not modify them)
+_images = {}
+_sounds = {}
+
 def load_image(name):
-    """Load an image from the assets directory."""
+    """Load an image from the assets directory, reading each file once."""
+    if name in _images:
+        return _images[name]
     try:
-        return pygame.image.load(os.path.join(ASSET_DIR, name))
-    except pygame.error:
+        image = pygame.image.load(os.path.join(ASSET_DIR, name))
+    except (pygame.error, OSError):
         print(f"Couldn't load image: {name}")
-        return pygame.Surface((TILE_SIZE, TILE_SIZE))
+        image = pygame.Surface((TILE_SIZE, TILE_SIZE))
+    _images[name] = image
+    return image
 
 def load_sound(name):
-    """Load a sound from the assets directory."""
+    """Load a sound from the assets directory, reading each file once."""
+    if name in _sounds:
+        return _sounds[name]
     try:
-        return pygame.mixer.Sound(os.path.join(ASSET_DIR, name))
-    except pygame.error:
+        # The mixer is only started once a game actually needs sound
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        sound = pygame.mixer.Sound(os.path.join(ASSET_DIR, name))
+    except (pygame.error, OSError):
         print(f"Couldn't load sound: {name}")
-        return None
+        sound = None
+    _sounds[name] = sound
+    return sound
 
-def draw_text(surface, text, size, x, y, color=WHITE):
-    """Draw text on the given surface."""
-    # Use the default pygame font
-    font = pygame.font.Font(None, size)
+_fonts = {}
+_text_surfaces = OrderedDict()
+
+def get_font(size):
+    """Get the default pygame font at the given size, loading it once."""
+    font = _fonts.get(size)
+    if font is None:
+        # Use the default pygame font
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+def render_text(text, size, color=WHITE):
+    """Render text to a surface, reusing recently rendered ones (LRU)."""
+    key = (text, size, tuple(color))
+    text_surface = _text_surfaces.get(key)
+    if text_surface is not None:
+        _text_surfaces.move_to_end(key)
+        return text_surface
     
-    text_surface = font.render(text, True, color)
+    text_surface = _text_surfaces[key] = get_font(size).render(text, True, color)
+    if len(_text_surfaces) > TEXT_CACHE_SIZE:
+        _text_surfaces.popitem(last=False)
+    return text_surface
+
+def draw_text(surface, text, size, x, y, color=WHITE):
+    """Draw text on the given surface and return the rect it covers."""
+    text_surface = render_text(text, size, color)
     text_rect = text_surface.get_rect()
     text_rect.midtop = (x, y)
     surface.blit(text_surface, text_rect)
+    return text_rect
 
 def create_neon_surface(width, height, color, intensity=10):
     """Create a surface with a neon glow effect."""